@@ -1,11 +1,74 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from models import db, EmotionLog
+from werkzeug.exceptions import RequestEntityTooLarge
+import click
+from models import db, EmotionLog, EmotionRollup
 import base64
-import numpy as np
-import cv2
+import hmac
+import json
+import os
+import secrets
 from utils.emotion_mapper import get_suggestion
-from model.emotion_model import predict_emotion
+from model.emotion_model import (
+    predict_emotion,
+    predict_emotions_batch,
+    predict_emotions_multi,
+    MODEL_REGISTRY,
+)
+from utils.metrics import (
+    BATCH_FRAMES,
+    BATCH_REQUEST_SECONDS,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    EMOTION_RESPONSES,
+    REQUEST_SECONDS,
+    STAGE_SECONDS,
+    render_metrics,
+)
+from utils.structured_log import get_logger, log_frame
+from utils.profiling import PROFILER, PROFILE_DIR
+from utils.analytics_stream import BROADCASTER
+from utils.http_cache import RESPONSE_CACHE
+from utils.admission import (
+    ADMISSION,
+    ADMITTED,
+    COALESCED,
+    EXPIRED,
+    RETRY_AFTER_SECONDS,
+)
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.image_decode import decode_frame
+from utils.request_params import parse_bool
+from utils.traffic_capture import TRAFFIC_CAPTURE
+from utils.thread_config import configure_threads
+from utils.export import (
+    MIMETYPES as EXPORT_MIMETYPES,
+    ExportError,
+    export_rows,
+    parse_emotions,
+    parse_time,
+)
+from utils.frame_batch import (
+    MAX_BATCH_BYTES,
+    BatchFormatError,
+    parse_length_prefixed,
+    parse_multipart,
+    validate_frames,
+)
+from utils.progress_sync import (
+    SyncFormatError,
+    apply_sync,
+    issue_token,
+    load_progress,
+    parse_sync,
+    user_for_token,
+)
+from utils.retention import (
+    RetentionWorker,
+    enable_incremental_vacuum,
+    prepare_database,
+    run_retention,
+)
+from collections import Counter
 from datetime import datetime
 
 # ----------------------------------------
@@ -17,14 +80,59 @@ CORS(app)
 # ----------------------------------------
 # DATABASE CONFIG
 # ----------------------------------------
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///emotion_data.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "LBE_DATABASE_URI", "sqlite:///emotion_data.db"
+)
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 db.init_app(app)
 
+logger = get_logger("app")
+
+# ----------------------------------------
+# SECRET KEY (signs progress tokens)
+# ----------------------------------------
+def _load_secret_key():
+    """LBE_SECRET_KEY, or a key kept in the instance folder for this host's workers.
+
+    Several nodes must share LBE_SECRET_KEY, or tokens issued by one are
+    rejected by the others.
+    """
+    key = os.environ.get("LBE_SECRET_KEY")
+    if key:
+        return key
+    path = os.path.join(os.path.dirname(__file__), "instance", "secret_key")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        # The first worker to start creates it; the rest read it
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    except FileExistsError:
+        pass
+    with open(path) as f:
+        return f.read().strip()
+
+app.secret_key = _load_secret_key()
+
+# Size the OpenCV / TF thread pools for this worker's share of the cores,
+# before the model is loaded
+configure_threads()
+
+# Classroom cameras: classify every face in the frame instead of rejecting
+# frames with more than one face. Clients can also opt in per request.
+MULTI_FACE_DEFAULT = os.environ.get("LBE_MULTI_FACE", "0") == "1"
+
 with app.app_context():
+    prepare_database()
     db.create_all()
 
+# Background retention (off unless LBE_RETENTION_INTERVAL_SECONDS is set)
+RETENTION_WORKER = RetentionWorker(
+    app, on_run=lambda summary: RESPONSE_CACHE.invalidate("emotion_log")
+)
+RETENTION_WORKER.start()
+
 # ----------------------------------------
 # TEST API
 # ----------------------------------------
@@ -53,23 +161,103 @@ def login():
 # ----------------------------------------
 # EMOTION DETECTION API (FINAL)
 # ----------------------------------------
+def _session_id(data):
+    """Identify the client session a frame belongs to, or None if the client sent none.
+
+    Clients send a per-tab id (see src/services/api.js). The client address
+    is never used: every student behind a classroom NAT shares it.
+    """
+    return data.get("session_id") or request.headers.get("X-Session-Id") or None
+
+
+def _rejected_frame_response(session_id, decision):
+    """Lightweight reply for a frame that was coalesced, shed or expired."""
+    last = ADMISSION.last_known(session_id) or {
+        "emotion": "Unknown",
+        "suggestion": "Continue learning at your pace."
+    }
+    response = jsonify(dict(last, stale=True, reason=decision))
+    if decision not in (COALESCED, EXPIRED):
+        # Shed: the server is overloaded, ask the client to back off
+        response.status_code = 503
+        response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response
+
+
 @app.route("/api/emotion", methods=["POST"])
+@TRAFFIC_CAPTURE.captured(_session_id)
 def emotion_detection():
-    data = request.json
-    image_base64 = data.get("image")
+    with REQUEST_SECONDS.time(), PROFILER.maybe_profile():
+        data = request.json
+        image_base64 = data.get("image")
 
-    if not image_base64:
-        return jsonify({"error": "No image provided"}), 400
+        if not image_base64:
+            return jsonify({"error": "No image provided"}), 400
 
+        try:
+            multi_face = parse_bool(data.get("multi_face"), MULTI_FACE_DEFAULT)
+        except ValueError:
+            return jsonify({"error": "multi_face must be a boolean"}), 400
+
+        # Frames older than the client's capture interval are worthless
+        deadline_ms = data.get("deadline_ms")
+        if deadline_ms is None:
+            deadline_ms = request.headers.get("X-Frame-Deadline-Ms")
+        try:
+            deadline = Deadline.from_request(deadline_ms)
+        except ValueError:
+            return jsonify({"error": "deadline_ms must be a positive number of milliseconds"}), 400
+
+        # Bound in-flight work: keep only the newest frame per session.
+        # Frames without a session id are never coalesced with another client's.
+        session_id = _session_id(data)
+        admission_key = session_id if session_id is not None else object()
+        decision = ADMISSION.admit(admission_key, timeout=deadline.remaining())
+        if decision != ADMITTED:
+            return _rejected_frame_response(session_id, decision)
+
+        try:
+            response = app.make_response(
+                _emotion_detection(image_base64, deadline, multi_face, session_id)
+            )
+        except DeadlineExceeded:
+            return _rejected_frame_response(session_id, EXPIRED)
+        finally:
+            ADMISSION.release(admission_key)
+
+        if response.status_code == 200 and session_id is not None:
+            ADMISSION.remember(session_id, response.get_json())
+        return response
+
+
+def _derive_emotion(raw_emotion):
+    """Map a model emotion to the app's emotion (Neutral is shown as Bored)."""
+    emotion = raw_emotion.lower()
+
+    if emotion == "neutral":
+        return "Bored"
+    return emotion.capitalize()
+
+
+def _emotion_detection(image_base64, deadline=None, multi_face=False, session_id=None):
     try:
         # Decode base64 image
-        image_bytes = base64.b64decode(image_base64.split(",")[1])
-        np_arr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        if deadline is not None:
+            deadline.check("decode")
+        with STAGE_SECONDS.time("decode"):
+            image_bytes = base64.b64decode(image_base64.split(",")[1])
+            frame, reduction = decode_frame(image_bytes)
+
+        if multi_face:
+            return _multi_face_detection(frame, deadline, session_id, reduction)
 
         # Predict emotion from model (with validation)
-        raw_emotion = predict_emotion(frame)
-        print("MODEL OUTPUT:", raw_emotion)
+        with STAGE_SECONDS.time("predict"):
+            raw_emotion = predict_emotion(
+                frame, deadline=deadline, session_id=session_id, reduction=reduction
+            )
+        EMOTION_RESPONSES.inc(raw_emotion)
+        log_frame(logger, "model_output", emotion=raw_emotion)
 
         # ----------------------------------------
         # HANDLE VALIDATION FAILURES
@@ -91,14 +279,9 @@ def emotion_detection():
         # ----------------------------------------
         # DERIVED EMOTION LOGIC (ONLY FOR VALID EMOTIONS)
         # ----------------------------------------
-        emotion = raw_emotion.lower()
-
-        if emotion == "neutral":
-            emotion = "Bored"
-        else:
-            emotion = emotion.capitalize()
+        emotion = _derive_emotion(raw_emotion)
 
-        print("FINAL EMOTION SENT TO UI:", emotion)
+        log_frame(logger, "final_emotion", emotion=emotion)
 
         # Get suggestion
         suggestion = get_suggestion(emotion)
@@ -111,24 +294,163 @@ def emotion_detection():
             emotion=emotion,
             timestamp=datetime.now()
         )
-        db.session.add(log)
-        db.session.commit()
+        with STAGE_SECONDS.time("db_commit"):
+            db.session.add(log)
+            db.session.commit()
+        RESPONSE_CACHE.invalidate("emotion_log")
 
         return jsonify({
             "emotion": emotion,
             "suggestion": suggestion
         })
 
+    except DeadlineExceeded:
+        raise
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _multi_face_detection(frame, deadline, session_id, reduction=1):
+    """Classify every face in a frame; one EmotionLog row is saved per face."""
+    with STAGE_SECONDS.time("predict"):
+        results = predict_emotions_multi(
+            frame, session_id=session_id, deadline=deadline, reduction=reduction
+        )
+
+    if results == "Unknown":
+        EMOTION_RESPONSES.inc("Unknown")
+        return jsonify({
+            "emotion": "Unknown",
+            "suggestion": "Camera not clear. Please face the camera properly."
+        })
+
+    faces = []
+    for result in results:
+        EMOTION_RESPONSES.inc(result["emotion"])
+        emotion = _derive_emotion(result["emotion"])
+        faces.append({
+            "track_id": result["track_id"],
+            "box": result["box"],
+            "emotion": emotion,
+            "suggestion": get_suggestion(emotion)
+        })
+    log_frame(logger, "final_emotions", emotions=[f["emotion"] for f in faces])
+
+    # Save every face in one transaction
+    now = datetime.now()
+    with STAGE_SECONDS.time("db_commit"):
+        db.session.add_all([EmotionLog(emotion=f["emotion"], timestamp=now) for f in faces])
+        db.session.commit()
+    RESPONSE_CACHE.invalidate("emotion_log")
+
+    # The headline emotion is the most common one across faces
+    emotion = Counter(f["emotion"] for f in faces).most_common(1)[0][0]
+    return jsonify({
+        "emotion": emotion,
+        "suggestion": get_suggestion(emotion),
+        "faces": faces
+    })
+
+# ----------------------------------------
+# BATCH EMOTION DETECTION API
+# ----------------------------------------
+@app.route("/api/emotion/batch", methods=["POST"])
+def emotion_detection_batch():
+    """Several buffered frames from one session (see utils.frame_batch for formats)."""
+    with BATCH_REQUEST_SECONDS.time():
+        request.max_content_length = MAX_BATCH_BYTES
+        try:
+            if request.mimetype == "multipart/form-data":
+                frames = parse_multipart(request.files, request.form)
+            else:
+                frames = parse_length_prefixed(request.get_data())
+        except BatchFormatError as e:
+            return jsonify({"error": str(e)}), 400
+        except RequestEntityTooLarge:
+            return jsonify({"error": f"Batch larger than {MAX_BATCH_BYTES} bytes"}), 413
+
+        if not frames:
+            return jsonify({"error": "No frames provided"}), 400
+        BATCH_FRAMES.observe(len(frames))
+
+        # Batches queue separately from the session's live frames, so a
+        # buffered upload never supersedes (or is superseded by) a live frame
+        session_id = _session_id(request.form)
+        admission_key = ("batch", session_id if session_id is not None else object())
+        decision = ADMISSION.admit(admission_key)
+        if decision != ADMITTED:
+            response = jsonify({"error": "Server busy, retry later", "reason": decision})
+            response.status_code = 503
+            response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+            return response
+
+        try:
+            return _emotion_detection_batch(frames, session_id)
+        finally:
+            ADMISSION.release(admission_key)
+
+
+_BATCH_FAILURE_SUGGESTIONS = {
+    "Unknown": "Camera not clear. Please face the camera properly.",
+    "Multi faces": "Multiple faces detected. Please ensure only one person is visible.",
+}
+
+
+def _emotion_detection_batch(frames, session_id):
+    # The parsers only pass plausible timestamps, None meaning "now"
+    now = datetime.now()
+    captured = [
+        datetime.fromtimestamp(ts / 1000.0) if ts is not None else now
+        for ts, _ in frames
+    ]
+
+    try:
+        return _classify_and_save_batch(frames, captured, session_id)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+def _classify_and_save_batch(frames, captured, session_id):
+    # Smoothing and EmotionLog rows follow capture order, not upload order
+    order = sorted(range(len(frames)), key=lambda i: captured[i])
+
+    validations = validate_frames([frames[i][1] for i in order])
+    with STAGE_SECONDS.time("predict"):
+        raw_emotions = predict_emotions_batch(validations, session_id=session_id)
+
+    results = []
+    logs = []
+    for i, raw_emotion in zip(order, raw_emotions):
+        EMOTION_RESPONSES.inc(raw_emotion)
+        result = {"timestamp": frames[i][0], "emotion": raw_emotion}
+        if raw_emotion in _BATCH_FAILURE_SUGGESTIONS:
+            result["suggestion"] = _BATCH_FAILURE_SUGGESTIONS[raw_emotion]
+        else:
+            result["emotion"] = _derive_emotion(raw_emotion)
+            result["suggestion"] = get_suggestion(result["emotion"])
+            logs.append(EmotionLog(emotion=result["emotion"], timestamp=captured[i]))
+        results.append(result)
+
+    if logs:
+        with STAGE_SECONDS.time("db_commit"):
+            db.session.add_all(logs)
+            db.session.commit()
+        RESPONSE_CACHE.invalidate("emotion_log")
+
+        if session_id is not None:
+            latest = logs[-1].emotion
+            ADMISSION.remember(session_id, {"emotion": latest, "suggestion": get_suggestion(latest)})
+
+    return jsonify({"results": results, "saved": len(logs)})
+
 # ----------------------------------------
 # COURSE LIST API
 # ----------------------------------------
 @app.route("/api/courses", methods=["GET"])
+@RESPONSE_CACHE.cached(cache_control="public, max-age=3600")
 def courses():
     return jsonify([
         {
@@ -151,14 +473,287 @@ def courses():
 # ----------------------------------------
 # ANALYTICS API
 # ----------------------------------------
-@app.route("/api/analytics", methods=["GET"])
-def analytics():
-    emotions = db.session.query(
+def _emotion_counts(after_id=None, upto_id=None):
+    """Emotion counts of EmotionLog rows with after_id < id <= upto_id.
+
+    after_id None counts from the start, including the rows compacted into
+    EmotionRollup.
+    """
+    query = db.session.query(
         EmotionLog.emotion,
         db.func.count(EmotionLog.emotion)
-    ).group_by(EmotionLog.emotion).all()
+    )
+    if after_id is not None:
+        query = query.filter(EmotionLog.id > after_id)
+    if upto_id is not None:
+        query = query.filter(EmotionLog.id <= upto_id)
+    emotions = query.group_by(EmotionLog.emotion).all()
+
+    counts = {emotion: count for emotion, count in emotions}
+    if after_id is not None:
+        return counts
+
+    # Rows compacted by retention are kept as rollups
+    rollups = db.session.query(
+        EmotionRollup.emotion,
+        db.func.sum(EmotionRollup.count)
+    ).group_by(EmotionRollup.emotion).all()
+
+    for emotion, count in rollups:
+        counts[emotion] = counts.get(emotion, 0) + int(count)
+    return counts
+
+
+def _emotion_log_version():
+    """Changes when EmotionLog or EmotionRollup gain rows, whichever worker or node wrote them.
+
+    Retention moves old rows into existing rollups without changing the
+    totals, so the ids are enough for the analytics counts.
+    """
+    return tuple(db.session.execute(db.select(
+        db.select(db.func.max(EmotionLog.id)).scalar_subquery(),
+        db.select(db.func.max(EmotionRollup.id)).scalar_subquery()
+    )).one())
+
+RESPONSE_CACHE.set_version_source("emotion_log", _emotion_log_version)
+
+
+@app.route("/api/analytics", methods=["GET"])
+@RESPONSE_CACHE.cached(namespace="emotion_log", cache_control="no-cache")
+def analytics():
+    return jsonify(_emotion_counts())
+
+# ----------------------------------------
+# PROGRESS SYNC API
+# ----------------------------------------
+def _progress_user(token, claimed_user_id=None):
+    """The user a progress token is bound to, or an error response.
+
+    Returns:
+        tuple: (user_id, None), or (None, (response, status))
+    """
+    user_id = user_for_token(app.secret_key, token)
+    if user_id is None:
+        return None, (jsonify({"error": "Invalid or expired progress token"}), 401)
+    if claimed_user_id is not None and claimed_user_id != user_id:
+        return None, (jsonify({"error": "Token was issued for another user"}), 403)
+    return user_id, None
+
+@app.route("/api/progress/session", methods=["POST"])
+def progress_session():
+    """Issue a progress token for a user (see utils.progress_sync for its limits)."""
+    data = request.get_json(silent=True) or {}
+    try:
+        token = issue_token(app.secret_key, data.get("user_id"))
+    except SyncFormatError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"token": token})
+
+@app.route("/api/progress", methods=["GET"])
+def progress():
+    user_id, error = _progress_user(
+        request.headers.get("X-Progress-Token"), request.args.get("user_id")
+    )
+    if error:
+        return error
+    return jsonify(load_progress(user_id))
+
+@app.route("/api/progress/sync", methods=["POST"])
+def progress_sync():
+    """Merge a batch of emotion-count increments and module states.
+
+    Accepts any content type, so pages can flush with navigator.sendBeacon
+    (text/plain) when they are hidden. The progress token travels in the
+    body for the same reason (beacons cannot set headers).
+    """
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
+    user_id, error = _progress_user(
+        data.get("token") or request.headers.get("X-Progress-Token"), data.get("user_id")
+    )
+    if error:
+        return error
+
+    try:
+        batch = parse_sync(data, user_id)
+    except SyncFormatError as e:
+        return jsonify({"error": str(e)}), 400
+
+    applied = apply_sync(batch)
+    return jsonify({"applied": applied, "seq": batch["seq"]})
+
+# ----------------------------------------
+# LIVE ANALYTICS STREAM (Server-Sent Events)
+# ----------------------------------------
+def _in_app_context(fn):
+    """Wrap fn to run in its own app context (the stream's flusher thread has none)."""
+    def call(*args):
+        with app.app_context():
+            return fn(*args)
+    return call
+
+def _latest_emotion_log_id():
+    return db.session.query(db.func.max(EmotionLog.id)).scalar() or 0
+
+BROADCASTER.set_source(_in_app_context(_emotion_counts), _in_app_context(_latest_emotion_log_id))
+
+@app.route("/api/analytics/stream", methods=["GET"])
+def analytics_stream():
+    subscriber, snapshot = BROADCASTER.subscribe()
+    return Response(
+        stream_with_context(BROADCASTER.stream(subscriber, snapshot)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ----------------------------------------
+# METRICS API (Prometheus text format)
+# ----------------------------------------
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return app.response_class(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+# ----------------------------------------
+# ADMIN APIS
+# ----------------------------------------
+def _is_admin():
+    """True if the request carries LBE_ADMIN_TOKEN in X-Admin-Token.
+
+    Admin APIs are closed when no token is configured.
+    """
+    admin_token = os.environ.get("LBE_ADMIN_TOKEN")
+    if not admin_token:
+        return False
+    return hmac.compare_digest(
+        request.headers.get("X-Admin-Token", "").encode(), admin_token.encode()
+    )
+
+@app.route("/admin/profile", methods=["GET"])
+def profile():
+    """Collapsed stacks of sampled /api/emotion requests (flamegraph input).
+
+    Query params: reset=1 clears the samples after returning them,
+    dump=1 also writes them to LBE_PROFILE_DIR. Needs LBE_ADMIN_TOKEN.
+    """
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+
+    if not PROFILER.enabled:
+        return jsonify({"error": "Profiling disabled (set LBE_PROFILE_SAMPLE_RATE)"}), 404
+
+    body = PROFILER.collapsed()
+    headers = {"X-Profiled-Requests": str(PROFILER.profiled_requests)}
+
+    if request.args.get("dump") == "1":
+        if not PROFILE_DIR:
+            return jsonify({"error": "LBE_PROFILE_DIR is not set"}), 400
+        headers["X-Profile-Path"] = PROFILER.dump(PROFILE_DIR)
+
+    if request.args.get("reset") == "1":
+        PROFILER.reset()
+
+    return app.response_class(body, content_type="text/plain; charset=utf-8", headers=headers)
+
+@app.route("/admin/model", methods=["GET", "POST"])
+def model_admin():
+    """Model registry status (GET) or hot swap (POST).
+
+    POST body: {"version": name} loads, warms up and swaps in a version in
+    the background (202); add "shadow": true to score a sample of traffic
+    with it instead. {"shadow": false} alone stops shadow scoring.
+    """
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+
+    if request.method == "GET":
+        return jsonify(MODEL_REGISTRY.status())
 
-    return jsonify({emotion: count for emotion, count in emotions})
+    data = request.get_json(silent=True) or {}
+    version = data.get("version")
+    try:
+        shadow = parse_bool(data.get("shadow"))
+    except ValueError:
+        return jsonify({"error": "shadow must be a boolean"}), 400
+    if version is None:
+        if shadow:
+            return jsonify({"error": "version is required"}), 400
+        MODEL_REGISTRY.clear_shadow()
+        return jsonify(MODEL_REGISTRY.status())
+
+    if MODEL_REGISTRY.version_path(str(version)) is None:
+        return jsonify({"error": f"Unknown model version: {version}"}), 404
+    if not MODEL_REGISTRY.activate(str(version), shadow=shadow):
+        return jsonify({"error": f"Version {version} is already loading"}), 409
+    return jsonify(MODEL_REGISTRY.status()), 202
+
+@app.route("/admin/export", methods=["GET"])
+def export():
+    """Stream EmotionLog rows for analytics pipelines.
+
+    Query params: format=ndjson|csv|arrow (default ndjson), start and end
+    (ISO 8601, end exclusive), emotion (repeated or comma-separated).
+    Needs LBE_ADMIN_TOKEN: the full log is never served without one.
+    """
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+
+    fmt = request.args.get("format", "ndjson")
+    try:
+        body = export_rows(
+            fmt,
+            start=parse_time(request.args.get("start")),
+            end=parse_time(request.args.get("end")),
+            emotions=parse_emotions(request.args.getlist("emotion")),
+        )
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return Response(
+        stream_with_context(body),
+        content_type=EXPORT_MIMETYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename=emotion_log.{fmt}"},
+    )
+
+# ----------------------------------------
+# EXPORT CLI
+# ----------------------------------------
+@app.cli.command("export")
+@click.option("--format", "fmt", type=click.Choice(list(EXPORT_MIMETYPES)), default="ndjson")
+@click.option("--start", default=None, help="Only rows at or after this ISO 8601 time")
+@click.option("--end", default=None, help="Only rows before this ISO 8601 time")
+@click.option("--emotion", "emotions", multiple=True, help="Only this emotion (repeatable)")
+@click.option("--output", "-o", type=click.File("wb"), default="-",
+              help="Output file (default stdout)")
+def export_command(fmt, start, end, emotions, output):
+    """Stream EmotionLog rows as NDJSON, CSV or Arrow IPC."""
+    try:
+        body = export_rows(
+            fmt,
+            start=parse_time(start),
+            end=parse_time(end),
+            emotions=parse_emotions(emotions),
+        )
+    except ExportError as e:
+        raise click.UsageError(str(e))
+    for piece in body:
+        output.write(piece)
+
+# ----------------------------------------
+# RETENTION CLI
+# ----------------------------------------
+@app.cli.command("retention")
+@click.option("--days", type=float, default=None,
+              help="Compact rows older than this many days (default LBE_RETENTION_DAYS)")
+@click.option("--enable-incremental-vacuum", "convert_vacuum", is_flag=True,
+              help="Convert the database to auto_vacuum=INCREMENTAL first (runs a full VACUUM)")
+def retention_command(days, convert_vacuum):
+    """Archive, roll up and delete old EmotionLog rows."""
+    if convert_vacuum:
+        enable_incremental_vacuum()
+    summary = run_retention() if days is None else run_retention(days=days)
+    RESPONSE_CACHE.invalidate("emotion_log")
+    click.echo(json.dumps(summary, indent=2))
 
 # ----------------------------------------
 # RUN SERVER
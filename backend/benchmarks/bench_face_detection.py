@@ -0,0 +1,88 @@
+"""
+Face detection benchmark across input resolutions.
+
+Compares detect_faces at full resolution against the downscaled detection
+mode and reports median latency, speedup and how often both modes agree on
+the number of faces found.
+
+Usage (from the backend directory):
+    python benchmarks/bench_face_detection.py
+    python benchmarks/bench_face_detection.py --images path/to/frames --repeat 50
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.face_detectors import DETECTION_TARGET_WIDTH
+from utils.webcam_validator import detect_faces
+from frames import RESOLUTIONS, synthetic_frame
+
+
+def load_frames(images_dir):
+    """Load every readable image in images_dir."""
+    frames = []
+    for path in sorted(glob.glob(os.path.join(images_dir, "*"))):
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if frame is not None:
+            frames.append((os.path.basename(path), frame))
+    return frames
+
+
+def time_detection(frame, repeat, **kwargs):
+    """Return (median milliseconds, last detection result)."""
+    faces = detect_faces(frame, **kwargs)  # warm-up (loads the cascade)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        faces = detect_faces(frame, **kwargs)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(timings)), faces
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", help="Directory of local images to benchmark")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--target-width", type=int, default=DETECTION_TARGET_WIDTH)
+    parser.add_argument("--scale-factor", type=float, default=1.1)
+    args = parser.parse_args()
+
+    if args.images:
+        frames = load_frames(args.images)
+    else:
+        frames = [(f"{w}x{h}", synthetic_frame(w, h)) for w, h in RESOLUTIONS]
+
+    if not frames:
+        print("No frames to benchmark")
+        return 1
+
+    print(f"{'frame':<24}{'full ms':>10}{'down ms':>10}{'speedup':>10}{'faces':>10}")
+    agree = 0
+    for name, frame in frames:
+        full_ms, full_faces = time_detection(
+            frame, args.repeat, downscale=False, scale_factor=args.scale_factor
+        )
+        down_ms, down_faces = time_detection(
+            frame, args.repeat, downscale=True,
+            target_width=args.target_width, scale_factor=args.scale_factor
+        )
+        agree += int(len(full_faces) == len(down_faces))
+        speedup = full_ms / down_ms if down_ms > 0 else float("inf")
+        print(
+            f"{name:<24}{full_ms:>10.2f}{down_ms:>10.2f}{speedup:>9.1f}x"
+            f"{len(full_faces):>5}/{len(down_faces):<4}"
+        )
+
+    print(f"\nFace-count agreement: {agree}/{len(frames)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
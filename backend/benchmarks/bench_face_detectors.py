@@ -0,0 +1,106 @@
+"""
+Face detector backend comparison.
+
+Runs every available backend (haar, yunet, ssd) over a local image set and
+reports median latency, the ValidationResult each backend produces, and how
+well its boxes agree with a reference backend (face-count match rate and
+mean IoU of matched boxes).
+
+Backends whose model files are missing are skipped; fetch them first with
+`python fetch_face_detectors.py`.
+
+Usage (from the backend directory):
+    python benchmarks/bench_face_detectors.py --images path/to/frames
+    python benchmarks/bench_face_detectors.py --reference yunet --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.face_detectors import FACE_DETECTORS, available_face_detectors
+from utils.webcam_validator import detect_faces, validate_webcam_frame
+from bench_face_detection import load_frames
+from frames import frame_matrix
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    iw = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    ih = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def mean_best_iou(boxes, reference):
+    """Mean IoU of each reference box with its best match in boxes."""
+    if not reference:
+        return 1.0 if not boxes else 0.0
+    return float(np.mean([max((box_iou(r, b) for b in boxes), default=0.0) for r in reference]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", help="Directory of local images to benchmark")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--reference", default="haar", help="Backend used as ground truth")
+    args = parser.parse_args()
+
+    if args.images:
+        frames = load_frames(args.images)
+    else:
+        frames = list(frame_matrix())
+
+    backends = available_face_detectors()
+    missing = [name for name in FACE_DETECTORS if name not in backends]
+    if missing:
+        print(f"Skipping {', '.join(missing)}: model files missing "
+              f"(run `python fetch_face_detectors.py`)")
+    if len(backends) < 2:
+        print("Only one backend is available; nothing to compare")
+        return 1
+    if args.reference not in backends:
+        print(f"Reference backend '{args.reference}' is not available: {backends}")
+        return 1
+
+    print(f"Backends: {', '.join(backends)} (reference: {args.reference})")
+    print(f"Frames:   {len(frames)}\n")
+
+    results = {name: {"ms": [], "count_match": 0, "iou": [], "outcomes": {}} for name in backends}
+    for _, frame in frames:
+        reference_boxes = detect_faces(frame, detector=args.reference)
+        for name in backends:
+            boxes = detect_faces(frame, detector=name)  # warm-up
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                boxes = detect_faces(frame, detector=name)
+                results[name]["ms"].append((time.perf_counter() - start) * 1000.0)
+
+            stats = results[name]
+            stats["count_match"] += int(len(boxes) == len(reference_boxes))
+            stats["iou"].append(mean_best_iou(boxes, reference_boxes))
+
+            outcome = validate_webcam_frame(frame, detector=name).validation_type
+            stats["outcomes"][outcome] = stats["outcomes"].get(outcome, 0) + 1
+
+    print(f"{'backend':<10}{'p50 ms':>10}{'p95 ms':>10}{'count agree':>14}{'mean IoU':>10}  outcomes")
+    for name in backends:
+        stats = results[name]
+        print(
+            f"{name:<10}{np.percentile(stats['ms'], 50):>10.2f}"
+            f"{np.percentile(stats['ms'], 95):>10.2f}"
+            f"{stats['count_match']:>8}/{len(frames):<5}"
+            f"{np.mean(stats['iou']):>10.2f}  {stats['outcomes']}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
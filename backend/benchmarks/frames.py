@@ -0,0 +1,88 @@
+"""
+Deterministic synthetic webcam frames for benchmarks.
+
+Frames are textured, lightly blurred backgrounds with zero or more drawn
+faces that the Haar cascade detects, so they pass the brightness and blur
+checks and exercise every validation stage. The same (width, height,
+num_faces, seed) always produces the same pixels, which keeps results
+comparable across commits.
+"""
+
+import base64
+
+import cv2
+import numpy as np
+
+
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720), (1920, 1080)]
+FACE_COUNTS = [0, 1, 2]
+JPEG_QUALITY = 92  # Close to react-webcam's default screenshotQuality
+
+
+def draw_face(frame, cx, cy, size):
+    """Draw a simple frontal face of the given width centred at (cx, cy)."""
+    stroke = max(1, size // 30)
+    cv2.ellipse(frame, (cx, cy), (size // 2, int(size * 0.65)), 0, 0, 360, (150, 170, 200), -1)
+
+    eye_dx, eye_dy = size // 5, -size // 8
+    for dx in (-eye_dx, eye_dx):
+        ex, ey = cx + dx, cy + eye_dy
+        cv2.ellipse(frame, (ex, ey), (size // 10, size // 20), 0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(frame, (ex, ey), size // 25, (30, 20, 20), -1)
+        cv2.line(frame, (ex - size // 9, ey - size // 8), (ex + size // 9, ey - size // 8),
+                 (40, 40, 50), stroke)
+
+    cv2.line(frame, (cx, cy - size // 20), (cx, cy + size // 8), (110, 120, 150), max(1, size // 40))
+    cv2.ellipse(frame, (cx, cy + size // 4), (size // 6, size // 18), 0, 0, 180, (60, 60, 140), stroke)
+    return frame
+
+
+def synthetic_frame(width, height, num_faces=1, seed=0):
+    """
+    Build a deterministic BGR frame with num_faces faces side by side.
+
+    Args:
+        width (int): Frame width
+        height (int): Frame height
+        num_faces (int): Number of faces to draw
+        seed (int): Seed for the background texture and sensor noise
+
+    Returns:
+        np.ndarray: uint8 BGR frame of shape (height, width, 3)
+    """
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(70, 150, (height, width, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (3, 3), 0)
+
+    size = int(height * (0.35 if num_faces < 2 else 0.28))
+    for i in range(num_faces):
+        draw_face(frame, int(width * (i + 1) / (num_faces + 1)), height // 2, size)
+
+    frame = cv2.GaussianBlur(frame, (5, 5), 0)
+    noise = rng.normal(0, 8, frame.shape)
+    return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+
+def encode_jpeg(frame, quality=JPEG_QUALITY):
+    """Encode a frame to JPEG bytes."""
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+def to_data_url(jpeg_bytes):
+    """Wrap JPEG bytes the way react-webcam's getScreenshot() does."""
+    return "data:image/jpeg;base64," + base64.b64encode(jpeg_bytes).decode("ascii")
+
+
+def frame_matrix(resolutions=RESOLUTIONS, face_counts=FACE_COUNTS, seed=0):
+    """
+    Yield (name, frame) for every resolution / face-count combination.
+
+    Names look like "640x480_1face" and are stable across runs.
+    """
+    for width, height in resolutions:
+        for num_faces in face_counts:
+            name = f"{width}x{height}_{num_faces}face"
+            yield name, synthetic_frame(width, height, num_faces, seed)
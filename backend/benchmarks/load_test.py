@@ -0,0 +1,320 @@
+"""
+Multi-client load generator simulating a classroom of webcams.
+
+Each simulated learner behaves like a browser tab on one of the React
+pages: it posts JPEG frames to /api/emotion from every capture loop the
+page runs, at that loop's interval and frame size, and polls
+/api/analytics. The streams per page (see PAGE_PROFILES) are:
+- WebcamBox.jsx, which App.jsx mounts on /courses and /learning*: a
+  160x120 canvas frame every 3 s (Courses.jsx mounts a second one),
+- Learning.jsx / ModulePage.jsx: a 640x480 react-webcam getScreenshot()
+  every 5 s.
+A tab's streams share its session id, as frameSessionId() in
+src/services/api.js does. Clients start over a ramp-up period, capture
+times are jittered, and a client occasionally pauses (think time) as a
+learner switching pages would.
+
+The load is applied in steps of increasing client counts. For each step
+the tool reports p50/p95/p99 latency, error rate and achieved vs offered
+throughput, and it flags the first step that misses the latency SLO or
+error budget as the saturation point.
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py --start-server --steps 10,25,50,100
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --steps 20 --duration 60
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+from frames import encode_jpeg, synthetic_frame, to_data_url  # noqa: E402
+
+
+# Frame streams per page: (capture interval in seconds, frame size)
+WEBCAM_BOX = (3.0, (160, 120))      # WebcamBox.jsx canvas
+REACT_WEBCAM = (5.0, (640, 480))    # getScreenshot() with the pages' videoConstraints
+PAGE_PROFILES = {
+    "learning": [REACT_WEBCAM, WEBCAM_BOX],  # Learning.jsx + App's WebcamBox
+    "module": [REACT_WEBCAM, WEBCAM_BOX],    # ModulePage.jsx + App's WebcamBox
+    "courses": [WEBCAM_BOX, WEBCAM_BOX],     # App's and Courses.jsx' WebcamBox
+}
+FRAMES_PER_CLIENT = 4
+
+
+# ----------------------------------------
+# SIMULATED CLIENT
+# ----------------------------------------
+class SimulatedClient(threading.Thread):
+    """One learner's browser tab posting frames and polling analytics."""
+
+    def __init__(self, client_id, base_url, stop_at, start_delay, args, recorder):
+        super().__init__(daemon=True)
+        self.client_id = client_id
+        self.url = urlparse(base_url)
+        self.stop_at = stop_at
+        self.start_delay = start_delay
+        self.args = args
+        self.recorder = recorder
+        self.rng = random.Random(args.seed + client_id)
+        self.page = self.rng.choice(list(PAGE_PROFILES))
+        sizes = {size for streams in PAGE_PROFILES.values() for _, size in streams}
+        self.frames = {
+            size: [
+                json.dumps({
+                    "image": to_data_url(encode_jpeg(
+                        synthetic_frame(size[0], size[1], 1, seed=client_id * 100 + i)
+                    )),
+                    "session_id": f"load-{client_id}",
+                }).encode()
+                for i in range(FRAMES_PER_CLIENT)
+            ]
+            for size in sizes
+        }
+        self.conn = None
+
+    def _request(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"} if body else {}
+        for attempt in range(2):
+            try:
+                if self.conn is None:
+                    self.conn = http.client.HTTPConnection(
+                        self.url.hostname, self.url.port or 80, timeout=self.args.timeout
+                    )
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                if self.conn is not None:
+                    self.conn.close()
+                self.conn = None
+                if attempt == 1:
+                    raise
+
+    def _timed(self, kind, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            status = self._request(method, path, body)
+        except Exception:
+            status = None
+        self.recorder.record(kind, (time.perf_counter() - start) * 1000.0, status)
+
+    def _jittered(self, interval):
+        return interval * (1.0 + self.rng.uniform(-self.args.jitter, self.args.jitter))
+
+    def _start_streams(self, at):
+        """Next capture time per stream of the current page, each loop at a random phase."""
+        return [at + self.rng.uniform(0, interval) for interval, _ in PAGE_PROFILES[self.page]]
+
+    def run(self):
+        time.sleep(self.start_delay)
+        now = time.monotonic()
+        next_frames = self._start_streams(now)
+        next_poll = now + self.rng.uniform(0, self.args.analytics_interval or 1.0)
+        frame_index = 0
+
+        while True:
+            now = time.monotonic()
+            if now >= self.stop_at:
+                break
+
+            stream = min(range(len(next_frames)), key=next_frames.__getitem__)
+            if now >= next_frames[stream]:
+                interval, size = PAGE_PROFILES[self.page][stream]
+                body = self.frames[size][frame_index % FRAMES_PER_CLIENT]
+                frame_index += 1
+                self._timed("emotion", "POST", "/api/emotion", body)
+                # setInterval keeps its cadence regardless of response time
+                next_frames[stream] += self._jittered(interval)
+                next_frames[stream] = max(next_frames[stream], time.monotonic())
+
+                # Occasionally pause and move to another page
+                if self.rng.random() < self.args.think_probability:
+                    self.page = self.rng.choice(list(PAGE_PROFILES))
+                    next_frames = self._start_streams(
+                        time.monotonic() + self.rng.uniform(0, self.args.think_time)
+                    )
+
+            wake = min(next_frames)
+            if self.args.analytics_interval and now >= next_poll:
+                self._timed("analytics", "GET", "/api/analytics")
+                next_poll += self._jittered(self.args.analytics_interval)
+            if self.args.analytics_interval:
+                wake = min(wake, next_poll)
+            time.sleep(max(0.0, min(wake, self.stop_at) - time.monotonic()))
+
+        if self.conn is not None:
+            self.conn.close()
+
+
+class Recorder:
+    """Thread-safe collection of (kind, latency_ms, status) samples."""
+
+    def __init__(self):
+        self.samples = []
+        self.lock = threading.Lock()
+
+    def record(self, kind, latency_ms, status):
+        with self.lock:
+            self.samples.append((kind, latency_ms, status))
+
+
+def offered_rps(num_clients):
+    """Mean frame requests per second offered by num_clients learners."""
+    per_page = [sum(1.0 / interval for interval, _ in streams) for streams in PAGE_PROFILES.values()]
+    return num_clients * float(np.mean(per_page))
+
+
+def summarize_step(num_clients, samples, duration, args):
+    """Latency percentiles, error rate and throughput for one load step."""
+    result = {"clients": num_clients, "offered_rps": offered_rps(num_clients)}
+    for kind in ("emotion", "analytics"):
+        rows = [s for s in samples if s[0] == kind]
+        if not rows:
+            continue
+        latencies = np.array([r[1] for r in rows])
+        errors = sum(1 for r in rows if r[2] is None or r[2] >= 400)
+        result[kind] = {
+            "requests": len(rows),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "error_rate": errors / len(rows),
+            "achieved_rps": len(rows) / duration,
+        }
+
+    emotion = result.get("emotion")
+    # A step too short to send any frame says nothing about saturation
+    result["saturated"] = emotion is not None and (
+        emotion["p95_ms"] > args.slo_ms
+        or emotion["error_rate"] > args.max_error_rate
+    )
+    return result
+
+
+def run_step(base_url, num_clients, args):
+    """Run num_clients simulated learners for args.duration seconds."""
+    recorder = Recorder()
+    ramp = min(args.ramp_up, args.duration / 2)
+    stop_at = time.monotonic() + ramp + args.duration
+    clients = [
+        SimulatedClient(i, base_url, stop_at, ramp * i / max(1, num_clients), args, recorder)
+        for i in range(num_clients)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    return summarize_step(num_clients, recorder.samples, ramp + args.duration, args)
+
+
+# ----------------------------------------
+# LOCAL SERVER
+# ----------------------------------------
+def start_local_server(port):
+    """Start the Flask app in a subprocess on a throwaway database.
+
+    Returns:
+        tuple: (server process, temporary database directory)
+    """
+    db_dir = tempfile.mkdtemp(prefix="lbe-load-")
+    env = dict(os.environ, LBE_DATABASE_URI="sqlite:///" + os.path.join(db_dir, "load.db"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", "app", "run",
+         "--port", str(port), "--no-reload", "--with-threads"],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            conn.close()
+            return server, db_dir
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError("Local server exited during startup")
+            time.sleep(0.5)
+    server.terminate()
+    shutil.rmtree(db_dir, ignore_errors=True)
+    raise RuntimeError("Local server did not start within 60 s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--start-server", action="store_true", help="Launch the app locally")
+    parser.add_argument("--port", type=int, default=5055, help="Port for --start-server")
+    parser.add_argument("--steps", default="5,10,25,50", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per step after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="Seconds to start all clients")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Fractional interval jitter")
+    parser.add_argument("--think-probability", type=float, default=0.05)
+    parser.add_argument("--think-time", type=float, default=8.0, help="Max pause in seconds")
+    parser.add_argument("--analytics-interval", type=float, default=15.0, help="0 disables polling")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--slo-ms", type=float, default=1000.0, help="p95 latency objective")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write step results as JSON")
+    args = parser.parse_args()
+
+    server, db_dir = None, None
+    base_url = args.url
+    if args.start_server:
+        server, db_dir = start_local_server(args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    steps = []
+    try:
+        print(f"{'clients':>8}{'offered':>9}{'achieved':>10}{'p50 ms':>9}{'p95 ms':>9}"
+              f"{'p99 ms':>9}{'errors':>8}")
+        for num_clients in [int(n) for n in args.steps.split(",") if n.strip()]:
+            step = run_step(base_url, num_clients, args)
+            steps.append(step)
+            emotion = step.get("emotion", {})
+            print(
+                f"{num_clients:>8}{step['offered_rps']:>9.1f}{emotion.get('achieved_rps', 0):>10.1f}"
+                f"{emotion.get('p50_ms', 0):>9.1f}{emotion.get('p95_ms', 0):>9.1f}"
+                f"{emotion.get('p99_ms', 0):>9.1f}{emotion.get('error_rate', 1):>8.1%}"
+                f"{'  SATURATED' if step['saturated'] else ''}"
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+            shutil.rmtree(db_dir, ignore_errors=True)
+
+    saturation = next((s["clients"] for s in steps if s["saturated"]), None)
+    if saturation is None:
+        print("\nNo saturation within the tested steps")
+    else:
+        print(f"\nSaturation point: {saturation} clients "
+              f"(p95 > {args.slo_ms:.0f} ms or errors > {args.max_error_rate:.0%})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"steps": steps, "saturation_clients": saturation,
+                       "args": vars(args)}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
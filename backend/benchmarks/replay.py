@@ -0,0 +1,309 @@
+"""
+Replay captured /api/emotion traffic and diff it against a baseline.
+
+Reads capture logs written with LBE_CAPTURE_SAMPLE_RATE set (see
+utils/traffic_capture.py) and sends every frame through the pipeline
+again, either:
+- in-process (default): through the Flask test client on a throwaway
+  database, so the run measures this checkout's code, or
+- against a running server with --url.
+
+Frames are sent in capture order. --speed 0 (the default) sends them one
+at a time as fast as possible, which is deterministic: every session's
+smoothing state sees the same frame sequence on every run. --speed 1
+reproduces the original inter-arrival times, with requests overlapping
+as they did live, and --speed 4 replays four times faster.
+
+The report compares latency percentiles, predicted emotions and response
+statuses with the captured responses, or with an earlier replay of the
+same capture given by --compare (e.g. one made on the previous build).
+Smoothing starts empty in a replay, so a session's first frames can
+differ from a capture taken mid-session.
+
+Usage (from the backend directory):
+    python benchmarks/replay.py instance/capture/*.lbecap --output replay.json
+    python benchmarks/replay.py capture.lbecap --url http://127.0.0.1:5000 --speed 1
+    python benchmarks/replay.py capture.lbecap --compare replay.json
+"""
+
+import argparse
+import atexit
+import base64
+import hashlib
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+from utils.traffic_capture import read_capture  # noqa: E402
+
+
+# ----------------------------------------
+# TARGETS
+# ----------------------------------------
+class InProcessTarget:
+    """Sends requests through the Flask test client of this checkout."""
+
+    def __init__(self):
+        # Point the app at a throwaway database before it is imported
+        db_dir = tempfile.mkdtemp(prefix="lbe-replay-")
+        atexit.register(shutil.rmtree, db_dir, ignore_errors=True)
+        os.environ.setdefault(
+            "LBE_DATABASE_URI", "sqlite:///" + os.path.join(db_dir, "replay.db")
+        )
+        os.environ["LBE_CAPTURE_SAMPLE_RATE"] = "0"  # Never re-capture the replay
+        from app import app
+
+        self.app = app
+        self.local = threading.local()
+
+    def post(self, body):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.post("/api/emotion", data=body, content_type="application/json")
+        return response.status_code, response.get_data()
+
+
+class HttpTarget:
+    """Sends requests to a running server, one keep-alive connection per thread."""
+
+    def __init__(self, base_url, timeout):
+        self.url = urlparse(base_url)
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def post(self, body):
+        for attempt in range(2):
+            conn = getattr(self.local, "conn", None)
+            if conn is None:
+                conn = self.local.conn = http.client.HTTPConnection(
+                    self.url.hostname, self.url.port or 80, timeout=self.timeout
+                )
+            try:
+                conn.request("POST", "/api/emotion", body=body,
+                             headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                self.local.conn = None
+                if attempt:
+                    return None, b""
+
+
+# ----------------------------------------
+# REPLAY
+# ----------------------------------------
+def load_frames(paths):
+    """Frames from every capture log, in arrival order."""
+    frames = [frame for path in paths for frame in read_capture(path)]
+    frames.sort(key=lambda f: f.captured_at)
+    return frames
+
+
+def fingerprint(frames):
+    """Identifies a capture, so replays are only compared frame-by-frame with replays of it."""
+    digest = hashlib.sha1()
+    for frame in frames:
+        digest.update(f"{frame.captured_at:.6f}|{frame.session_id}|{len(frame.image)}".encode())
+    return digest.hexdigest()
+
+
+def request_body(frame, use_deadlines):
+    body = {
+        "image": "data:image/jpeg;base64," + base64.b64encode(frame.image).decode(),
+        "session_id": frame.session_id,
+    }
+    if frame.multi_face is not None:
+        body["multi_face"] = frame.multi_face
+    if use_deadlines and frame.deadline_ms:
+        body["deadline_ms"] = frame.deadline_ms
+    return json.dumps(body).encode()
+
+
+def send(target, body):
+    start = time.perf_counter()
+    status, data = target.post(body)
+    latency_ms = (time.perf_counter() - start) * 1000.0
+    try:
+        emotion = json.loads(data).get("emotion")
+    except (ValueError, AttributeError):
+        emotion = None
+    return {"latency_ms": latency_ms, "status": status, "emotion": emotion}
+
+
+def replay(frames, target, speed, concurrency, use_deadlines):
+    """
+    Send every frame and collect the responses.
+
+    Returns:
+        list: {"latency_ms", "status", "emotion"} per frame
+    """
+    bodies = [request_body(frame, use_deadlines) for frame in frames]
+    if speed <= 0:
+        return [send(target, body) for body in bodies]
+
+    first = frames[0].captured_at
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = []
+        for frame, body in zip(frames, bodies):
+            delay = (frame.captured_at - first) / speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(send, target, body))
+        return [future.result() for future in futures]
+
+
+# ----------------------------------------
+# DIFF
+# ----------------------------------------
+def latency_summary(latencies):
+    samples = np.asarray(latencies, dtype=np.float64)
+    if samples.size == 0:
+        return None
+    return {
+        "n": int(samples.size),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def diff(baseline, current):
+    """Latency, emotion and status differences between two per-frame result lists."""
+    compared = [
+        (old["emotion"], new["emotion"])
+        for old, new in zip(baseline, current)
+        if old["status"] == 200 and new["status"] == 200
+    ]
+    changed = Counter((old, new) for old, new in compared if old != new)
+    statuses = Counter(
+        (old["status"], new["status"])
+        for old, new in zip(baseline, current)
+        if old["status"] != new["status"]
+    )
+    return {
+        "latency": {
+            "baseline": latency_summary([r["latency_ms"] for r in baseline]),
+            "current": latency_summary([r["latency_ms"] for r in current]),
+        },
+        "emotions_compared": len(compared),
+        "emotion_agreement": (len(compared) - sum(changed.values())) / len(compared)
+        if compared else None,
+        "emotion_changes": [
+            {"from": old, "to": new, "frames": n} for (old, new), n in changed.most_common()
+        ],
+        "status_changes": [
+            {"from": old, "to": new, "frames": n} for (old, new), n in statuses.most_common()
+        ],
+    }
+
+
+def print_report(report, baseline_name):
+    latency = report["latency"]
+    print(f"\nDiff against {baseline_name}")
+    print(f"{'latency':<10}{'baseline':>12}{'current':>12}{'change':>10}")
+    for key in ("p50_ms", "p95_ms", "p99_ms", "mean_ms"):
+        old = latency["baseline"][key] if latency["baseline"] else 0.0
+        new = latency["current"][key] if latency["current"] else 0.0
+        change = (new - old) / old * 100.0 if old else 0.0
+        print(f"{key:<10}{old:>12.1f}{new:>12.1f}{change:>+9.1f}%")
+
+    if report["emotion_agreement"] is None:
+        print("\nNo frame answered 200 in both runs; emotions not compared")
+    else:
+        print(f"\nEmotion agreement: {report['emotion_agreement']:.1%} "
+              f"of {report['emotions_compared']} frames")
+    for change in report["emotion_changes"][:10]:
+        print(f"  {change['from']} -> {change['to']}: {change['frames']}")
+    for change in report["status_changes"][:10]:
+        print(f"  status {change['from']} -> {change['to']}: {change['frames']}")
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("captures", nargs="+", help="Capture log files (.lbecap)")
+    parser.add_argument("--url", help="Replay against this server instead of in-process")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="1 = original timing, N = N times faster, 0 = sequential (default)")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="Max overlapping requests when --speed > 0")
+    parser.add_argument("--no-deadlines", action="store_true",
+                        help="Drop captured frame deadlines (e.g. for a slow debug build)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--compare", help="Earlier replay JSON of the same capture to diff against")
+    parser.add_argument("--output", help="Write per-frame results and the diff as JSON")
+    args = parser.parse_args()
+
+    frames = load_frames(args.captures)
+    if not frames:
+        print("No frames in the capture logs")
+        return 1
+    print(f"Replaying {len(frames)} frames from {len(args.captures)} capture file(s)"
+          f" {'against ' + args.url if args.url else 'in-process'}"
+          f" at {'sequential' if args.speed <= 0 else f'{args.speed:g}x'} speed")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if previous["meta"]["fingerprint"] != fingerprint(frames):
+            print(f"{args.compare} is a replay of a different capture")
+            return 1
+        baseline, baseline_name = previous["frames"], f"{args.compare} (commit {previous['meta']['commit']})"
+    else:
+        baseline = [
+            {"latency_ms": f.latency_ms, "status": f.status, "emotion": f.emotion}
+            for f in frames
+        ]
+        baseline_name = "captured responses"
+
+    target = HttpTarget(args.url, args.timeout) if args.url else InProcessTarget()
+    current = replay(frames, target, args.speed, args.concurrency, not args.no_deadlines)
+
+    report = diff(baseline, current)
+    print_report(report, baseline_name)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": datetime.now().isoformat(timespec="seconds"),
+                    "commit": _commit(),
+                    "captures": args.captures,
+                    "fingerprint": fingerprint(frames),
+                    "target": args.url or "in-process",
+                    "speed": args.speed,
+                },
+                "frames": current,
+                "diff": report,
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
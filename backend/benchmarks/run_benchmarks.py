@@ -0,0 +1,244 @@
+"""
+Reproducible benchmark suite for the emotion pipeline.
+
+Runs micro-benchmarks for every stage of /api/emotion on deterministic
+synthetic frames (see frames.py), then an end-to-end throughput/latency run
+through the Flask test client. Results are written as JSON so runs from
+different commits can be compared with --compare.
+
+The benchmark uses its own temporary SQLite database, never
+instance/emotion_data.db.
+
+Usage (from the backend directory):
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --quick --compare baseline.json
+"""
+
+import argparse
+import atexit
+import base64
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+# Point the app at a throwaway database before it is imported
+_DB_DIR = tempfile.mkdtemp(prefix="lbe-bench-")
+atexit.register(shutil.rmtree, _DB_DIR, ignore_errors=True)
+os.environ.setdefault(
+    "LBE_DATABASE_URI", "sqlite:///" + os.path.join(_DB_DIR, "bench.db")
+)
+
+from app import app, db  # noqa: E402
+from models import EmotionLog  # noqa: E402
+from model import emotion_model  # noqa: E402
+from utils import webcam_validator  # noqa: E402
+from utils.image_decode import decode_frame  # noqa: E402
+from frames import RESOLUTIONS, FACE_COUNTS, encode_jpeg, frame_matrix, to_data_url  # noqa: E402
+
+
+# ----------------------------------------
+# MEASUREMENT HELPERS
+# ----------------------------------------
+def summarize(samples_ms):
+    """Summary statistics (milliseconds) for a list of samples."""
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "n": int(samples.size),
+        "mean_ms": float(samples.mean()),
+        "min_ms": float(samples.min()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "ops_per_s": float(1000.0 / samples.mean()) if samples.mean() > 0 else None,
+    }
+
+
+def measure(fn, repeat, warmup=2):
+    """Time fn() repeat times after warmup calls and return summary stats."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return summarize(samples)
+
+
+def run_metadata():
+    """Describe the code and host the results came from."""
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "tensorflow": getattr(emotion_model.tf, "__version__", None),
+        "model_loaded": emotion_model._load_model() is not None,
+    }
+
+
+# ----------------------------------------
+# STAGE MICRO-BENCHMARKS
+# ----------------------------------------
+def bench_stages(repeat, resolutions, face_counts):
+    """Benchmark each pipeline stage in isolation."""
+    results = {}
+
+    for name, frame in frame_matrix(resolutions, face_counts):
+        jpeg = encode_jpeg(frame)
+        data_url = to_data_url(jpeg)
+
+        if name.endswith("_1face"):
+            res = name.split("_")[0]
+
+            def decode():
+                image_bytes = base64.b64decode(data_url.split(",")[1])
+                cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+            results[f"decode/{res}"] = measure(decode, repeat)
+            results[f"decode_reduced/{res}"] = measure(
+                lambda: decode_frame(base64.b64decode(data_url.split(",")[1]), "reduced"),
+                repeat,
+            )
+            results[f"brightness/{res}"] = measure(
+                lambda: webcam_validator.is_frame_too_dark_or_bright(frame), repeat
+            )
+            results[f"blur/{res}"] = measure(
+                lambda: webcam_validator.is_frame_blurred(frame), repeat
+            )
+
+            validation = webcam_validator.validate_webcam_frame(frame)
+            if validation.is_valid:
+                face = validation.face_region
+                results[f"preprocess/{res}"] = measure(
+                    lambda: emotion_model.preprocess_frame_with_face(face), repeat
+                )
+
+        results[f"detect_faces/{name}"] = measure(
+            lambda: webcam_validator.detect_faces(frame), repeat
+        )
+        results[f"validate/{name}"] = measure(
+            lambda: webcam_validator.validate_webcam_frame(frame), repeat
+        )
+
+    model = emotion_model._load_model()
+    if model is not None:
+        face = np.full((96, 96), 128, dtype=np.uint8)
+        for batch_size in (1, emotion_model.MAX_BATCH_SIZE):
+            batch = emotion_model.preprocess_faces([face] * batch_size).copy()
+            results[f"inference/batch{batch_size}"] = measure(
+                lambda: emotion_model._infer_probabilities(model, batch), repeat
+            )
+
+    with app.app_context():
+        def commit_row():
+            db.session.add(EmotionLog(emotion="Happy", timestamp=datetime.now()))
+            db.session.commit()
+
+        results["db_commit/emotion_log"] = measure(commit_row, repeat)
+
+    return results
+
+
+# ----------------------------------------
+# END-TO-END BENCHMARK
+# ----------------------------------------
+def bench_end_to_end(requests_per_case, resolutions):
+    """Post frames to /api/emotion through the Flask test client."""
+    client = app.test_client()
+    results = {}
+
+    for name, frame in frame_matrix(resolutions, [1]):
+        payload = {"image": to_data_url(encode_jpeg(frame))}
+        client.post("/api/emotion", json=payload)  # warm-up
+
+        samples = []
+        statuses = {}
+        start_all = time.perf_counter()
+        for _ in range(requests_per_case):
+            start = time.perf_counter()
+            response = client.post("/api/emotion", json=payload)
+            samples.append((time.perf_counter() - start) * 1000.0)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        elapsed = time.perf_counter() - start_all
+
+        stats = summarize(samples)
+        stats["throughput_rps"] = requests_per_case / elapsed
+        stats["status_codes"] = {str(k): v for k, v in statuses.items()}
+        results[f"api_emotion/{name}"] = stats
+
+    return results
+
+
+# ----------------------------------------
+# COMPARISON
+# ----------------------------------------
+def compare(current, baseline_path):
+    """Print p50 changes against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"\nComparison with {baseline_path} (commit {baseline['meta'].get('commit')})")
+    print(f"{'benchmark':<40}{'base p50':>10}{'new p50':>10}{'change':>10}")
+    for key, stats in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        change = (stats["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100.0 if old["p50_ms"] else 0.0
+        print(f"{key:<40}{old['p50_ms']:>10.3f}{stats['p50_ms']:>10.3f}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=30, help="Samples per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per end-to-end case")
+    parser.add_argument("--quick", action="store_true", help="Fewer samples and resolutions")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    resolutions, face_counts = RESOLUTIONS, FACE_COUNTS
+    if args.quick:
+        args.repeat, args.requests = min(args.repeat, 5), min(args.requests, 10)
+        resolutions = RESOLUTIONS[:2]
+
+    report = {"meta": run_metadata(), "results": {}}
+    report["results"].update(bench_stages(args.repeat, resolutions, face_counts))
+    report["results"].update(bench_end_to_end(args.requests, resolutions))
+
+    print(f"{'benchmark':<40}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for key, stats in report["results"].items():
+        print(f"{key:<40}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
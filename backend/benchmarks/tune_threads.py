@@ -0,0 +1,212 @@
+"""
+Auto-tune OpenCV / TensorFlow thread-pool sizes for this host.
+
+Sweeps combinations of OpenCV threads and TF intra-/inter-op threads (see
+utils/thread_config.py) on the benchmark frames. TF only accepts thread
+settings once per process, so every combination runs in fresh processes:
+--workers measurement processes start together, as the app's workers
+would, and each pushes --requests frames through decode + predict_emotion
+from --concurrency request threads. The combination with the highest
+total throughput wins (ties go to the lower p95 latency). It is recorded
+in LBE_THREAD_CONFIG, which the app applies on start-up when the host,
+worker count and CPU budget match.
+
+Without TensorFlow installed only the OpenCV thread count is swept.
+
+Usage (from the backend directory):
+    python benchmarks/tune_threads.py --workers 4
+    python benchmarks/tune_threads.py --workers 2 --cpu-budget 8 --dry-run
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+from utils import thread_config  # noqa: E402
+from frames import encode_jpeg, synthetic_frame  # noqa: E402
+
+DISTINCT_FRAMES = 8
+
+
+# ----------------------------------------
+# MEASUREMENT (child process)
+# ----------------------------------------
+def measure(args):
+    """Run one worker's share of the load and print its stats as JSON."""
+    config, _ = thread_config.configure_threads()
+
+    from model.emotion_model import predict_emotion
+    from utils.image_decode import decode_frame
+
+    width, height = (int(v) for v in args.resolution.split("x"))
+    images = [
+        encode_jpeg(synthetic_frame(width, height, 1, seed=seed))
+        for seed in range(DISTINCT_FRAMES)
+    ]
+
+    def one_request(i):
+        start = time.perf_counter()
+        frame, reduction = decode_frame(images[i % len(images)])
+        predict_emotion(frame, session_id=f"tune-{i % len(images)}", reduction=reduction)
+        return (time.perf_counter() - start) * 1000.0
+
+    for i in range(len(images)):
+        one_request(i)  # Warm-up: cascade load, first TF call
+
+    # Start together with the other workers, so they compete for the cores
+    delay = args.start_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = list(pool.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "config": config,
+        "frames_per_s": args.requests / elapsed,
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }))
+
+
+# ----------------------------------------
+# SWEEP (parent process)
+# ----------------------------------------
+def thread_counts(limit):
+    """1, 2, 4, ... up to and including limit."""
+    counts = {limit}
+    n = 1
+    while n < limit:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+def candidates(workers, budget):
+    """Configurations to try for one of `workers` processes on `budget` cores."""
+    per_worker = max(1, budget // workers)
+    derived = thread_config.derive_thread_config(workers, budget)
+    if thread_config.tf is None:
+        return [dict(derived, cv_threads=n) for n in thread_counts(per_worker)]
+    return [
+        {"cv_threads": cv, "tf_intra_op_threads": intra, "tf_inter_op_threads": inter}
+        for cv in thread_counts(per_worker)
+        for intra in thread_counts(per_worker)
+        for inter in thread_counts(min(thread_config.MAX_INTER_OP_THREADS, per_worker))
+    ]
+
+
+def run_combination(config, args):
+    """Start args.workers measurement processes with config and collect their stats."""
+    env = dict(
+        os.environ,
+        LBE_WORKERS=str(args.workers),
+        LBE_CPU_BUDGET=str(args.cpu_budget),
+        LBE_CV_THREADS=str(config["cv_threads"]),
+        LBE_TF_INTRA_OP_THREADS=str(config["tf_intra_op_threads"]),
+        LBE_TF_INTER_OP_THREADS=str(config["tf_inter_op_threads"]),
+        LBE_LOG_LEVEL="ERROR",
+    )
+    # Leave time for every worker to import and warm up first
+    start_at = time.time() + args.startup_seconds
+    children = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--measure",
+             "--start-at", str(start_at), "--requests", str(args.requests),
+             "--concurrency", str(args.concurrency), "--resolution", args.resolution],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        for _ in range(args.workers)
+    ]
+
+    stats = []
+    for child in children:
+        out, _ = child.communicate()
+        lines = out.decode().strip().splitlines()
+        if child.returncode != 0 or not lines:
+            raise RuntimeError(f"Measurement process failed for {config}")
+        stats.append(json.loads(lines[-1]))
+
+    return {
+        **config,
+        "frames_per_s": sum(s["frames_per_s"] for s in stats),
+        "p95_ms": max(s["p95_ms"] for s in stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=thread_config.worker_count(),
+                        help="Worker processes the app runs with")
+    parser.add_argument("--cpu-budget", type=int, default=thread_config.cpu_budget(),
+                        help="Cores the app may use in total")
+    parser.add_argument("--requests", type=int, default=60, help="Frames per worker per combination")
+    parser.add_argument("--concurrency", type=int, default=4, help="Request threads per worker")
+    parser.add_argument("--resolution", default="640x480", help="Benchmark frame size")
+    parser.add_argument("--startup-seconds", type=float, default=5.0,
+                        help="Time allowed for workers to start before measuring")
+    parser.add_argument("--output", default=thread_config.THREAD_CONFIG_PATH,
+                        help="Where to record the best configuration")
+    parser.add_argument("--dry-run", action="store_true", help="Print results without recording")
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args)
+        return 0
+
+    configs = candidates(args.workers, args.cpu_budget)
+    print(f"Sweeping {len(configs)} configurations: {args.workers} worker(s), "
+          f"{args.cpu_budget} core budget"
+          f"{'' if thread_config.tf is not None else ' (no TensorFlow: OpenCV threads only)'}")
+    print(f"{'cv':>4}{'intra':>7}{'inter':>7}{'frames/s':>11}{'p95 ms':>10}")
+
+    results = []
+    for config in configs:
+        result = run_combination(config, args)
+        results.append(result)
+        print(f"{result['cv_threads']:>4}{result['tf_intra_op_threads']:>7}"
+              f"{result['tf_inter_op_threads']:>7}{result['frames_per_s']:>11.1f}"
+              f"{result['p95_ms']:>10.1f}")
+
+    best = max(results, key=lambda r: (r["frames_per_s"], -r["p95_ms"]))
+    derived = thread_config.derive_thread_config(args.workers, args.cpu_budget)
+    baseline = next((r for r in results if all(r[k] == v for k, v in derived.items())), None)
+    print(f"\nBest: cv={best['cv_threads']} intra={best['tf_intra_op_threads']} "
+          f"inter={best['tf_inter_op_threads']} at {best['frames_per_s']:.1f} frames/s")
+    if baseline is not None and baseline is not best:
+        print(f"Derived default: {baseline['frames_per_s']:.1f} frames/s "
+              f"({(best['frames_per_s'] / baseline['frames_per_s'] - 1) * 100:+.1f}% for best)")
+
+    if args.dry_run:
+        return 0
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({
+            "host": socket.gethostname(),
+            "cpu_count": os.cpu_count(),
+            "workers": args.workers,
+            "cpu_budget": args.cpu_budget,
+            "tuned_at": datetime.now().isoformat(timespec="seconds"),
+            "tensorflow": getattr(thread_config.tf, "__version__", None),
+            "best": {k: best[k] for k in derived},
+            "results": results,
+        }, f, indent=2)
+    print(f"Recorded in {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Download the model files of the YuNet and SSD face detector backends.
+
+The files go to backend/model/face_detectors (FACE_DETECTOR_MODEL_DIR),
+which is not in the repository. Without them FACE_DETECTOR=yunet or ssd
+falls back to the Haar cascade. Each backend is loaded once after its
+download, so a truncated or wrong file is reported here instead of at
+runtime.
+
+Usage (from the backend directory):
+    python fetch_face_detectors.py            # every DNN backend
+    python fetch_face_detectors.py yunet
+    python fetch_face_detectors.py --force ssd
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import urllib.request
+
+from utils.face_detectors import (
+    FACE_DETECTOR_MODEL_DIR,
+    MODEL_FILE_URLS,
+    SsdFaceDetector,
+    YuNetFaceDetector,
+)
+
+BACKENDS = {cls.name: cls for cls in (YuNetFaceDetector, SsdFaceDetector)}
+
+
+def download(url, path):
+    """Download url to path via a temporary file, so a failed download leaves nothing behind."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f, urllib.request.urlopen(url, timeout=60) as response:
+            shutil.copyfileobj(response, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("backends", nargs="*", metavar="BACKEND",
+                        help=f"Backends to fetch: {', '.join(BACKENDS)} (default: all)")
+    parser.add_argument("--force", action="store_true", help="Download files that already exist")
+    args = parser.parse_args()
+    unknown = [name for name in args.backends if name not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(unknown)}")
+
+    os.makedirs(FACE_DETECTOR_MODEL_DIR, exist_ok=True)
+    failed = False
+    for name in args.backends or BACKENDS:
+        cls = BACKENDS[name]
+        for path in cls.model_files:
+            if os.path.isfile(path) and not args.force:
+                print(f"{name}: {os.path.basename(path)} already present")
+                continue
+            print(f"{name}: downloading {os.path.basename(path)}")
+            try:
+                download(MODEL_FILE_URLS[path], path)
+            except OSError as e:
+                print(f"{name}: download failed: {e}")
+                failed = True
+                break
+        else:
+            try:
+                cls()
+            except Exception as e:
+                print(f"{name}: model files do not load: {e}")
+                failed = True
+            else:
+                print(f"{name}: ready (FACE_DETECTOR={name})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,20 @@
+import logging
 import os
 import sys
+import threading
 import cv2
 import numpy as np
 
 # Import webcam validation module
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from utils.webcam_validator import validate_webcam_frame, ValidationResult
+from utils.metrics import STAGE_SECONDS, MODEL_FALLBACKS
+from utils.deadline import check_deadline
+from utils.structured_log import get_logger, log_event, log_frame
+from utils.face_tracker import FACE_TRACKER
+from model.smoothing import alpha_for_window
+from model.session_state import create_session_state
+from model.registry import LEGACY_MODEL_DIR, ModelRegistry
 
 try:
     import tensorflow as tf
@@ -13,9 +22,13 @@ except Exception:
     tf = None
 
 # Model configuration
-MODEL_DIR = os.path.join(os.path.dirname(__file__), "emotion_model_tf")
+MODEL_DIR = LEGACY_MODEL_DIR  # Used when the registry has no versions (see model.registry)
 MODEL_INPUT_SIZE = (48, 48)  # height, width
-SMOOTHING_WINDOW = 3
+SMOOTHING_WINDOW = 3  # Frames; sets the EMA weight (alpha = 2 / (window + 1))
+MAX_BATCH_SIZE = 8  # Rows in the preallocated model input buffer
+BUFFER_ALIGNMENT = 64  # Byte alignment so TF can wrap the buffer without copying
+MAX_SMOOTHED_KEYS = 10000  # Sessions / tracked faces kept by the in-process state backend
+DEFAULT_EMOTION = "Neutral"  # Fallback for sessions with no prediction yet
 
 # Mapping from model class index -> application emotion
 FALLBACK_MAPPING = {
@@ -28,39 +41,64 @@ FALLBACK_MAPPING = {
     6: "Neutral",     # Surprise
 }
 
-# Global state
+logger = get_logger("emotion_model")
+
+# Global state: the active model version, swapped by MODEL_REGISTRY
 EMOTION_MODEL = None
-_pred_history = []  # list of (class_idx, confidence)
-_last_known = "Neutral"
 
+# Smoothed probability vector and last emotion per session, or per
+# (session, track) in multi-face mode; shared across nodes if
+# LBE_SESSION_STATE points at Redis (see model.session_state)
+_session_state = create_session_state(
+    alpha_for_window(SMOOTHING_WINDOW),
+    lambda class_idx: FALLBACK_MAPPING.get(class_idx, DEFAULT_EMOTION),
+    MAX_SMOOTHED_KEYS,
+)
 
-def _load_model():
-    global EMOTION_MODEL
-    if tf is None:
-        return None
+# Per-thread preallocated model input buffers (see _get_input_buffers)
+_buffer_local = threading.local()
+
+# Cached (callable, input keyword) per loaded model, see _get_model_fn.
+# Keyed by id(model); entries are dropped when the registry releases a version.
+_model_fns = {}
 
-    if EMOTION_MODEL is not None:
-        return EMOTION_MODEL
 
-    if not os.path.isdir(MODEL_DIR):
+def _load_saved_model(path):
+    """Registry loader: a SavedModel from path, or None."""
+    if tf is None:
         return None
 
     try:
-        EMOTION_MODEL = tf.saved_model.load(MODEL_DIR)
-        try:
-            print(f"[emotion_model] Loaded SavedModel from: {MODEL_DIR}")
-        except Exception:
-            pass
-        return EMOTION_MODEL
+        model = tf.saved_model.load(path)
+        log_event(logger, logging.INFO, "model_loaded", model_dir=path)
+        return model
     except Exception as e:
-        try:
-            print(f"[emotion_model] Failed loading SavedModel: {e}")
-        except Exception:
-            pass
-        EMOTION_MODEL = None
+        log_event(logger, logging.ERROR, "model_load_failed", model_dir=path, error=str(e))
         return None
 
 
+def _warm_up(model):
+    """Run dummy batches so the first live requests do not pay for tracing."""
+    height, width = MODEL_INPUT_SIZE
+    for size in (1, MAX_BATCH_SIZE):
+        _infer_probabilities(model, np.zeros((size, height, width, 1), np.float32))
+
+
+def _on_swap(version):
+    global EMOTION_MODEL
+    EMOTION_MODEL = version.model
+
+
+def _on_release(model):
+    _model_fns.pop(id(model), None)
+
+
+def _load_model():
+    """The active model (loading the initial version on first use), or None."""
+    version = MODEL_REGISTRY.active()
+    return None if version is None else version.model
+
+
 def preprocess_frame(frame):
     """Convert BGR OpenCV frame to model input tensor.
 
@@ -109,6 +147,62 @@ def preprocess_frame(frame):
     return tensor
 
 
+def _aligned_empty(shape, dtype, alignment=BUFFER_ALIGNMENT):
+    """Allocate an uninitialised C-contiguous array aligned to `alignment` bytes."""
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    raw = np.empty(nbytes + alignment, dtype=np.uint8)
+    offset = (-raw.ctypes.data) % alignment
+    return raw[offset : offset + nbytes].view(dtype).reshape(shape)
+
+
+def _get_input_buffers():
+    """Return this thread's preallocated (float32 batch, uint8 resize scratch) buffers.
+
+    The float32 buffer has shape (MAX_BATCH_SIZE, H, W, 1) and is reused for
+    every frame, so the hot path does not allocate per-frame arrays.
+    """
+    buffers = getattr(_buffer_local, "buffers", None)
+    if buffers is None:
+        height, width = MODEL_INPUT_SIZE
+        batch = _aligned_empty((MAX_BATCH_SIZE, height, width, 1), np.float32)
+        scratch = np.empty((MAX_BATCH_SIZE, height, width), dtype=np.uint8)
+        buffers = (batch, scratch)
+        _buffer_local.buffers = buffers
+    return buffers
+
+
+def preprocess_faces(face_regions):
+    """Resize and normalize face crops straight into the preallocated input buffer.
+
+    Each crop is resized with ``cv2.resize(dst=...)`` into a uint8 scratch row
+    and scaled to [0, 1] in place into the float32 batch buffer.
+
+    Args:
+        face_regions (list): Grayscale cropped face images
+
+    Returns:
+        np.ndarray: View of shape (N, H, W, 1) dtype float32 into this thread's
+        buffer. It is only valid until the next preprocessing call on the same
+        thread, so run inference on it before preprocessing another frame.
+    """
+    count = len(face_regions)
+    height, width = MODEL_INPUT_SIZE
+
+    if count <= MAX_BATCH_SIZE:
+        batch, scratch = _get_input_buffers()
+    else:
+        # Oversized batches are rare; allocate one-off buffers for them
+        batch = _aligned_empty((count, height, width, 1), np.float32)
+        scratch = np.empty((count, height, width), dtype=np.uint8)
+
+    for i, face in enumerate(face_regions):
+        cv2.resize(face, (width, height), dst=scratch[i])
+
+    np.multiply(scratch[:count], np.float32(1.0 / 255.0), out=batch[:count, :, :, 0])
+    return batch[:count]
+
+
 def preprocess_frame_with_face(face_region):
     """Convert pre-extracted face region to model input tensor.
     
@@ -119,52 +213,104 @@ def preprocess_frame_with_face(face_region):
         face_region (np.ndarray): Grayscale cropped face image
     
     Returns:
-        np.ndarray: Model input tensor of shape (1, H, W, 1) dtype float32, or None if invalid
+        np.ndarray: Model input tensor of shape (1, H, W, 1) dtype float32, or None if invalid.
+            The tensor is a view into a reusable buffer (see preprocess_faces).
     """
-    if face_region is None:
+    if face_region is None or face_region.size == 0:
         return None
     
     try:
-        # Resize to model input
-        resized = cv2.resize(face_region, (MODEL_INPUT_SIZE[1], MODEL_INPUT_SIZE[0]))
-        
-        # Normalize to [0,1]
-        normalized = resized.astype(np.float32) / 255.0
-        
-        # Expand dims to (1, H, W, 1)
-        tensor = np.expand_dims(normalized, axis=(0, -1))
-        return tensor
+        return preprocess_faces([face_region])
     except Exception as e:
-        print(f"[emotion_model] Error preprocessing face region: {e}")
+        log_event(logger, logging.WARNING, "preprocess_failed", error=str(e))
         return None
 
 
-def _smooth_and_map(class_idx, confidence):
-    """Maintain sliding window of preds and return mapped emotion string."""
-    global _pred_history, _last_known
+def _get_model_fn(model):
+    """Resolve and cache the callable (and its input keyword) used for inference."""
+    cached = _model_fns.get(id(model))
+    if cached is not None and cached[0] is model:
+        return cached[1], cached[2]
+
+    func, input_key = model, None
+    if hasattr(model, "signatures") and "serving_default" in model.signatures:
+        func = model.signatures["serving_default"]
+        # Try to detect expected input name for the signature
+        try:
+            _, in_spec = func.structured_input_signature
+            input_keys = list(in_spec.keys())
+            input_key = input_keys[0] if input_keys else None
+        except Exception:
+            input_key = None
+
+    _model_fns[id(model)] = (model, func, input_key)
+    return func, input_key
+
+
+def _infer_probabilities(model, batch):
+    """Run the model on a (N, H, W, 1) float32 batch and return (N, num_classes) probabilities."""
+    # A contiguous, aligned float32 buffer is wrapped by TF without a copy
+    tf_input = tf.convert_to_tensor(batch)
+    func, input_key = _get_model_fn(model)
+
+    if input_key is not None:
+        try:
+            out = func(**{input_key: tf_input})
+        except Exception:
+            # fallback: try calling directly
+            out = func(tf_input)
+    else:
+        out = func(tf_input)
+
+    # out may be a dict of tensors
+    if isinstance(out, dict):
+        out = list(out.values())[0]
+    probs = out.numpy()
+
+    # Ensure shape (N, num_classes)
+    if probs.ndim == 1:
+        probs = np.expand_dims(probs, axis=0)
+
+    # If outputs appear to be logits (rows do not sum to ~1), apply softmax
+    sums = probs.sum(axis=1)
+    if not np.all((sums >= 0.9) & (sums <= 1.1)):
+        exp = np.exp(probs - probs.max(axis=1, keepdims=True))
+        probs = exp / exp.sum(axis=1, keepdims=True)
+
+    return probs
+
+
+# Versioned models, hot-swapped without dropping requests (see model.registry)
+MODEL_REGISTRY = ModelRegistry(
+    loader=_load_saved_model,
+    warmup=_warm_up,
+    infer=_infer_probabilities,
+    on_swap=_on_swap,
+    on_release=_on_release,
+)
+
 
-    _pred_history.append((int(class_idx), float(confidence)))
-    if len(_pred_history) > SMOOTHING_WINDOW:
-        _pred_history.pop(0)
+def _smooth_and_map(keys, probs):
+    """Fold model outputs into each key's smoothed probabilities and map them.
 
-    # majority vote on class_idx
-    classes = [p[0] for p in _pred_history]
-    counts = {}
-    for c in classes:
-        counts[c] = counts.get(c, 0) + 1
+    Args:
+        keys (list): Smoothing key per row of probs (session, or (session, track))
+        probs (np.ndarray): (N, num_classes) model probabilities
 
-    majority_class = max(counts.items(), key=lambda x: x[1])[0]
+    Returns:
+        list: (mapped emotion, smoothed confidence) per row
+    """
+    smoothed, labels = _session_state.update(keys, probs)
+    confidences = smoothed.max(axis=1)
+    return [(label, float(conf)) for label, conf in zip(labels, confidences)]
 
-    # average confidence for majority class
-    confidences = [p[1] for p in _pred_history if p[0] == majority_class]
-    avg_conf = float(np.mean(confidences)) if confidences else float(confidence)
 
-    mapped = FALLBACK_MAPPING.get(majority_class, "Neutral")
-    _last_known = mapped
-    return mapped, avg_conf
+def _last_known(keys):
+    """Last emotion given to each key, for frames that cannot be classified."""
+    return [label or DEFAULT_EMOTION for label in _session_state.last_known(keys)]
 
 
-def predict_emotion(frame):
+def predict_emotion(frame, deadline=None, session_id=None, reduction=1):
     """Run model inference on an OpenCV BGR frame and return mapped emotion string.
     
     First performs comprehensive webcam validation:
@@ -176,13 +322,22 @@ def predict_emotion(frame):
     If validation passes, crops face region and passes to emotion model.
     
     If the SavedModel isn't available, falls back to a deterministic heuristic (brightness-based).
+    
+    If a deadline is given, it is checked before every stage and
+    DeadlineExceeded is raised once it has passed, so expired frames skip
+    the remaining work.
+    
+    Predictions are smoothed per session_id; frames without one are not
+    smoothed.
+    
+    frame may be BGR or a grayscale frame decoded at 1/reduction scale
+    (see utils.image_decode).
     """
-    global _last_known
     
     # ================================================================
     # STEP 1: VALIDATE WEBCAM FRAME QUALITY AND FACE DETECTION
     # ================================================================
-    validation = validate_webcam_frame(frame)
+    validation = validate_webcam_frame(frame, deadline=deadline, reduction=reduction)
     
     # If validation fails, return Unknown emotion with specific guidance
     if not validation.is_valid:
@@ -201,88 +356,187 @@ def predict_emotion(frame):
     # STEP 2: PREPROCESS VALIDATED FACE REGION
     # ================================================================
     # Use validated face region instead of full frame
-    tensor = preprocess_frame_with_face(validation.face_region)
+    check_deadline(deadline, "preprocess")
+    with STAGE_SECONDS.time("preprocess"):
+        tensor = preprocess_frame_with_face(validation.face_region)
     if tensor is None:
-        return _last_known
+        MODEL_FALLBACKS.inc("preprocess_failed")
+        return _last_known([session_id])[0]
+
+    # The lease keeps this request on one model version across a hot swap
+    with MODEL_REGISTRY.lease() as version:
+        if version is None:
+            MODEL_FALLBACKS.inc("model_unavailable")
+            # Fallback deterministic: use mean pixel to choose Neutral/Happy/Sad
+            mean_val = tensor.mean()
+            if mean_val > 0.6:
+                return "Happy"
+            if mean_val < 0.3:
+                return "Sad"
+            return "Neutral"
+
+        check_deadline(deadline, "inference")
+        try:
+            with STAGE_SECONDS.time("inference"):
+                batch_probs = _infer_probabilities(version.model, tensor)
+            MODEL_REGISTRY.maybe_shadow(tensor, batch_probs)
+        except Exception:
+            MODEL_FALLBACKS.inc("inference_error")
+            return _last_known([session_id])[0]
+
+    try:
+        probs = batch_probs[0]
+
+        class_idx = int(np.argmax(probs))
+        confidence = float(probs[class_idx])
+
+        [(mapped_emotion, smoothed_conf)] = _smooth_and_map([session_id], probs)
 
-    model = _load_model()
-    if model is None:
-        # Fallback deterministic: use mean pixel to choose Neutral/Happy/Sad
-        mean_val = tensor.mean()
+        log_frame(logger, "prediction", class_idx=class_idx, confidence=confidence,
+                  mapped=mapped_emotion, smoothed_confidence=smoothed_conf)
+
+        return mapped_emotion
+
+    except Exception:
+        MODEL_FALLBACKS.inc("inference_error")
+        return _last_known([session_id])[0]
+
+
+
+def _heuristic_emotions(batch):
+    """Same brightness heuristic as predict_emotion, per row of a preprocessed batch."""
+    emotions = []
+    for mean_val in batch.mean(axis=(1, 2, 3)):
         if mean_val > 0.6:
-            return "Happy"
-        if mean_val < 0.3:
-            return "Sad"
-        return "Neutral"
+            emotions.append("Happy")
+        elif mean_val < 0.3:
+            emotions.append("Sad")
+        else:
+            emotions.append("Neutral")
+    return emotions
 
-    try:
-        # Try using serving_default signature
-        tf_input = tf.convert_to_tensor(tensor)
 
-        if hasattr(model, "signatures") and "serving_default" in model.signatures:
-            func = model.signatures["serving_default"]
-            # Try to detect expected input name for the signature
-            try:
-                _, in_spec = func.structured_input_signature
-                input_keys = list(in_spec.keys())
-            except Exception:
-                input_keys = []
+def predict_emotions_multi(frame, session_id=None, deadline=None, reduction=1):
+    """Run model inference on every face in a frame.
+
+    Validates the frame in multi-face mode, gives each face a tracking ID
+    that is stable across the session's frames, and classifies all faces
+    with one batched model call per MAX_BATCH_SIZE faces. Each track has
+    its own smoothing window.
+
+    Args:
+        frame (np.ndarray): BGR or grayscale OpenCV frame
+        session_id (str): Client session, used to key face tracks
+        deadline (Deadline): Optional frame deadline, checked before each stage
+        reduction (int): Decode reduction factor of the frame; boxes are
+            returned in original image coordinates
+
+    Returns:
+        list | str: One dict per face with "track_id", "box" and "emotion",
+        largest face first, or "Unknown" if validation fails.
+    """
+    validation = validate_webcam_frame(
+        frame, deadline=deadline, multi_face=True, reduction=reduction
+    )
+    if not validation.is_valid:
+        return "Unknown"
+
+    boxes = [box for box, _ in validation.faces]
+    crops = [crop for _, crop in validation.faces]
+    track_ids = FACE_TRACKER.update(session_id, boxes)
+
+    emotions = []
+    with MODEL_REGISTRY.lease() as version:
+        for start in range(0, len(crops), MAX_BATCH_SIZE):
+            chunk = crops[start : start + MAX_BATCH_SIZE]
+            keys = [(session_id, track_id) for track_id in track_ids[start : start + len(chunk)]]
 
+            check_deadline(deadline, "preprocess")
             try:
-                if input_keys:
-                    # call with named arg
-                    kwargs = {input_keys[0]: tf_input}
-                    out = func(**kwargs)
-                else:
-                    out = func(tf_input)
+                with STAGE_SECONDS.time("preprocess"):
+                    batch = preprocess_faces(chunk)
             except Exception as e:
-                # fallback: try calling directly
-                try:
-                    out = func(tf_input)
-                except Exception as e2:
-                    raise
-
-            # out may be a dict of tensors
-            if isinstance(out, dict):
-                first = list(out.values())[0]
-                probs = first.numpy()
-            else:
-                probs = out.numpy()
-        else:
-            # Call model directly
-            preds = model(tf_input)
-            if isinstance(preds, dict):
-                first = list(preds.values())[0]
-                probs = first.numpy()
-            else:
-                probs = preds.numpy()
+                log_event(logger, logging.WARNING, "preprocess_failed", error=str(e))
+                MODEL_FALLBACKS.inc("preprocess_failed")
+                emotions.extend(_last_known(keys))
+                continue
 
-        # Ensure shape (1, num_classes)
-        if probs.ndim == 1:
-            probs = np.expand_dims(probs, axis=0)
+            if version is None:
+                MODEL_FALLBACKS.inc("model_unavailable")
+                emotions.extend(_heuristic_emotions(batch))
+                continue
 
-        probs = probs[0]
-        # If outputs appear to be logits (do not sum to ~1), apply softmax
-        s = float(np.sum(probs))
-        if not (0.9 <= s <= 1.1):
+            check_deadline(deadline, "inference")
             try:
-                exp = np.exp(probs - np.max(probs))
-                probs = exp / exp.sum()
+                with STAGE_SECONDS.time("inference"):
+                    probs = _infer_probabilities(version.model, batch)
+                MODEL_REGISTRY.maybe_shadow(batch, probs)
             except Exception:
-                pass
+                MODEL_FALLBACKS.inc("inference_error")
+                emotions.extend(_last_known(keys))
+                continue
 
-        class_idx = int(np.argmax(probs))
-        confidence = float(probs[class_idx])
+            emotions.extend(mapped for mapped, _ in _smooth_and_map(keys, probs))
 
-        mapped_emotion, avg_conf = _smooth_and_map(class_idx, confidence)
+    log_frame(logger, "multi_face_prediction", faces=len(emotions), emotions=emotions)
 
-        try:
-            print(f"[emotion_model] pred class={class_idx} conf={confidence:.3f} mapped={mapped_emotion}")
-        except Exception:
-            pass
+    return [
+        {"track_id": track_id, "box": list(box), "emotion": emotion}
+        for track_id, box, emotion in zip(track_ids, boxes, emotions)
+    ]
 
-        return mapped_emotion
 
-    except Exception:
-        return _last_known
+def predict_emotions_batch(validations, session_id=None):
+    """Classify several validated frames from one session with a single model call.
+
+    Used for buffered uploads: the frames are validated up front (in
+    parallel, see utils.frame_batch), then every valid face crop is
+    preprocessed into one batch and run through the model once. The
+    session's smoother is fed the outputs in the order given, which should
+    be capture order.
 
+    Args:
+        validations (list): ValidationResult per frame, in capture order
+        session_id (str): Client session, used to key smoothing
+
+    Returns:
+        list: Emotion string per frame. Frames that failed validation get
+        "Unknown" or "Multi faces", like predict_emotion.
+    """
+    emotions = [
+        "Multi faces" if v.validation_type == "multiple_faces" else "Unknown"
+        for v in validations
+    ]
+    valid = [i for i, v in enumerate(validations) if v.is_valid]
+    if not valid:
+        return emotions
+
+    try:
+        with STAGE_SECONDS.time("preprocess"):
+            batch = preprocess_faces([validations[i].face_region for i in valid])
+    except Exception as e:
+        log_event(logger, logging.WARNING, "preprocess_failed", error=str(e))
+        MODEL_FALLBACKS.inc("preprocess_failed", amount=len(valid))
+        predicted = _last_known([session_id]) * len(valid)
+    else:
+        with MODEL_REGISTRY.lease() as version:
+            if version is None:
+                MODEL_FALLBACKS.inc("model_unavailable", amount=len(valid))
+                predicted = _heuristic_emotions(batch)
+            else:
+                try:
+                    with STAGE_SECONDS.time("inference"):
+                        probs = _infer_probabilities(version.model, batch)
+                    MODEL_REGISTRY.maybe_shadow(batch, probs)
+                    predicted = [
+                        mapped for mapped, _ in _smooth_and_map([session_id] * len(valid), probs)
+                    ]
+                except Exception:
+                    MODEL_FALLBACKS.inc("inference_error", amount=len(valid))
+                    predicted = _last_known([session_id]) * len(valid)
+
+    for i, emotion in zip(valid, predicted):
+        emotions[i] = emotion
+
+    log_frame(logger, "batch_prediction", frames=len(validations), valid=len(valid))
+    return emotions
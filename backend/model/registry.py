@@ -0,0 +1,400 @@
+"""
+Versioned emotion models with zero-downtime hot swap.
+
+Model versions are SavedModel directories under LBE_MODEL_REGISTRY_DIR
+(default backend/model/versions), one subdirectory per version name.
+Names are letters, digits, ".", "_" and "-", not starting with a dot. The
+version served at startup is, in order of preference:
+
+1. LBE_MODEL_VERSION,
+2. the name in the registry's CURRENT file,
+3. the newest version directory (by name),
+4. the legacy model/emotion_model_tf directory, as version "default".
+
+activate(name) loads and warms up a version on a background thread
+(warm-up runs dummy batches so TF traces its functions off the live path),
+then swaps it in atomically. Requests hold a lease on the version they
+started with, so in-flight requests finish on the old version. A retired
+version is released once its last lease ends.
+
+A second version can be loaded as a shadow. A sampled fraction of batches
+(LBE_SHADOW_SAMPLE_RATE) is then scored by it on a single background
+thread, and the agreement with the active model is counted. When that
+thread is busy, shadow work is dropped rather than queued.
+
+The initial version is loaded on first use. Requests that arrive during
+that load wait for it; if it fails, it is retried after
+LBE_MODEL_LOAD_RETRY_SECONDS.
+
+The registry is per process: with several workers, activate each one.
+"""
+
+import gc
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from utils.metrics import Counter, Gauge
+from utils.structured_log import get_logger, log_event
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+REGISTRY_DIR = os.environ.get(
+    "LBE_MODEL_REGISTRY_DIR", os.path.join(os.path.dirname(__file__), "versions")
+)
+LEGACY_MODEL_DIR = os.path.join(os.path.dirname(__file__), "emotion_model_tf")
+LEGACY_VERSION = "default"
+VERSION_NAME = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9._-]*")
+SHADOW_SAMPLE_RATE = float(os.environ.get("LBE_SHADOW_SAMPLE_RATE", "0"))
+# A failed initial load is retried after this long; requests in between
+# run without a model
+LOAD_RETRY_SECONDS = float(os.environ.get("LBE_MODEL_LOAD_RETRY_SECONDS", "30"))
+
+logger = get_logger("model_registry")
+
+MODEL_INFO = Gauge(
+    "lbe_model_info",
+    "Model versions loaded in this process, by role (1 = loaded).",
+    ["version", "role"],
+)
+MODEL_SWAPS = Counter(
+    "lbe_model_swaps_total",
+    "Model versions swapped in, by outcome.",
+    ["outcome"],
+)
+SHADOW_RESULTS = Counter(
+    "lbe_shadow_predictions_total",
+    "Shadow model predictions compared with the active model, by result.",
+    ["result"],
+)
+
+
+class ModelVersion:
+    """One loaded model version and its in-flight lease count."""
+
+    def __init__(self, name, path, model):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.loaded_at = time.time()
+        self.in_flight = 0
+        self.retired = False
+
+    def describe(self):
+        return {
+            "version": self.name,
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "in_flight": self.in_flight,
+        }
+
+
+class ModelRegistry:
+    """Holds the active (and optional shadow) model version."""
+
+    def __init__(self, loader, warmup=None, infer=None, on_swap=None, on_release=None,
+                 registry_dir=REGISTRY_DIR, shadow_sample_rate=SHADOW_SAMPLE_RATE):
+        """
+        Args:
+            loader (callable): path -> model object, or None if it cannot load
+            warmup (callable): model -> None, runs dummy inference
+            infer (callable): (model, batch) -> (N, num_classes) probabilities,
+                used for shadow scoring
+            on_swap (callable): Called with the new active ModelVersion
+            on_release (callable): Called with a model before the registry
+                drops it, to clear caches that reference it
+            registry_dir (str): Directory of version subdirectories
+            shadow_sample_rate (float): Fraction of batches scored by the shadow
+        """
+        self.loader = loader
+        self.warmup = warmup
+        self.infer = infer
+        self.on_swap = on_swap
+        self.on_release = on_release
+        self.registry_dir = registry_dir
+        self.shadow_sample_rate = shadow_sample_rate
+        self._active = None
+        self._shadow = None
+        self._retired = []
+        self._loading = {}  # version name -> role being loaded
+        self._initialized = False
+        self._retry_at = 0.0
+        self._init_lock = threading.Lock()  # Held for the whole initial load
+        self._lock = threading.Lock()
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lbe-shadow")
+        self._shadow_busy = threading.Semaphore(1)
+
+    # ----------------------------------------
+    # VERSION DISCOVERY
+    # ----------------------------------------
+    def available_versions(self):
+        """Names of the version directories in the registry."""
+        if not os.path.isdir(self.registry_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.registry_dir)
+            if VERSION_NAME.fullmatch(name)
+            and os.path.isdir(os.path.join(self.registry_dir, name))
+        )
+
+    def version_path(self, name):
+        """Directory of a version, or None if the name is invalid or not in the registry."""
+        if name == LEGACY_VERSION:
+            return LEGACY_MODEL_DIR
+        # Version names are plain directory names: never paths, ".", ".." or hidden
+        if not isinstance(name, str) or not VERSION_NAME.fullmatch(name):
+            return None
+        path = os.path.join(self.registry_dir, name)
+        if not os.path.isdir(path):
+            return None
+        return path
+
+    def _initial_version(self):
+        name = os.environ.get("LBE_MODEL_VERSION")
+        if name:
+            return name
+        current_file = os.path.join(self.registry_dir, "CURRENT")
+        if os.path.isfile(current_file):
+            with open(current_file) as f:
+                name = f.read().strip()
+            if name:
+                return name
+        versions = self.available_versions()
+        return versions[-1] if versions else LEGACY_VERSION
+
+    # ----------------------------------------
+    # LOADING AND SWAPPING
+    # ----------------------------------------
+    def _load(self, name):
+        """Load and warm up a version. Returns a ModelVersion or None."""
+        path = self.version_path(name)
+        if path is None or not os.path.isdir(path):
+            log_event(logger, logging.ERROR, "model_version_missing", version=name)
+            return None
+
+        started = time.perf_counter()
+        model = self.loader(path)
+        if model is None:
+            return None
+        if self.warmup is not None:
+            try:
+                self.warmup(model)
+            except Exception as e:
+                log_event(logger, logging.ERROR, "model_warmup_failed", version=name, error=str(e))
+                return None
+
+        log_event(logger, logging.INFO, "model_version_loaded", version=name, path=path,
+                  seconds=round(time.perf_counter() - started, 3))
+        return ModelVersion(name, path, model)
+
+    def _install(self, version, role):
+        """Swap a loaded version in as active or shadow."""
+        with self._lock:
+            if role == "shadow":
+                old, self._shadow = self._shadow, version
+            else:
+                old, self._active = self._active, version
+            if old is not None:
+                old.retired = True
+                self._retired.append(old)
+            idle = self._take_idle()
+        self._release(idle)
+        MODEL_INFO.set(1, version.name, role)
+        if old is not None and old.name != version.name:
+            MODEL_INFO.set(0, old.name, role)
+        if role == "active" and self.on_swap is not None:
+            self.on_swap(version)
+        MODEL_SWAPS.inc(role)
+        log_event(logger, logging.INFO, "model_swapped", version=version.name, role=role,
+                  previous=old.name if old else None)
+
+    def active(self):
+        """
+        The active ModelVersion, or None.
+
+        The first call loads the initial version; concurrent callers wait
+        for that load instead of running without a model.
+        """
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized and time.monotonic() >= self._retry_at:
+                    self._load_initial()
+        return self._active
+
+    def _load_initial(self):
+        """Load and install the initial version (caller holds _init_lock)."""
+        if self._active is None:
+            name = self._initial_version()
+            try:
+                version = self._load(name)
+            except Exception as e:
+                log_event(logger, logging.ERROR, "model_load_failed", version=name, error=str(e))
+                version = None
+            if version is None:
+                self._retry_at = time.monotonic() + LOAD_RETRY_SECONDS
+                log_event(logger, logging.WARNING, "model_initial_load_failed",
+                          version=name, retry_in_seconds=LOAD_RETRY_SECONDS)
+                return
+            # activate() may have installed a version while this one loaded
+            if self._active is None:
+                self._install(version, "active")
+        self._initialized = True
+
+    def activate(self, name, shadow=False, wait=False):
+        """
+        Load and warm up a version in the background, then swap it in.
+
+        Args:
+            name (str): Version directory name
+            shadow (bool): Install as the shadow instead of the active model
+            wait (bool): Block until the swap is done (used by the tests)
+
+        Returns:
+            bool: False if the version does not exist or is already loading
+        """
+        if self.version_path(name) is None:
+            return False
+        role = "shadow" if shadow else "active"
+        with self._lock:
+            if name in self._loading:
+                return False
+            self._loading[name] = role
+
+        def load_and_swap():
+            try:
+                version = self._load(name)
+                if version is None:
+                    MODEL_SWAPS.inc("failed")
+                    return
+                self._install(version, role)
+            finally:
+                with self._lock:
+                    self._loading.pop(name, None)
+
+        thread = threading.Thread(target=load_and_swap, name=f"lbe-model-{name}", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def clear_shadow(self):
+        """Stop shadow scoring and release the shadow version."""
+        with self._lock:
+            old, self._shadow = self._shadow, None
+            if old is not None:
+                old.retired = True
+                self._retired.append(old)
+            idle = self._take_idle()
+        self._release(idle)
+        if old is not None:
+            MODEL_INFO.set(0, old.name, "shadow")
+
+    def _take_idle(self):
+        """Detach retired versions with no in-flight requests (caller holds the lock)."""
+        idle = [v for v in self._retired if v.in_flight == 0]
+        if idle:
+            self._retired = [v for v in self._retired if v.in_flight > 0]
+        return idle
+
+    def _release(self, idle):
+        """Drop detached versions' models (without the lock: gc can take a while)."""
+        if not idle:
+            return
+        for version in idle:
+            log_event(logger, logging.INFO, "model_version_released", version=version.name)
+            if self.on_release is not None and version.model is not None:
+                self.on_release(version.model)
+            version.model = None
+        gc.collect()
+
+    def _end_lease(self, version):
+        with self._lock:
+            version.in_flight -= 1
+            idle = self._take_idle() if version.retired and version.in_flight == 0 else []
+        self._release(idle)
+
+    @contextmanager
+    def lease(self):
+        """
+        Pin the active version for the duration of one request.
+
+        Yields:
+            ModelVersion or None: The version to run inference on
+        """
+        if not self._initialized:
+            self.active()
+        # Read and pin together, so a swap cannot release the version first
+        with self._lock:
+            version = self._active
+            if version is not None:
+                version.in_flight += 1
+        if version is None:
+            yield None
+            return
+        try:
+            yield version
+        finally:
+            self._end_lease(version)
+
+    # ----------------------------------------
+    # SHADOW SCORING
+    # ----------------------------------------
+    def maybe_shadow(self, batch, probs):
+        """
+        Score a sampled batch with the shadow version, off the request thread.
+
+        Args:
+            batch (np.ndarray): Model input the active version was given
+            probs (np.ndarray): The active version's probabilities for it
+        """
+        shadow = self._shadow
+        if shadow is None or self.infer is None or random.random() >= self.shadow_sample_rate:
+            return
+        if not self._shadow_busy.acquire(blocking=False):
+            SHADOW_RESULTS.inc("dropped")
+            return
+        # The input buffer is reused by the next frame on this thread
+        self._shadow_executor.submit(
+            self._score_shadow, shadow, batch.copy(), np.argmax(probs, axis=1)
+        )
+
+    def _score_shadow(self, shadow, batch, active_classes):
+        try:
+            with self._lock:
+                if shadow.retired:
+                    return
+                shadow.in_flight += 1
+            try:
+                shadow_classes = np.argmax(self.infer(shadow.model, batch), axis=1)
+            finally:
+                self._end_lease(shadow)
+            agree = int(np.sum(shadow_classes == active_classes))
+            SHADOW_RESULTS.inc("agree", amount=agree)
+            SHADOW_RESULTS.inc("disagree", amount=len(active_classes) - agree)
+        except Exception as e:
+            SHADOW_RESULTS.inc("error")
+            log_event(logger, logging.WARNING, "shadow_inference_failed",
+                      version=shadow.name, error=str(e))
+        finally:
+            self._shadow_busy.release()
+
+    def status(self):
+        """Snapshot of the registry for the admin endpoint."""
+        with self._lock:
+            return {
+                "active": self._active.describe() if self._active else None,
+                "shadow": self._shadow.describe() if self._shadow else None,
+                "loading": dict(self._loading),
+                "retired_in_flight": [v.describe() for v in self._retired],
+                "available": self.available_versions(),
+                "shadow_sample_rate": self.shadow_sample_rate,
+            }
@@ -0,0 +1,358 @@
+"""
+Pluggable per-session emotion state.
+
+Each session (or tracked face) has a smoothed probability vector and the
+last emotion it was given, which is what fallbacks return when a frame
+cannot be classified. Keeping that state in process memory ties a student
+to one backend node; with a shared store any node can serve any frame.
+
+Backends, selected by LBE_SESSION_STATE:
+- unset or "process": InProcessSessionState, an EmotionSmoother plus an
+  LRU of last emotions in this process (single node)
+- "redis://host:port/db": RedisSessionState on a Redis server (needs the
+  optional `redis` package)
+- "redis+local://": RedisSessionState on LocalRedis, an in-process stand-in
+  with the same client API, for tests and single-node runs of the shared
+  code path
+
+The shared backend costs at most two round trips per request, whatever
+the number of frames or faces: one pipelined read of every key involved,
+then one pipelined write of the new vectors and labels. The EMA update
+runs locally on the stacked vectors. Concurrent requests for the same
+session on different nodes resolve last-writer-wins, which admission
+control's one-frame-per-session rule makes rare.
+
+If the shared store fails, the request is not failed: RedisSessionState
+falls back to an InProcessSessionState until the store answers again.
+Sessions then smooth per node for the length of the outage.
+
+Frames from a client that sent no session id are never smoothed: their
+label comes straight from the model output and nothing is stored for them,
+since every such client would otherwise share one key.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from model.smoothing import EmotionSmoother, fold_wave, split_waves
+from utils.metrics import Counter
+from utils.structured_log import get_logger, log_event
+
+try:
+    import redis
+except Exception:
+    redis = None
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+SESSION_STATE_URL = os.environ.get("LBE_SESSION_STATE", "process")
+SESSION_STATE_TTL = int(os.environ.get("LBE_SESSION_STATE_TTL", "3600"))  # Seconds
+KEY_PREFIX = "lbe:state:"
+
+# Errors from the shared store that fall back to process-local state
+STORE_ERRORS = (OSError,) if redis is None else (redis.RedisError, OSError)
+
+logger = get_logger("session_state")
+
+SESSION_STATE_FALLBACKS = Counter(
+    "lbe_session_state_fallbacks_total",
+    "Shared session state operations served from process memory after a store error.",
+    ["operation"],
+)
+
+
+def _key_name(key):
+    """Stable string for a state key: session id, or (session id, track id)."""
+    if isinstance(key, tuple):
+        return "#".join(str(part) for part in key)
+    return str(key)
+
+
+def _has_session(key):
+    """Whether a state key belongs to a client that sent a session id."""
+    session = key[0] if isinstance(key, tuple) else key
+    return session is not None and session != ""
+
+
+def _update_sessions(update, label_for, keys, probs):
+    """
+    Run update() on the rows that have a session; the rest are not smoothed.
+
+    Args:
+        update (callable): Backend update for (keys, probs) of known sessions
+        label_for (callable): Maps a class index to an emotion string
+        keys (list): State key per row of probs
+        probs (np.ndarray): (N, num_classes) model probabilities
+
+    Returns:
+        tuple: ((N, num_classes) smoothed probabilities, label per row)
+    """
+    probs = np.asarray(probs, dtype=np.float32)
+    if probs.ndim == 1:
+        probs = probs[np.newaxis, :]
+    known = [i for i, key in enumerate(keys) if _has_session(key)]
+    if len(known) == len(keys):
+        return update(keys, probs)
+
+    smoothed = probs.copy()
+    labels = [label_for(int(c)) for c in probs.argmax(axis=1)]
+    if known:
+        known_smoothed, known_labels = update([keys[i] for i in known], probs[known])
+        smoothed[known] = known_smoothed
+        for i, label in zip(known, known_labels):
+            labels[i] = label
+    return smoothed, labels
+
+
+class InProcessSessionState:
+    """Session state in this process's memory (the default)."""
+
+    def __init__(self, alpha, label_for, max_keys):
+        """
+        Args:
+            alpha (float): EMA weight of the newest model output
+            label_for (callable): Maps a class index to an emotion string
+            max_keys (int): Keys kept before the least recently used is evicted
+        """
+        self.label_for = label_for
+        self.max_keys = max_keys
+        self._smoother = EmotionSmoother(alpha, max_keys=max_keys)
+        self._labels = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, keys, probs):
+        """
+        Fold model outputs into each key's vector and record the new labels.
+
+        Returns:
+            tuple: ((N, num_classes) smoothed probabilities, label per row)
+        """
+        return _update_sessions(self._update, self.label_for, keys, probs)
+
+    def _update(self, keys, probs):
+        smoothed = self._smoother.update(keys, probs)
+        labels = [self.label_for(int(c)) for c in smoothed.argmax(axis=1)]
+        with self._lock:
+            for key, label in zip(keys, labels):
+                self._labels[key] = label
+                self._labels.move_to_end(key)
+            while len(self._labels) > self.max_keys:
+                self._labels.popitem(last=False)
+        return smoothed, labels
+
+    def last_known(self, keys):
+        """Last label per key (None if the key has none or no session)."""
+        with self._lock:
+            return [self._labels.get(key) if _has_session(key) else None for key in keys]
+
+
+class RedisSessionState:
+    """Session state in a shared Redis-compatible store."""
+
+    def __init__(self, client, alpha, label_for, ttl=SESSION_STATE_TTL, max_keys=10000):
+        """
+        Args:
+            client: redis.Redis or LocalRedis
+            alpha (float): EMA weight of the newest model output
+            label_for (callable): Maps a class index to an emotion string
+            ttl (int): Seconds an idle session's state is kept
+            max_keys (int): Keys kept by the in-process fallback
+        """
+        self.client = client
+        self.alpha = float(alpha)
+        self.label_for = label_for
+        self.ttl = ttl
+        self.fallback = InProcessSessionState(alpha, label_for, max_keys)
+        self._degraded = False
+
+    def _store_failed(self, operation, error):
+        SESSION_STATE_FALLBACKS.inc(operation)
+        if not self._degraded:
+            self._degraded = True
+            log_event(logger, logging.WARNING, "session_state_store_failed",
+                      operation=operation, error=str(error))
+
+    def _store_ok(self):
+        if self._degraded:
+            self._degraded = False
+            log_event(logger, logging.INFO, "session_state_store_recovered")
+
+    def update(self, keys, probs):
+        """
+        Fold model outputs into each key's vector and record the new labels.
+
+        Returns:
+            tuple: ((N, num_classes) smoothed probabilities, label per row)
+        """
+        return _update_sessions(self._update_or_fall_back, self.label_for, keys, probs)
+
+    def _update_or_fall_back(self, keys, probs):
+        try:
+            result = self._update(keys, probs)
+        except STORE_ERRORS as e:
+            self._store_failed("update", e)
+            return self.fallback.update(keys, probs)
+        self._store_ok()
+        return result
+
+    def _update(self, keys, probs):
+        num_classes = probs.shape[1]
+        unique = list(dict.fromkeys(keys))
+        slot = {key: i for i, key in enumerate(unique)}
+
+        # Round trip 1: every stored vector this request touches
+        pipe = self.client.pipeline(transaction=False)
+        for key in unique:
+            pipe.hget(KEY_PREFIX + _key_name(key), "p")
+        stored = pipe.execute()
+
+        state = np.zeros((len(unique), num_classes), np.float32)
+        missing = np.ones(len(unique), dtype=bool)
+        for i, raw in enumerate(stored):
+            if raw is not None and len(raw) == num_classes * 4:
+                state[i] = np.frombuffer(raw, dtype=np.float32)
+                missing[i] = False
+
+        smoothed = np.empty_like(probs)
+        for wave_number, wave in enumerate(split_waves(keys)):
+            index = np.fromiter(wave, dtype=np.intp, count=len(wave))
+            rows = np.fromiter((slot[keys[i]] for i in wave), dtype=np.intp, count=len(wave))
+            fresh = missing[rows] if wave_number == 0 else np.zeros(len(wave), dtype=bool)
+            smoothed[index] = fold_wave(state, rows, fresh, probs[index], self.alpha)
+
+        labels = [self.label_for(int(c)) for c in smoothed.argmax(axis=1)]
+        final_labels = [self.label_for(int(c)) for c in state.argmax(axis=1)]
+
+        # Round trip 2: write every updated vector and label
+        pipe = self.client.pipeline(transaction=False)
+        for i, key in enumerate(unique):
+            name = KEY_PREFIX + _key_name(key)
+            pipe.hset(name, mapping={"p": state[i].tobytes(), "l": final_labels[i]})
+            pipe.expire(name, self.ttl)
+        pipe.execute()
+
+        return smoothed, labels
+
+    def last_known(self, keys):
+        """Last label per key (None if the key has none or no session), in one round trip."""
+        known = [key for key in keys if _has_session(key)]
+        if not known:
+            return [None] * len(keys)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key in known:
+                pipe.hget(KEY_PREFIX + _key_name(key), "l")
+            raw_labels = pipe.execute()
+        except STORE_ERRORS as e:
+            self._store_failed("last_known", e)
+            return self.fallback.last_known(keys)
+        self._store_ok()
+        found = iter(raw.decode() if isinstance(raw, bytes) else raw for raw in raw_labels)
+        return [next(found) if _has_session(key) else None for key in keys]
+
+
+# ----------------------------------------
+# LOCAL REDIS STAND-IN
+# ----------------------------------------
+class _LocalPipeline:
+    """Buffers commands and runs them on execute(), like a redis-py pipeline."""
+
+    def __init__(self, store):
+        self._store = store
+        self._commands = []
+
+    def __getattr__(self, name):
+        def buffer(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return buffer
+
+    def execute(self):
+        with self._store._lock:
+            results = [
+                getattr(self._store, "_" + name)(*args, **kwargs)
+                for name, args, kwargs in self._commands
+            ]
+        self._commands = []
+        return results
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the subset of redis.Redis that
+    RedisSessionState uses (hget, hset with mapping, expire, pipeline).
+    Values come back as bytes, like a real client without decode_responses.
+    """
+
+    def __init__(self):
+        self._data = {}  # key -> (hash dict, expires_at or None)
+        self._lock = threading.Lock()
+
+    def pipeline(self, transaction=True):
+        return _LocalPipeline(self)
+
+    def hget(self, name, field):
+        with self._lock:
+            return self._hget(name, field)
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        with self._lock:
+            return self._hset(name, key, value, mapping)
+
+    def expire(self, name, seconds):
+        with self._lock:
+            return self._expire(name, seconds)
+
+    def _live(self, name):
+        entry = self._data.get(name)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[name]
+            return None
+        return entry
+
+    def _hget(self, name, field):
+        entry = self._live(name)
+        return None if entry is None else entry[0].get(field)
+
+    def _hset(self, name, key=None, value=None, mapping=None):
+        entry = self._live(name) or ({}, None)
+        fields = dict(mapping or {})
+        if key is not None:
+            fields[key] = value
+        for field, item in fields.items():
+            entry[0][field] = item.encode() if isinstance(item, str) else bytes(item)
+        self._data[name] = entry
+        return len(fields)
+
+    def _expire(self, name, seconds):
+        entry = self._live(name)
+        if entry is None:
+            return False
+        self._data[name] = (entry[0], time.monotonic() + seconds)
+        return True
+
+
+def create_session_state(alpha, label_for, max_keys, url=SESSION_STATE_URL):
+    """
+    Build the session state backend named by url (see module docstring).
+
+    Raises:
+        RuntimeError: For a redis:// URL when the redis package is missing
+        ValueError: For an unknown scheme
+    """
+    if not url or url == "process":
+        return InProcessSessionState(alpha, label_for, max_keys)
+    if url.startswith("redis+local://"):
+        return RedisSessionState(LocalRedis(), alpha, label_for, max_keys=max_keys)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if redis is None:
+            raise RuntimeError("LBE_SESSION_STATE is a Redis URL but redis is not installed")
+        return RedisSessionState(redis.Redis.from_url(url), alpha, label_for, max_keys=max_keys)
+    raise ValueError(f"Unknown LBE_SESSION_STATE backend: {url}")
@@ -0,0 +1,175 @@
+"""
+Exponentially smoothed emotion probabilities.
+
+Each session (or, in multi-face mode, each tracked face) keeps one
+probability vector, updated with every new model output as
+
+    state = alpha * probs + (1 - alpha) * state
+
+Labels come from the argmax of the smoothed vector, so the full softmax
+output is used instead of a majority vote over argmax classes. All vectors
+live in one (capacity, num_classes) array. A batch of updates is a single
+vectorized NumPy expression over the rows of the keys involved, costing
+O(num_classes) per key.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+DEFAULT_MAX_KEYS = 10000  # Smoothed vectors kept before the least recent is evicted
+INITIAL_CAPACITY = 64
+
+
+def alpha_for_window(window):
+    """EMA weight whose center of mass matches a `window`-frame moving average."""
+    return 2.0 / (window + 1.0)
+
+
+def split_waves(keys):
+    """
+    Group row indices into waves in which no key repeats.
+
+    The k-th occurrence of every key lands in wave k, so applying the
+    waves in order applies each key's rows in order, and every wave can
+    be one vectorized update.
+    """
+    waves = []
+    seen = {}
+    for i, key in enumerate(keys):
+        wave = seen.get(key, 0)
+        seen[key] = wave + 1
+        if wave == len(waves):
+            waves.append([])
+        waves[wave].append(i)
+    return waves
+
+
+def fold_wave(state, rows, fresh, probs, alpha):
+    """
+    Apply one wave of EMA updates to state in place.
+
+    Args:
+        state (np.ndarray): (K, num_classes) smoothed vectors
+        rows (np.ndarray): Row of state updated by each probs row (distinct)
+        fresh (np.ndarray): Bool per row; the first output for a key seeds it
+        probs (np.ndarray): (len(rows), num_classes) new probabilities
+        alpha (float): Weight of the newest output
+
+    Returns:
+        np.ndarray: The updated rows
+    """
+    weight = np.where(fresh, np.float32(1.0), np.float32(alpha))[:, np.newaxis]
+    updated = state[rows] + weight * (probs - state[rows])
+    state[rows] = updated
+    return updated
+
+
+class EmotionSmoother:
+    """One exponentially decayed probability vector per key, LRU-bounded."""
+
+    def __init__(self, alpha, max_keys=DEFAULT_MAX_KEYS):
+        """
+        Args:
+            alpha (float): Weight of the newest output, in (0, 1]
+            max_keys (int): Keys kept before the least recently updated is evicted
+        """
+        self.alpha = float(alpha)
+        self.max_keys = max_keys
+        self._state = None  # (capacity, num_classes) float32, allocated on first update
+        self._rows = OrderedDict()  # key -> row index into _state
+        self._free = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _row_for(self, key, pinned):
+        """
+        Row index for key (allocating one if new) and whether it is new.
+
+        Keys in `pinned` already hold a row in the wave being applied, so
+        they are never evicted; when only they are left, the rows grow past
+        max_keys until _trim() runs at the end of the update.
+        """
+        row = self._rows.get(key)
+        if row is not None:
+            self._rows.move_to_end(key)
+            return row, False
+
+        if len(self._rows) >= self.max_keys:
+            # Pinned keys were just moved to the end, so the oldest key is
+            # only pinned if every key is
+            oldest = next(iter(self._rows))
+            if oldest not in pinned:
+                self._free.append(self._rows.pop(oldest))
+        if not self._free:
+            capacity = len(self._state)
+            grown = min(max(capacity * 2, INITIAL_CAPACITY), max(self.max_keys, capacity + 1))
+            self._state = np.concatenate(
+                [self._state, np.zeros((grown - capacity, self._state.shape[1]), np.float32)]
+            )
+            self._free.extend(range(grown - 1, capacity - 1, -1))
+
+        row = self._rows[key] = self._free.pop()
+        return row, True
+
+    def _trim(self):
+        """Evict the least recently updated keys beyond max_keys."""
+        while len(self._rows) > self.max_keys:
+            _, row = self._rows.popitem(last=False)
+            self._free.append(row)
+
+    def update(self, keys, probs):
+        """
+        Fold a batch of model outputs into the smoothed vectors.
+
+        Args:
+            keys (list): Hashable key per row of probs. A key may repeat;
+                its rows are applied in order.
+            probs (np.ndarray): (N, num_classes) probabilities
+
+        Returns:
+            np.ndarray: (N, num_classes) smoothed probabilities after each update
+        """
+        probs = np.asarray(probs, dtype=np.float32)
+        if probs.ndim == 1:
+            probs = probs[np.newaxis, :]
+        smoothed = np.empty_like(probs)
+
+        with self._lock:
+            if self._state is None or self._state.shape[1] != probs.shape[1]:
+                self._state = np.zeros((INITIAL_CAPACITY, probs.shape[1]), np.float32)
+                self._rows.clear()
+                self._free = list(range(INITIAL_CAPACITY - 1, -1, -1))
+
+            for wave in split_waves(keys):
+                index = np.fromiter(wave, dtype=np.intp, count=len(wave))
+                pinned = set()
+                rows = np.empty(len(wave), dtype=np.intp)
+                fresh = np.empty(len(wave), dtype=bool)
+                for j, i in enumerate(wave):
+                    rows[j], fresh[j] = self._row_for(keys[i], pinned)
+                    pinned.add(keys[i])
+                smoothed[index] = fold_wave(self._state, rows, fresh, probs[index], self.alpha)
+            self._trim()
+
+        return smoothed
+
+    def get(self, key):
+        """Current smoothed vector for key (a copy), or None."""
+        with self._lock:
+            row = self._rows.get(key)
+            return None if row is None else self._state[row].copy()
+
+    def forget(self, key):
+        """Drop key's state, e.g. when its session ends."""
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is not None:
+                self._free.append(row)
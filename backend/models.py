@@ -7,3 +7,62 @@ class EmotionLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     emotion = db.Column(db.String(50), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class EmotionRollup(db.Model):
+    """Per-bucket emotion counts for EmotionLog rows removed by retention."""
+
+    __table_args__ = (
+        db.UniqueConstraint("bucket_start", "emotion", name="uq_rollup_bucket_emotion"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, nullable=False, index=True)
+    emotion = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class EmotionSummary(db.Model):
+    """Per-user emotion counts, overall and per learning module."""
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "scope", "emotion", name="uq_summary_user_scope_emotion"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(255), nullable=False, index=True)
+    scope = db.Column(db.String(32), nullable=False)  # "overall" or a module week
+    emotion = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ModuleProgress(db.Model):
+    """Completion state of one learning module for one user."""
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "module", name="uq_progress_user_module"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(255), nullable=False, index=True)
+    module = db.Column(db.String(32), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    dominant_emotion = db.Column(db.String(50))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SyncCursor(db.Model):
+    """Last progress sync sequence number applied for each client.
+
+    Rows idle for LBE_SYNC_CURSOR_TTL_DAYS are pruned by retention.
+    """
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "client_id", name="uq_cursor_user_client"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(255), nullable=False)
+    client_id = db.Column(db.String(64), nullable=False)
+    last_seq = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -0,0 +1,69 @@
+"""
+Admin API Access Test
+Admin routes must be closed unless LBE_ADMIN_TOKEN is set and sent
+"""
+
+import os
+import sys
+import tempfile
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Keep the test away from the real database
+os.environ.setdefault(
+    "LBE_DATABASE_URI",
+    "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="lbe-test-"), "test.db"),
+)
+
+from app import app
+
+ADMIN_REQUESTS = [
+    ("GET", "/admin/model", None),
+    ("POST", "/admin/model", {"version": "default"}),
+    ("GET", "/admin/export", None),
+    ("GET", "/admin/profile", None),
+    ("GET", "/admin/profile?dump=1&reset=1", None),
+]
+
+TOKEN = "test-admin-token"
+
+
+def _send(client, method, path, body, headers=None):
+    if method == "POST":
+        return client.post(path, json=body, headers=headers or {})
+    return client.get(path, headers=headers or {})
+
+
+def test_admin_denied_without_configured_token():
+    """No LBE_ADMIN_TOKEN: every admin route answers 403, token or not"""
+    os.environ.pop("LBE_ADMIN_TOKEN", None)
+    client = app.test_client()
+    for method, path, body in ADMIN_REQUESTS:
+        assert _send(client, method, path, body).status_code == 403, path
+        response = _send(client, method, path, body, {"X-Admin-Token": ""})
+        assert response.status_code == 403, path
+
+
+def test_admin_requires_matching_token():
+    """LBE_ADMIN_TOKEN set: a missing or wrong token answers 403"""
+    os.environ["LBE_ADMIN_TOKEN"] = TOKEN
+    try:
+        client = app.test_client()
+        for method, path, body in ADMIN_REQUESTS:
+            assert _send(client, method, path, body).status_code == 403, path
+            response = _send(client, method, path, body, {"X-Admin-Token": "wrong"})
+            assert response.status_code == 403, path
+
+        response = client.get("/admin/model", headers={"X-Admin-Token": TOKEN})
+        assert response.status_code == 200
+        response = client.get("/admin/export", headers={"X-Admin-Token": TOKEN})
+        assert response.status_code == 200
+    finally:
+        os.environ.pop("LBE_ADMIN_TOKEN", None)
+
+
+if __name__ == "__main__":
+    test_admin_denied_without_configured_token()
+    test_admin_requires_matching_token()
+    print("✓ Admin routes are closed without a valid token")
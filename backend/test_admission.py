@@ -0,0 +1,100 @@
+"""
+Admission Control Test
+Per-session coalescing, shedding under overload, and expiry in the queue
+"""
+
+import os
+import sys
+import threading
+import time
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from utils.admission import ADMITTED, COALESCED, EXPIRED, SHED, AdmissionController
+
+
+def _admit_async(controller, session_id, timeout=None):
+    """Start admit() on a thread; returns (thread, result list)."""
+    result = []
+    thread = threading.Thread(
+        target=lambda: result.append(controller.admit(session_id, timeout=timeout)), daemon=True
+    )
+    thread.start()
+    return thread, result
+
+
+def _wait_for_waiting(controller, count):
+    for _ in range(200):
+        if controller.waiting == count:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"expected {count} waiting frames, got {controller.waiting}")
+
+
+def test_newer_frame_supersedes_the_waiting_one():
+    controller = AdmissionController(max_in_flight=4, max_waiting=4, wait_timeout=5.0)
+    assert controller.admit("a") == ADMITTED  # a is running
+
+    older, older_result = _admit_async(controller, "a")
+    _wait_for_waiting(controller, 1)
+    newer, newer_result = _admit_async(controller, "a")
+    older.join(1.0)
+    assert older_result == [COALESCED]
+
+    controller.release("a")
+    newer.join(1.0)
+    assert newer_result == [ADMITTED]
+    controller.release("a")
+    assert controller.in_flight == 0 and controller.waiting == 0
+
+
+def test_sessions_are_admitted_independently():
+    controller = AdmissionController(max_in_flight=4, max_waiting=4, wait_timeout=5.0)
+    assert controller.admit("a") == ADMITTED
+    assert controller.admit("b") == ADMITTED  # Not coalesced with a
+    assert controller.in_flight == 2
+    controller.release("a")
+    controller.release("b")
+
+
+def test_full_queue_sheds():
+    controller = AdmissionController(max_in_flight=1, max_waiting=1, wait_timeout=5.0)
+    assert controller.admit("a") == ADMITTED
+    waiting, waiting_result = _admit_async(controller, "b")
+    _wait_for_waiting(controller, 1)
+
+    assert controller.admit("c") == SHED
+
+    controller.release("a")
+    waiting.join(1.0)
+    assert waiting_result == [ADMITTED]
+    controller.release("b")
+
+
+def test_wait_timeout_sheds():
+    controller = AdmissionController(max_in_flight=1, max_waiting=4, wait_timeout=0.05)
+    assert controller.admit("a") == ADMITTED
+    assert controller.admit("b") == SHED
+    assert controller.admit("c", timeout=10.0) == SHED  # Deadline longer than the wait
+    controller.release("a")
+
+
+def test_deadline_passing_in_the_queue_expires():
+    controller = AdmissionController(max_in_flight=1, max_waiting=4, wait_timeout=5.0)
+    assert controller.admit("a") == ADMITTED
+    assert controller.admit("b", timeout=0.05) == EXPIRED
+    assert controller.admit("c", timeout=0) == EXPIRED
+    assert controller.waiting == 0
+    controller.release("a")
+    assert controller.admit("b", timeout=0.05) == ADMITTED
+    controller.release("b")
+
+
+if __name__ == "__main__":
+    test_newer_frame_supersedes_the_waiting_one()
+    test_sessions_are_admitted_independently()
+    test_full_queue_sheds()
+    test_wait_timeout_sheds()
+    test_deadline_passing_in_the_queue_expires()
+    print("✓ Admission coalesces, sheds and expires frames as documented")
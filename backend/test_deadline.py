@@ -0,0 +1,86 @@
+"""
+Frame Deadline Test
+Client budgets must be finite and positive, and deadlines must expire
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Keep the test away from the real database
+os.environ.setdefault(
+    "LBE_DATABASE_URI",
+    "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="lbe-test-"), "test.db"),
+)
+
+from app import app
+from utils.deadline import (
+    DEFAULT_FRAME_DEADLINE_MS,
+    MAX_FRAME_DEADLINE_MS,
+    Deadline,
+    DeadlineExceeded,
+    parse_budget_ms,
+)
+
+
+@pytest.mark.parametrize("value,expected", [
+    (None, None), ("", None), (250, 250.0), ("5000", 5000.0),
+    (10 ** 9, MAX_FRAME_DEADLINE_MS),
+])
+def test_budget_parsing(value, expected):
+    assert parse_budget_ms(value) == expected
+
+
+@pytest.mark.parametrize("value", [
+    float("nan"), "nan", float("inf"), "-inf", 0, -5, "soon", True, [5000],
+])
+def test_invalid_budgets_are_rejected(value):
+    with pytest.raises(ValueError):
+        parse_budget_ms(value)
+    with pytest.raises(ValueError):
+        Deadline.from_request(value)
+
+
+def test_missing_budget_uses_the_default():
+    remaining_ms = Deadline.from_request(None).remaining() * 1000.0
+    assert DEFAULT_FRAME_DEADLINE_MS - 100 < remaining_ms <= DEFAULT_FRAME_DEADLINE_MS
+
+
+def test_deadline_expires():
+    deadline = Deadline.from_request(20)
+    deadline.check("decode")
+    assert not deadline.expired()
+
+    time.sleep(0.03)
+    assert deadline.expired()
+    assert deadline.remaining() < 0
+    with pytest.raises(DeadlineExceeded) as exc:
+        deadline.check("inference")
+    assert exc.value.stage == "inference"
+
+
+def test_emotion_endpoint_rejects_invalid_deadline():
+    client = app.test_client()
+    response = client.post(
+        "/api/emotion",
+        data='{"image": "data:image/jpeg;base64,AAAA", "deadline_ms": NaN}',
+        content_type="application/json",
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        "/api/emotion",
+        json={"image": "data:image/jpeg;base64,AAAA"},
+        headers={"X-Frame-Deadline-Ms": "-1"},
+    )
+    assert response.status_code == 400
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
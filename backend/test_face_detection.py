@@ -0,0 +1,65 @@
+"""
+Face Detection Test
+Downscaled detection must still find faces down to FACE_MIN_SIZE on large
+frames, and a backend without its model files falls back to Haar
+"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+# Add backend and the benchmark frame generator to path
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "benchmarks"))
+
+from frames import draw_face
+from utils import face_detectors
+from utils.face_detectors import FaceDetector, HaarFaceDetector, get_face_detector
+
+
+def _frame_with_face(width, height, face_size):
+    rng = np.random.default_rng(0)
+    frame = rng.integers(70, 150, (height, width, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (3, 3), 0)
+    draw_face(frame, width // 2, height // 2, face_size)
+    return cv2.GaussianBlur(frame, (5, 5), 0)
+
+
+@pytest.mark.parametrize("width,height", [(1280, 720), (1920, 1080)])
+@pytest.mark.parametrize("face_size", [48, 56, 64])
+def test_small_face_found_on_large_frame(width, height, face_size):
+    frame = _frame_with_face(width, height, face_size)
+    detector = HaarFaceDetector()
+    full = detector.detect(frame, downscale=False)
+    downscaled = detector.detect(frame, downscale=True)
+    assert len(full) == 1
+    assert len(downscaled) == 1
+
+
+def test_base_detector_is_abstract():
+    with pytest.raises(TypeError):
+        FaceDetector()
+
+
+def test_missing_model_files_fall_back_to_haar(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(face_detectors, "log_event",
+                        lambda logger, level, event, **fields: warnings.append((event, fields)))
+    monkeypatch.setattr(face_detectors, "_fallback_warned", set())
+    monkeypatch.setattr(face_detectors.SsdFaceDetector, "model_files",
+                        (os.path.join(os.path.dirname(__file__), "missing.caffemodel"),))
+
+    assert isinstance(get_face_detector("ssd"), HaarFaceDetector)
+    assert isinstance(get_face_detector("nonexistent"), HaarFaceDetector)
+    face_detectors._detector_local.detectors.clear()
+    get_face_detector("ssd")  # Warned once per backend, not per lookup
+
+    assert [event for event, _ in warnings] == ["face_detector_fallback", "face_detector_unknown"]
+    assert warnings[0][1]["missing_files"][0].endswith("missing.caffemodel")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
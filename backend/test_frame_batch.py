@@ -0,0 +1,114 @@
+"""
+Batch Upload Parser Test
+Multipart and length-prefixed batches, and the inputs they must reject
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+from werkzeug.datastructures import FileStorage, MultiDict
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Keep the test away from the real database
+os.environ.setdefault(
+    "LBE_DATABASE_URI",
+    "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="lbe-test-"), "test.db"),
+)
+
+from app import app
+from utils.frame_batch import (
+    MAX_BATCH_FRAMES,
+    RECORD_HEADER,
+    BatchFormatError,
+    parse_length_prefixed,
+    parse_multipart,
+)
+
+NOW_MS = int(time.time() * 1000)
+
+
+def _record(timestamp_ms, image):
+    return RECORD_HEADER.pack(timestamp_ms, len(image)) + image
+
+
+def _files(*images):
+    return MultiDict([
+        ("frames", FileStorage(io.BytesIO(image), filename=f"{i}.jpg"))
+        for i, image in enumerate(images)
+    ])
+
+
+def test_length_prefixed_frames():
+    body = _record(NOW_MS, b"first") + _record(NOW_MS + 200, b"second")
+    assert parse_length_prefixed(body) == [(NOW_MS, b"first"), (NOW_MS + 200, b"second")]
+
+
+def test_length_prefixed_zero_timestamp_means_now():
+    assert parse_length_prefixed(_record(0, b"frame")) == [(None, b"frame")]
+
+
+@pytest.mark.parametrize("body", [
+    _record(NOW_MS, b"frame")[:5],                       # Truncated header
+    _record(NOW_MS, b"frame")[:-1],                      # Truncated image
+    _record(NOW_MS, b""),                                # Empty image
+    _record(1, b"frame"),                                # 1970
+    _record(NOW_MS + 7 * 24 * 3600 * 1000, b"frame"),    # A week ahead
+    _record(2 ** 64 - 1, b"frame"),
+    _record(NOW_MS, b"f") * (MAX_BATCH_FRAMES + 1),
+])
+def test_length_prefixed_rejects(body):
+    with pytest.raises(BatchFormatError):
+        parse_length_prefixed(body)
+
+
+def test_multipart_frames_and_timestamps():
+    form = MultiDict([("timestamps", f"{NOW_MS},{NOW_MS + 200}")])
+    frames = parse_multipart(_files(b"first", b"second"), form)
+    assert frames == [(NOW_MS, b"first"), (NOW_MS + 200, b"second")]
+
+    form = MultiDict([("timestamps", str(NOW_MS)), ("timestamps", "0")])
+    assert parse_multipart(_files(b"a", b"b"), form) == [(NOW_MS, b"a"), (None, b"b")]
+
+
+def test_multipart_without_timestamps_means_now():
+    assert parse_multipart(_files(b"a", b"b"), MultiDict()) == [(None, b"a"), (None, b"b")]
+
+
+@pytest.mark.parametrize("timestamps", [
+    "inf", "-inf", "nan", "1e400", "abc", "1", f"{NOW_MS},{NOW_MS}",
+])
+def test_multipart_rejects_timestamps(timestamps):
+    with pytest.raises(BatchFormatError):
+        parse_multipart(_files(b"frame"), MultiDict([("timestamps", timestamps)]))
+
+
+def test_multipart_rejects_empty_frame():
+    with pytest.raises(BatchFormatError):
+        parse_multipart(_files(b"frame", b""), MultiDict())
+
+
+def test_batch_endpoint_answers_400_for_bad_timestamps():
+    client = app.test_client()
+    response = client.post(
+        "/api/emotion/batch",
+        data={"frames": (io.BytesIO(b"frame"), "0.jpg"), "timestamps": "inf"},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        "/api/emotion/batch",
+        data=_record(1, b"frame"),
+        content_type="application/octet-stream",
+    )
+    assert response.status_code == 400
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,76 @@
+"""
+Model Registry Test
+Version names, hot swap with in-flight leases, and the admin endpoint
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Keep the test away from the real database
+os.environ.setdefault(
+    "LBE_DATABASE_URI",
+    "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="lbe-test-"), "test.db"),
+)
+
+from app import app
+from model.registry import ModelRegistry
+
+
+def _registry(*versions):
+    """A registry over fresh version directories, loading each as its path."""
+    registry_dir = tempfile.mkdtemp(prefix="lbe-registry-")
+    for name in versions:
+        os.makedirs(os.path.join(registry_dir, name))
+    released = []
+    registry = ModelRegistry(loader=lambda path: {"path": path},
+                             on_release=released.append, registry_dir=registry_dir)
+    return registry, released
+
+
+@pytest.mark.parametrize("name", [".", "..", ".hidden", "v1/..", "../v1", "", None, "v1\x00"])
+def test_version_names_are_plain_directory_names(name):
+    registry, _ = _registry("v1", ".hidden")
+    assert registry.version_path(name) is None
+    assert registry.activate(name, wait=True) is False
+
+
+def test_available_versions_skip_hidden_directories():
+    registry, _ = _registry("v1", "v2.1", ".hidden")
+    assert registry.available_versions() == ["v1", "v2.1"]
+    assert registry.version_path("v2.1") == os.path.join(registry.registry_dir, "v2.1")
+
+
+def test_swap_waits_for_in_flight_leases():
+    registry, released = _registry("v1", "v2")
+    assert registry.active().name == "v2"  # Newest version by name
+
+    with registry.lease() as old:
+        assert registry.activate("v1", wait=True)
+        assert registry.active().name == "v1"
+        assert old.name == "v2" and old.model is not None
+        assert released == []
+
+    assert released == [{"path": os.path.join(registry.registry_dir, "v2")}]
+    assert old.model is None
+
+
+def test_admin_rejects_path_like_versions():
+    os.environ["LBE_ADMIN_TOKEN"] = "test-admin-token"
+    try:
+        client = app.test_client()
+        for name in ("..", ".", "../versions"):
+            response = client.post("/admin/model", json={"version": name},
+                                   headers={"X-Admin-Token": "test-admin-token"})
+            assert response.status_code == 404, name
+    finally:
+        os.environ.pop("LBE_ADMIN_TOKEN", None)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
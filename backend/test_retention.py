@@ -0,0 +1,73 @@
+"""
+Retention Compaction Test
+Two runs compacting the same chunk must leave exactly one archive of it
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Keep the test away from the real database
+os.environ.setdefault(
+    "LBE_DATABASE_URI",
+    "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="lbe-test-"), "test.db"),
+)
+
+from app import app
+from models import db, EmotionLog, EmotionRollup
+from utils import retention
+
+
+def _old_chunk(count):
+    """Insert `count` rows older than the retention cutoff and select them as one chunk."""
+    now = datetime.now()
+    start = now - timedelta(days=retention.RETENTION_DAYS + 5)
+    db.session.add_all([
+        EmotionLog(emotion="Happy", timestamp=start + timedelta(minutes=i))
+        for i in range(count)
+    ])
+    db.session.commit()
+    cutoff = now - timedelta(days=retention.RETENTION_DAYS)
+    rows = retention._select_chunk(cutoff, 0, count)
+    db.session.rollback()
+    return rows, cutoff
+
+
+def test_same_chunk_compacted_twice():
+    """The losing run removes only its own archive; the winner's stays complete"""
+    archive_dir = tempfile.mkdtemp(prefix="lbe-archive-")
+    with app.app_context():
+        EmotionLog.query.delete()
+        EmotionRollup.query.delete()
+        db.session.commit()
+        rows, cutoff = _old_chunk(10)
+
+        first = retention._compact_chunk(rows, cutoff, archive_dir)
+        second = retention._compact_chunk(rows, cutoff, archive_dir)
+
+        assert first is not None
+        assert second is None
+        assert os.listdir(archive_dir) == [os.path.basename(first)]
+        assert [r[0] for r in retention.read_archive(first)] == [r[0] for r in rows]
+        assert EmotionLog.query.count() == 0
+        assert sum(r.count for r in EmotionRollup.query) == len(rows)
+
+
+def test_concurrent_archives_get_distinct_names():
+    """Archives of the same rows never share a file name"""
+    archive_dir = tempfile.mkdtemp(prefix="lbe-archive-")
+    rows = [(1, "Happy", datetime(2024, 1, 1)), (2, "Sad", datetime(2024, 1, 1, 0, 1))]
+    first = retention.write_archive(rows, archive_dir)
+    second = retention.write_archive(rows, archive_dir)
+    assert first != second
+    assert retention.read_archive(first) == retention.read_archive(second) == rows
+
+
+if __name__ == "__main__":
+    test_same_chunk_compacted_twice()
+    test_concurrent_archives_get_distinct_names()
+    print("✓ Racing retention runs keep exactly one archive per chunk")
@@ -0,0 +1,128 @@
+"""
+Session State Test
+Clients without a session id share no state, and a failing shared store
+falls back to process memory and recovers
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from model.session_state import (
+    SESSION_STATE_FALLBACKS,
+    InProcessSessionState,
+    LocalRedis,
+    RedisSessionState,
+)
+from model.smoothing import alpha_for_window
+from utils.face_tracker import FaceTracker
+
+ALPHA = alpha_for_window(3)
+LABELS = ["Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Neutral"]
+
+
+def _label_for(class_idx):
+    return LABELS[class_idx]
+
+
+def _onehot(class_idx, weight=0.9):
+    probs = np.full(len(LABELS), (1 - weight) / (len(LABELS) - 1), np.float32)
+    probs[class_idx] = weight
+    return probs
+
+
+class FlakyRedis(LocalRedis):
+    """LocalRedis whose pipelines fail while `down` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.down = False
+
+    def pipeline(self, transaction=True):
+        pipe = super().pipeline(transaction)
+        if self.down:
+            def execute():
+                raise ConnectionError("store unreachable")
+            pipe.execute = execute
+        return pipe
+
+
+def _backends():
+    return [
+        InProcessSessionState(ALPHA, _label_for, 100),
+        RedisSessionState(LocalRedis(), ALPHA, _label_for, max_keys=100),
+    ]
+
+
+@pytest.mark.parametrize("state", _backends(), ids=["process", "redis"])
+def test_clients_without_an_id_share_no_state(state):
+    state.update([None], _onehot(3)[np.newaxis, :])
+    smoothed, labels = state.update([None, (None, 1)], np.stack([_onehot(4), _onehot(0)]))
+
+    # Not mixed with the earlier id-less frame: the raw output, unsmoothed
+    np.testing.assert_allclose(smoothed, np.stack([_onehot(4), _onehot(0)]))
+    assert labels == ["Sad", "Angry"]
+    assert state.last_known([None, (None, 1)]) == [None, None]
+
+
+@pytest.mark.parametrize("state", _backends(), ids=["process", "redis"])
+def test_rows_with_an_id_are_still_smoothed_alongside(state):
+    state.update(["a"], _onehot(3)[np.newaxis, :])
+    smoothed, labels = state.update(["a", None], np.stack([_onehot(4, 0.5), _onehot(4, 0.5)]))
+
+    assert labels == ["Happy", "Sad"]  # "a" keeps its history, None does not
+    np.testing.assert_allclose(smoothed[1], _onehot(4, 0.5))
+    assert state.last_known(["a", None, "b"]) == ["Happy", None, None]
+
+
+def test_faces_without_a_session_are_not_tracked():
+    tracker = FaceTracker()
+    assert tracker.update(None, [(0, 0, 50, 50)]) == [1]
+    assert tracker.update(None, [(200, 0, 50, 50), (0, 0, 50, 50)]) == [1, 2]
+    assert tracker.update("a", [(0, 0, 50, 50)]) == [1]
+    assert tracker.update("a", [(200, 0, 50, 50), (0, 0, 50, 50)]) == [2, 1]
+
+
+def test_redis_matches_in_process_state():
+    rng = np.random.default_rng(0)
+    keys = ["a", "b", "a", ("a", 1), "b", "a"]
+    probs = rng.random((len(keys), len(LABELS))).astype(np.float32)
+    probs /= probs.sum(axis=1, keepdims=True)
+
+    local = InProcessSessionState(ALPHA, _label_for, 100)
+    shared = RedisSessionState(LocalRedis(), ALPHA, _label_for, max_keys=100)
+    for batch in (slice(0, 3), slice(3, 6)):
+        expected, expected_labels = local.update(keys[batch], probs[batch])
+        smoothed, labels = shared.update(keys[batch], probs[batch])
+        np.testing.assert_allclose(smoothed, expected, rtol=1e-6)
+        assert labels == expected_labels
+    assert shared.last_known(["a", "b", ("a", 1)]) == local.last_known(["a", "b", ("a", 1)])
+
+
+def test_store_failure_falls_back_and_recovers():
+    client = FlakyRedis()
+    state = RedisSessionState(client, ALPHA, _label_for, max_keys=100)
+    state.update(["a"], _onehot(3)[np.newaxis, :])
+    updates_before = SESSION_STATE_FALLBACKS.value("update")
+    reads_before = SESSION_STATE_FALLBACKS.value("last_known")
+
+    client.down = True
+    _, labels = state.update(["a"], _onehot(4)[np.newaxis, :])
+    assert labels == ["Sad"]  # Served by the fallback, which has no history for "a"
+    assert state.last_known(["a"]) == ["Sad"]
+    assert SESSION_STATE_FALLBACKS.value("update") == updates_before + 1
+    assert SESSION_STATE_FALLBACKS.value("last_known") == reads_before + 1
+
+    client.down = False
+    assert state.last_known(["a"]) == ["Happy"]  # The shared store again
+    _, labels = state.update(["a"], _onehot(3)[np.newaxis, :])
+    assert labels == ["Happy"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,118 @@
+"""
+Emotion Smoothing Test
+The batched, wave-split EMA must match feeding frames one at a time
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from model import smoothing
+from model.smoothing import EmotionSmoother, alpha_for_window, split_waves
+
+ALPHA = alpha_for_window(3)
+NUM_CLASSES = 7
+
+
+def _probs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    probs = rng.random((n, NUM_CLASSES)).astype(np.float32)
+    return probs / probs.sum(axis=1, keepdims=True)
+
+
+def _reference(keys, probs, alpha=ALPHA):
+    """Plain per-frame EMA, one key at a time."""
+    state, out = {}, []
+    for key, p in zip(keys, probs):
+        state[key] = p.copy() if key not in state else alpha * p + (1 - alpha) * state[key]
+        out.append(state[key])
+    return np.array(out)
+
+
+def test_split_waves_keeps_each_key_in_order():
+    assert split_waves(["a", "b", "a", "c", "a", "b"]) == [[0, 1, 3], [2, 5], [4]]
+
+
+def test_repeated_keys_in_one_batch_match_unbatched_updates():
+    keys = ["a", "b", "a", "a", "c", "b", "a"]
+    probs = _probs(len(keys))
+
+    batched = EmotionSmoother(ALPHA).update(keys, probs)
+
+    unbatched = EmotionSmoother(ALPHA)
+    one_at_a_time = np.concatenate([unbatched.update([k], p) for k, p in zip(keys, probs)])
+
+    np.testing.assert_allclose(batched, one_at_a_time, rtol=1e-6)
+    np.testing.assert_allclose(batched, _reference(keys, probs), rtol=1e-5)
+
+
+def test_first_output_seeds_the_state():
+    smoother = EmotionSmoother(ALPHA)
+    probs = _probs(1)
+    np.testing.assert_allclose(smoother.update(["a"], probs), probs)
+    np.testing.assert_allclose(smoother.get("a"), probs[0])
+
+
+def test_least_recent_key_is_evicted():
+    smoother = EmotionSmoother(ALPHA, max_keys=2)
+    smoother.update(["a"], _probs(1, 1))
+    smoother.update(["b"], _probs(1, 2))
+    smoother.update(["a"], _probs(1, 3))  # "b" is now the least recent
+    smoother.update(["c"], _probs(1, 4))
+
+    assert len(smoother) == 2
+    assert smoother.get("b") is None
+    assert smoother.get("a") is not None and smoother.get("c") is not None
+
+
+def test_wave_with_more_keys_than_capacity(monkeypatch):
+    """Keys of the wave being applied are never evicted to make room for each other"""
+    waves = []
+    fold_wave = smoothing.fold_wave
+
+    def recording_fold_wave(state, rows, fresh, probs, alpha):
+        waves.append(rows.copy())
+        return fold_wave(state, rows, fresh, probs, alpha)
+
+    monkeypatch.setattr(smoothing, "fold_wave", recording_fold_wave)
+    keys = [f"k{i}" for i in range(10)]
+    probs = _probs(len(keys))
+    smoother = EmotionSmoother(ALPHA, max_keys=4)
+    smoother.update(["old"], _probs(1, 9))
+
+    smoothed = smoother.update(keys, probs)
+
+    assert len(set(waves[-1].tolist())) == len(keys)  # One row per key of the wave
+
+    np.testing.assert_allclose(smoothed, probs, rtol=1e-6)  # All fresh: seeded, not mixed
+    assert len(smoother) == 4
+    assert smoother.get("old") is None
+    for key, p in zip(keys[-4:], probs[-4:]):
+        np.testing.assert_allclose(smoother.get(key), p, rtol=1e-6)
+
+
+def test_eviction_under_repeated_keys_matches_reference():
+    """A small capacity with repeats still smooths every surviving key exactly"""
+    rng = np.random.default_rng(3)
+    keys = [f"k{i}" for i in rng.integers(0, 3, 40)]
+    probs = _probs(len(keys), 5)
+    smoother = EmotionSmoother(ALPHA, max_keys=3)
+    for start in range(0, len(keys), 8):
+        batch = slice(start, start + 8)
+        np.testing.assert_allclose(
+            smoother.update(keys[batch], probs[batch]),
+            _reference(keys, probs)[batch], rtol=1e-5,
+        )
+
+
+if __name__ == "__main__":
+    test_split_waves_keeps_each_key_in_order()
+    test_repeated_keys_in_one_batch_match_unbatched_updates()
+    test_first_output_seeds_the_state()
+    test_least_recent_key_is_evicted()
+    test_eviction_under_repeated_keys_matches_reference()
+    print("✓ Batched smoothing matches per-frame smoothing")
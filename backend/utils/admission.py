@@ -0,0 +1,170 @@
+"""
+Admission control and load shedding for /api/emotion.
+
+Bounds the work in the emotion pipeline so tail latency stays flat under
+overload instead of growing with a queue of stale frames:
+
+- At most MAX_IN_FLIGHT frames run through validation/inference at once.
+- Each session runs at most one frame at a time and keeps at most one
+  waiting frame. A newer frame from the same session supersedes the waiting
+  one, which is answered immediately as "coalesced", so only the newest
+  frame per session is processed.
+- Frames that cannot start within ADMISSION_WAIT_TIMEOUT, or arrive when
+  MAX_WAITING frames are already queued, are shed.
+- Frames whose own deadline (see utils.deadline) passes while they wait
+  are expired, not shed: the server is not necessarily overloaded, the
+  frame is just stale.
+
+Rejected frames get a lightweight response with the session's last known
+emotion instead of a model result.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import ADMISSION_DECISIONS, IN_FLIGHT, WAITING
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+MAX_IN_FLIGHT = int(os.environ.get("LBE_MAX_IN_FLIGHT", str(max(2, os.cpu_count() or 2))))
+MAX_WAITING = int(os.environ.get("LBE_MAX_WAITING", str(4 * MAX_IN_FLIGHT)))
+ADMISSION_WAIT_TIMEOUT = float(os.environ.get("LBE_ADMISSION_WAIT_TIMEOUT", "1.0"))
+RETRY_AFTER_SECONDS = 1
+LAST_KNOWN_CAPACITY = 10000  # Sessions whose last response is remembered
+
+ADMITTED = "admitted"
+COALESCED = "coalesced"
+SHED = "shed"
+EXPIRED = "expired"  # The frame's deadline passed while waiting or mid-pipeline
+
+
+class _SessionState:
+    __slots__ = ("running", "pending", "seq")
+
+    def __init__(self):
+        self.running = False
+        self.pending = None  # ticket of the waiting frame, if any
+        self.seq = 0
+
+
+class AdmissionController:
+    """Tracks in-flight and per-session outstanding frames."""
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, max_waiting=MAX_WAITING,
+                 wait_timeout=ADMISSION_WAIT_TIMEOUT):
+        """
+        Args:
+            max_in_flight (int): Frames allowed in the pipeline at once
+            max_waiting (int): Frames allowed to wait for a slot
+            wait_timeout (float): Seconds a frame may wait before it is shed
+        """
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._sessions = {}
+        self._last_known = OrderedDict()
+        self._cond = threading.Condition()
+
+    def admit(self, session_id, timeout=None):
+        """
+        Wait for a pipeline slot for this session's frame.
+
+        Args:
+            session_id (str): Client session the frame belongs to
+            timeout (float): Seconds left before the frame's deadline; the
+                wait is capped at wait_timeout
+
+        Returns:
+            str: ADMITTED (caller must call release), COALESCED, SHED, or
+                EXPIRED if the deadline passes first
+        """
+        if timeout is not None and timeout <= 0:
+            decision = EXPIRED
+        else:
+            expires = timeout is not None and timeout < self.wait_timeout
+            wait = timeout if expires else self.wait_timeout
+            decision = self._admit(session_id, wait, EXPIRED if expires else SHED)
+        ADMISSION_DECISIONS.inc(decision)
+        return decision
+
+    def _admit(self, session_id, wait, on_timeout):
+        with self._cond:
+            state = self._sessions.get(session_id)
+            if state is None:
+                state = self._sessions[session_id] = _SessionState()
+
+            if (not state.running and state.pending is None
+                    and self.in_flight < self.max_in_flight):
+                self._start(state)
+                return ADMITTED
+
+            if self.waiting >= self.max_waiting and state.pending is None:
+                self._forget_if_idle(session_id, state)
+                return SHED
+
+            # Become the session's newest waiting frame, superseding any older one
+            state.seq += 1
+            ticket = state.pending = state.seq
+            self.waiting += 1
+            WAITING.set(self.waiting)
+            self._cond.notify_all()
+
+            deadline = time.monotonic() + wait
+            try:
+                while True:
+                    if state.pending != ticket:
+                        return COALESCED
+                    if not state.running and self.in_flight < self.max_in_flight:
+                        state.pending = None
+                        self._start(state)
+                        return ADMITTED
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        state.pending = None
+                        self._forget_if_idle(session_id, state)
+                        return on_timeout
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+                WAITING.set(self.waiting)
+
+    def _start(self, state):
+        state.running = True
+        self.in_flight += 1
+        IN_FLIGHT.set(self.in_flight)
+
+    def _forget_if_idle(self, session_id, state):
+        if not state.running and state.pending is None:
+            self._sessions.pop(session_id, None)
+
+    def release(self, session_id):
+        """Mark this session's running frame as finished."""
+        with self._cond:
+            self.in_flight -= 1
+            IN_FLIGHT.set(self.in_flight)
+            state = self._sessions.get(session_id)
+            if state is not None:
+                state.running = False
+                self._forget_if_idle(session_id, state)
+            self._cond.notify_all()
+
+    def remember(self, session_id, response):
+        """Store the last response sent to a session."""
+        with self._cond:
+            self._last_known[session_id] = response
+            self._last_known.move_to_end(session_id)
+            while len(self._last_known) > LAST_KNOWN_CAPACITY:
+                self._last_known.popitem(last=False)
+
+    def last_known(self, session_id):
+        """Last response sent to a session, or None."""
+        return self._last_known.get(session_id)
+
+
+ADMISSION = AdmissionController()
@@ -0,0 +1,176 @@
+"""
+Live emotion-count stream for analytics dashboards.
+
+A flusher thread reads the EmotionLog rows written since the last flush,
+as one GROUP BY over the new id range per COALESCE_INTERVAL, and sends the
+counts to every subscriber as one coalesced delta. The cost does not grow
+with write rate or dashboard count, and nothing re-aggregates the table.
+The rows are read from the database, so a dashboard sees the rows every
+worker process wrote, not only its own.
+
+Subscribers receive Server-Sent Events:
+- "snapshot": full {emotion: count} map up to the delta cursor, sent once
+  on connect
+- "delta":    {emotion: increment} for rows above the previous delta
+- comments:   periodic keep-alives
+
+Every row id is counted once: the snapshot covers ids up to the cursor at
+subscribe time, and deltas only cover ids above it. This relies on ids
+becoming visible in increasing order, as they do with SQLite's single
+writer.
+
+The stream carries class-wide EmotionLog counts for the Analytics
+dashboard; per-user progress is in utils.progress_sync.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+
+from utils.structured_log import get_logger, log_event
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+COALESCE_INTERVAL = 1.0  # Seconds between delta flushes
+HEARTBEAT_INTERVAL = 15.0  # Seconds between keep-alive comments
+SUBSCRIBER_QUEUE_SIZE = 64  # Pending deltas per subscriber before it is dropped
+
+logger = get_logger("analytics_stream")
+
+
+def format_sse(event, data):
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class AnalyticsBroadcaster:
+    """Reads new emotion rows once per interval and fans the counts out to SSE subscribers."""
+
+    def __init__(self, coalesce_interval=COALESCE_INTERVAL):
+        self.coalesce_interval = coalesce_interval
+        self._counts_fn = None
+        self._latest_id_fn = None
+        self._cursor = 0  # Highest row id covered by sent deltas
+        self._generation = 0  # Bumped when the cursor is reset
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def set_source(self, counts_fn, latest_id_fn):
+        """
+        Set where counts are read from.
+
+        Args:
+            counts_fn (callable): counts_fn(after_id, upto_id) returns the
+                {emotion: count} map of rows with after_id < id <= upto_id;
+                after_id None means all rows, including compacted ones
+            latest_id_fn (callable): Returns the highest row id (0 if none)
+        """
+        self._counts_fn = counts_fn
+        self._latest_id_fn = latest_id_fn
+
+    def subscribe(self):
+        """
+        Register a subscriber and take its initial snapshot.
+
+        Returns:
+            tuple: (subscriber queue, snapshot dict)
+        """
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Without subscribers the cursor is not advanced; start from the
+        # latest row instead of sending an idle period as the first delta
+        latest = self._latest_id_fn()
+        with self._lock:
+            if not self._subscribers:
+                self._cursor = latest
+                self._generation += 1
+            self._subscribers.add(subscriber)
+            self._ensure_flusher()
+            cursor = self._cursor
+
+        # The query runs outside the lock, so a slow snapshot does not hold
+        # up deltas to the other subscribers. Rows above the cursor reach
+        # this subscriber in the next delta.
+        try:
+            snapshot = self._counts_fn(None, cursor)
+        except Exception:
+            self.unsubscribe(subscriber)
+            raise
+        return subscriber, snapshot
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _ensure_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(
+                target=self._run, name="lbe-analytics-stream", daemon=True
+            )
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.coalesce_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                log_event(logger, logging.ERROR, "analytics_stream_flush_failed", error=str(e))
+
+    def flush(self):
+        """Send the counts of rows written since the last flush to every subscriber."""
+        with self._lock:
+            if not self._subscribers:
+                return
+            cursor, generation = self._cursor, self._generation
+
+        latest = self._latest_id_fn()
+        if latest <= cursor:
+            return
+        delta = self._counts_fn(cursor, latest)
+
+        with self._lock:
+            if self._generation != generation:
+                # Every subscriber left and a new one reset the cursor meanwhile
+                return
+            self._cursor = latest
+            subscribers = list(self._subscribers)
+        if not delta:
+            return
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(delta)
+            except queue.Full:
+                # A stalled client would only get stale data; drop it so it
+                # reconnects and resynchronises from a fresh snapshot
+                self.unsubscribe(subscriber)
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def stream(self, subscriber, snapshot):
+        """Generator yielding SSE text for one subscriber."""
+        try:
+            yield "retry: 3000\n\n"
+            yield format_sse("snapshot", snapshot)
+            while True:
+                try:
+                    delta = subscriber.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if delta is None:
+                    return
+                yield format_sse("delta", delta)
+        finally:
+            self.unsubscribe(subscriber)
+
+
+BROADCASTER = AnalyticsBroadcaster()
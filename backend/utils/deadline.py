@@ -0,0 +1,132 @@
+"""
+Per-frame deadlines for the emotion pipeline.
+
+A frame older than the client's capture interval is worthless: the next
+frame is already on its way. Each request gets a Deadline; every stage of
+validation and inference calls deadline.check(stage) before starting, and
+expired frames are dropped by raising DeadlineExceeded.
+
+Expired work is counted per stage. The CPU time saved is estimated from
+the mean duration of the stages that were skipped, based on the stage
+latency histogram.
+"""
+
+import math
+import os
+import time
+
+from utils.metrics import Counter, STAGE_SECONDS
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+DEFAULT_FRAME_DEADLINE_MS = float(os.environ.get("LBE_FRAME_DEADLINE_MS", "5000"))
+MAX_FRAME_DEADLINE_MS = 60000.0
+
+# /api/emotion stages in execution order
+PIPELINE_STAGES = (
+    "decode", "brightness", "blur", "face_detection",
+    "face_extraction", "preprocess", "inference", "db_commit",
+)
+
+DEADLINE_EXPIRED = Counter(
+    "lbe_deadline_expired_total",
+    "Frames dropped because their deadline passed, by the stage they reached.",
+    ["stage"],
+)
+DEADLINE_SAVED_SECONDS = Counter(
+    "lbe_deadline_saved_seconds_total",
+    "Estimated pipeline time skipped by dropping expired frames.",
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a frame's deadline passes before a stage starts."""
+
+    def __init__(self, stage):
+        super().__init__(f"Deadline exceeded before stage '{stage}'")
+        self.stage = stage
+
+
+def parse_budget_ms(value):
+    """
+    Parse a client-supplied deadline budget in milliseconds.
+
+    Returns:
+        float or None: The budget, capped at MAX_FRAME_DEADLINE_MS, or None
+            if the client sent none
+
+    Raises:
+        ValueError: If the value is not a finite, positive number
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"Not a deadline: {value!r}")
+    try:
+        budget_ms = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Not a deadline: {value!r}")
+    if not math.isfinite(budget_ms) or budget_ms <= 0:
+        raise ValueError(f"Deadline must be finite and positive: {value!r}")
+    return min(budget_ms, MAX_FRAME_DEADLINE_MS)
+
+
+def _estimated_remaining_seconds(stage):
+    """Mean observed duration of stage and every stage after it."""
+    try:
+        start = PIPELINE_STAGES.index(stage)
+    except ValueError:
+        return 0.0
+    return sum(STAGE_SECONDS.mean(s) for s in PIPELINE_STAGES[start:])
+
+
+class Deadline:
+    """Absolute point in time after which a frame should be dropped."""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, budget_ms):
+        """
+        Args:
+            budget_ms (float): Milliseconds from now until the frame expires
+        """
+        self.expires_at = time.monotonic() + budget_ms / 1000.0
+
+    @classmethod
+    def from_request(cls, value=None):
+        """
+        Build a deadline from a client-supplied budget in milliseconds.
+
+        A missing value falls back to LBE_FRAME_DEADLINE_MS, and budgets are
+        capped at MAX_FRAME_DEADLINE_MS.
+
+        Raises:
+            ValueError: If the value is not a finite, positive number (a NaN
+                budget would otherwise never expire)
+        """
+        budget_ms = parse_budget_ms(value)
+        if budget_ms is None:
+            budget_ms = DEFAULT_FRAME_DEADLINE_MS
+        return cls(budget_ms)
+
+    def remaining(self):
+        """Seconds left before the deadline (negative once expired)."""
+        return self.expires_at - time.monotonic()
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage):
+        """Raise DeadlineExceeded if the deadline passed before `stage` starts."""
+        if time.monotonic() >= self.expires_at:
+            DEADLINE_EXPIRED.inc(stage)
+            DEADLINE_SAVED_SECONDS.inc(amount=_estimated_remaining_seconds(stage))
+            raise DeadlineExceeded(stage)
+
+
+def check_deadline(deadline, stage):
+    """deadline.check(stage), tolerating deadline=None."""
+    if deadline is not None:
+        deadline.check(stage)
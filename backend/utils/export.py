@@ -0,0 +1,181 @@
+"""
+Streaming bulk export of EmotionLog.
+
+Rows are read with yield_per, so SQLAlchemy fetches LBE_EXPORT_CHUNK_ROWS
+rows at a time from the cursor (a server-side cursor on databases that
+have them) instead of loading the table. Each chunk is encoded and
+yielded before the next is fetched. Memory stays constant in the table
+size, for both the /admin/export response and the `flask export` CLI.
+/admin/export needs the LBE_ADMIN_TOKEN in X-Admin-Token, and is closed
+when no token is configured.
+
+Formats:
+- ndjson: one JSON object per line (id, emotion, timestamp in ISO 8601)
+- csv: a header row, then one row per record
+- arrow: an Arrow IPC stream with one record batch per chunk (needs the
+  optional `pyarrow` package)
+
+Rows compacted by retention are not in EmotionLog; they are in the
+archive files and EmotionRollup (see utils.retention).
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import datetime
+
+from models import db, EmotionLog
+
+try:
+    import pyarrow as pa
+except Exception:
+    pa = None
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+EXPORT_CHUNK_ROWS = int(os.environ.get("LBE_EXPORT_CHUNK_ROWS", "5000"))
+
+MIMETYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+COLUMNS = ("id", "emotion", "timestamp")
+
+
+class ExportError(ValueError):
+    """Raised for an unsupported format or malformed filter."""
+
+
+def parse_time(value):
+    """
+    Parse an ISO 8601 filter bound to the naive datetimes EmotionLog stores.
+
+    /api/emotion stamps rows with the server's local time, so a bound with
+    a UTC offset is converted to local time; a naive bound is taken as
+    local time already.
+
+    Returns:
+        datetime or None: None if value is empty
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ExportError(f"Invalid timestamp: {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def parse_emotions(values):
+    """Emotion filter from repeated and/or comma-separated values (None = all)."""
+    emotions = [e.strip() for value in values for e in value.split(",") if e.strip()]
+    return emotions or None
+
+
+def check_format(fmt):
+    if fmt not in MIMETYPES:
+        raise ExportError(f"Unknown format {fmt!r}, expected one of: {', '.join(MIMETYPES)}")
+    if fmt == "arrow" and pa is None:
+        raise ExportError("Arrow export needs the pyarrow package")
+
+
+def iter_chunks(start=None, end=None, emotions=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yield EmotionLog rows in id order, chunk_rows (id, emotion, timestamp) tuples at a time.
+
+    Args:
+        start (datetime): Inclusive lower bound on timestamp
+        end (datetime): Exclusive upper bound on timestamp
+        emotions (list): Only these emotions (None = all)
+        chunk_rows (int): Rows fetched from the cursor per chunk
+    """
+    query = db.select(EmotionLog.id, EmotionLog.emotion, EmotionLog.timestamp)
+    if start is not None:
+        query = query.where(EmotionLog.timestamp >= start)
+    if end is not None:
+        query = query.where(EmotionLog.timestamp < end)
+    if emotions:
+        query = query.where(EmotionLog.emotion.in_(emotions))
+    query = query.order_by(EmotionLog.id).execution_options(yield_per=chunk_rows)
+
+    result = db.session.execute(query)
+    try:
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+    finally:
+        result.close()
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _encode_ndjson(chunks):
+    for rows in chunks:
+        yield "".join(
+            json.dumps({"id": row_id, "emotion": emotion, "timestamp": _isoformat(ts)}) + "\n"
+            for row_id, emotion, ts in rows
+        ).encode()
+
+
+def _encode_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows((row_id, emotion, _isoformat(ts)) for row_id, emotion, ts in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _encode_arrow(chunks):
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("emotion", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+    ])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for rows in chunks:
+            ids, emotions, timestamps = zip(*rows) if rows else ((), (), ())
+            writer.write_batch(pa.record_batch(
+                [pa.array(ids, pa.int64()), pa.array(emotions, pa.string()),
+                 pa.array(timestamps, pa.timestamp("us"))],
+                schema=schema,
+            ))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    # End-of-stream marker (and the schema, for an empty export)
+    yield sink.getvalue()
+
+
+ENCODERS = {"ndjson": _encode_ndjson, "csv": _encode_csv, "arrow": _encode_arrow}
+
+
+def export_rows(fmt, start=None, end=None, emotions=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Stream EmotionLog as encoded bytes, one piece per chunk.
+
+    Args:
+        fmt (str): "ndjson", "csv" or "arrow"
+        start, end, emotions, chunk_rows: See iter_chunks
+
+    Returns:
+        generator: bytes
+
+    Raises:
+        ExportError: For an unknown format, or arrow without pyarrow
+    """
+    check_format(fmt)
+    return ENCODERS[fmt](iter_chunks(start, end, emotions, chunk_rows))
@@ -0,0 +1,372 @@
+"""
+Pluggable face detector backends for webcam validation.
+
+Every backend exposes the same ``detect(frame)`` call returning a list of
+(x, y, w, h) boxes in full-resolution frame coordinates, so the validator
+builds the same ValidationResult no matter which detector produced them.
+
+Available backends:
+- "haar":  OpenCV Haar cascade (bundled with opencv-python)
+- "yunet": cv2.FaceDetectorYN with the YuNet ONNX model
+- "ssd":   OpenCV DNN ResNet-10 SSD (Caffe prototxt + weights)
+
+The DNN backends load their model files from FACE_DETECTOR_MODEL_DIR
+(backend/model/face_detectors), which is not in the repository. Fetch them
+once with `python fetch_face_detectors.py` from the backend directory;
+nothing is downloaded at runtime. If the files are missing,
+get_face_detector logs a warning and falls back to the Haar cascade.
+"""
+
+import logging
+import math
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+from utils.structured_log import get_logger, log_event
+
+
+logger = get_logger("face_detectors")
+
+
+# ----------------------------------------
+# MODEL FILE PATHS
+# ----------------------------------------
+FACE_CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+FACE_DETECTOR_MODEL_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "model", "face_detectors"
+)
+YUNET_MODEL_PATH = os.path.join(FACE_DETECTOR_MODEL_DIR, "face_detection_yunet_2023mar.onnx")
+SSD_PROTOTXT_PATH = os.path.join(FACE_DETECTOR_MODEL_DIR, "deploy.prototxt")
+SSD_WEIGHTS_PATH = os.path.join(FACE_DETECTOR_MODEL_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+
+# Where fetch_face_detectors.py downloads each model file from
+MODEL_FILE_URLS = {
+    YUNET_MODEL_PATH: "https://github.com/opencv/opencv_zoo/raw/main/models/"
+                      "face_detection_yunet/face_detection_yunet_2023mar.onnx",
+    SSD_PROTOTXT_PATH: "https://raw.githubusercontent.com/opencv/opencv/4.x/"
+                       "samples/dnn/face_detector/deploy.prototxt",
+    SSD_WEIGHTS_PATH: "https://raw.githubusercontent.com/opencv/opencv_3rdparty/"
+                      "dnn_samples_face_detector_20170830/res10_300x300_ssd_iter_140000.caffemodel",
+}
+
+
+# ----------------------------------------
+# DETECTION CONFIGURATION
+# ----------------------------------------
+FACE_MIN_SIZE = 48  # Minimum face detection size (full-resolution pixels)
+DETECTION_DOWNSCALE = True  # Run detection on a downscaled copy of the frame
+DETECTION_TARGET_WIDTH = 320  # Width of the downscaled detection image (see HaarFaceDetector)
+DETECTION_SCALE_FACTOR = 1.1  # detectMultiScale pyramid step
+DETECTION_MIN_NEIGHBORS = 5
+CASCADE_WINDOW_SIZE = 24  # Native window of the frontal-face cascade
+DNN_SCORE_THRESHOLD = 0.8  # Minimum confidence for YuNet / SSD detections
+YUNET_NMS_THRESHOLD = 0.3
+SSD_INPUT_SIZE = (300, 300)
+SSD_MEAN = (104.0, 177.0, 123.0)
+
+DEFAULT_FACE_DETECTOR = os.environ.get("FACE_DETECTOR", "haar").lower()
+
+
+# ----------------------------------------
+# COORDINATE HELPERS
+# ----------------------------------------
+def _downscale_for_detection(image, target_width):
+    """
+    Shrink an image so its width is at most target_width.
+
+    Args:
+        image (np.ndarray): Grayscale or BGR image
+        target_width (int): Maximum width of the detection image
+
+    Returns:
+        tuple: (detection image, scale) where scale maps full-resolution
+            coordinates to detection coordinates (1.0 if not resized)
+    """
+    width = image.shape[1]
+    if not target_width or width <= target_width:
+        return image, 1.0
+
+    scale = target_width / float(width)
+    height = max(1, int(round(image.shape[0] * scale)))
+    small = cv2.resize(image, (int(target_width), height), interpolation=cv2.INTER_AREA)
+    return small, scale
+
+
+def _map_boxes_to_full_resolution(boxes, scale, frame_shape):
+    """
+    Map (x, y, w, h) boxes from the detection image back to the full frame.
+
+    Args:
+        boxes (list): Boxes in detection-image coordinates
+        scale (float): Full-resolution -> detection-image scale factor
+        frame_shape (tuple): Shape of the full-resolution frame
+
+    Returns:
+        list: Boxes as (x, y, w, h) integer tuples clipped to the frame
+    """
+    frame_h, frame_w = frame_shape[:2]
+    mapped = []
+    for x, y, w, h in boxes:
+        x1 = max(0, int(round(x / scale)))
+        y1 = max(0, int(round(y / scale)))
+        x2 = min(frame_w, int(round((x + w) / scale)))
+        y2 = min(frame_h, int(round((y + h) / scale)))
+        if x2 > x1 and y2 > y1:
+            mapped.append((x1, y1, x2 - x1, y2 - y1))
+    return mapped
+
+
+def _filter_min_size(boxes, min_size=FACE_MIN_SIZE):
+    """Drop boxes smaller than min_size in either dimension."""
+    return [b for b in boxes if b[2] >= min_size and b[3] >= min_size]
+
+
+def _as_gray(frame):
+    """Return a grayscale view of frame (BGR or already single-channel)."""
+    if frame.ndim == 2:
+        return frame
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def _as_bgr(frame):
+    """Return a 3-channel BGR version of frame."""
+    if frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    return frame
+
+
+# ----------------------------------------
+# DETECTOR INTERFACE
+# ----------------------------------------
+class FaceDetector(ABC):
+    """Base class for face detector backends."""
+
+    name = "base"
+    model_files = ()  # Files in FACE_DETECTOR_MODEL_DIR the backend loads
+
+    def __init__(self, downscale=DETECTION_DOWNSCALE, target_width=DETECTION_TARGET_WIDTH):
+        """
+        Args:
+            downscale (bool): Run detection on a downscaled copy of the frame
+            target_width (int): Width of the downscaled copy
+        """
+        self.downscale = downscale
+        self.target_width = target_width
+
+    @classmethod
+    def missing_model_files(cls):
+        """Model files this backend needs that are not present."""
+        return [path for path in cls.model_files if not os.path.isfile(path)]
+
+    @classmethod
+    def is_available(cls):
+        """Whether the model files this backend needs are present."""
+        return not cls.missing_model_files()
+
+    @abstractmethod
+    def detect(self, frame, **kwargs):
+        """
+        Detect faces in a frame.
+
+        Args:
+            frame (np.ndarray): BGR or grayscale OpenCV frame
+            min_size (int): Smallest face to report, in frame pixels
+                (defaults to FACE_MIN_SIZE)
+
+        Returns:
+            list: Detected faces as (x, y, w, h) tuples in full-resolution
+                coordinates
+        """
+
+
+class HaarFaceDetector(FaceDetector):
+    """
+    Haar cascade detector, optionally run on a downscaled copy.
+
+    The copy is shrunk to target_width, but never so far that a face of
+    min_size pixels becomes smaller than the cascade's native window:
+    downscaling must not raise the smallest face the detector finds.
+    """
+
+    name = "haar"
+
+    def __init__(self, downscale=DETECTION_DOWNSCALE, target_width=DETECTION_TARGET_WIDTH,
+                 scale_factor=DETECTION_SCALE_FACTOR):
+        super().__init__(downscale, target_width)
+        self.scale_factor = scale_factor
+        self.cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
+
+    def detect(self, frame, downscale=None, target_width=None, scale_factor=None,
+               min_size=None):
+        if min_size is None:
+            min_size = FACE_MIN_SIZE
+        if downscale is None:
+            downscale = self.downscale
+        if target_width is None:
+            target_width = self.target_width
+        if scale_factor is None:
+            scale_factor = self.scale_factor
+
+        gray = _as_gray(frame)
+        if downscale:
+            # Widest reduction that still maps min_size onto a full cascade window
+            min_width = int(math.ceil(gray.shape[1] * CASCADE_WINDOW_SIZE / float(min_size)))
+            detection_image, scale = _downscale_for_detection(gray, max(target_width, min_width))
+        else:
+            detection_image, scale = gray, 1.0
+
+        # Keep the minimum face size in full-resolution pixels, but never
+        # ask for windows smaller than the cascade was trained on
+        window = max(CASCADE_WINDOW_SIZE, int(round(min_size * scale)))
+
+        faces = self.cascade.detectMultiScale(
+            detection_image,
+            scaleFactor=scale_factor,
+            minNeighbors=DETECTION_MIN_NEIGHBORS,
+            minSize=(window, window),
+            flags=cv2.CASCADE_SCALE_IMAGE
+        )
+
+        if len(faces) == 0:
+            return []
+
+        return _map_boxes_to_full_resolution(faces, scale, gray.shape)
+
+
+class YuNetFaceDetector(FaceDetector):
+    """cv2.FaceDetectorYN (YuNet) detector."""
+
+    name = "yunet"
+    model_files = (YUNET_MODEL_PATH,)
+
+    def __init__(self, downscale=DETECTION_DOWNSCALE, target_width=DETECTION_TARGET_WIDTH,
+                 score_threshold=DNN_SCORE_THRESHOLD):
+        super().__init__(downscale, target_width)
+        self.model = cv2.FaceDetectorYN.create(
+            YUNET_MODEL_PATH, "", (target_width, target_width),
+            score_threshold, YUNET_NMS_THRESHOLD
+        )
+
+    @classmethod
+    def is_available(cls):
+        return hasattr(cv2, "FaceDetectorYN") and super().is_available()
+
+    def detect(self, frame, min_size=None, **kwargs):
+        bgr = _as_bgr(frame)
+        if self.downscale:
+            detection_image, scale = _downscale_for_detection(bgr, self.target_width)
+        else:
+            detection_image, scale = bgr, 1.0
+
+        height, width = detection_image.shape[:2]
+        self.model.setInputSize((width, height))
+        _, faces = self.model.detect(detection_image)
+        if faces is None or len(faces) == 0:
+            return []
+
+        boxes = [tuple(face[:4]) for face in faces]
+        return _filter_min_size(
+            _map_boxes_to_full_resolution(boxes, scale, bgr.shape), min_size or FACE_MIN_SIZE
+        )
+
+
+class SsdFaceDetector(FaceDetector):
+    """OpenCV DNN ResNet-10 SSD detector (fixed 300x300 input)."""
+
+    name = "ssd"
+    model_files = (SSD_PROTOTXT_PATH, SSD_WEIGHTS_PATH)
+
+    def __init__(self, score_threshold=DNN_SCORE_THRESHOLD, **kwargs):
+        super().__init__(**kwargs)
+        self.score_threshold = score_threshold
+        self.net = cv2.dnn.readNetFromCaffe(SSD_PROTOTXT_PATH, SSD_WEIGHTS_PATH)
+
+    def detect(self, frame, min_size=None, **kwargs):
+        bgr = _as_bgr(frame)
+        frame_h, frame_w = bgr.shape[:2]
+
+        # The network resizes to 300x300 anyway, so no separate downscale step
+        blob = cv2.dnn.blobFromImage(
+            cv2.resize(bgr, SSD_INPUT_SIZE), 1.0, SSD_INPUT_SIZE, SSD_MEAN
+        )
+        self.net.setInput(blob)
+        detections = self.net.forward()
+
+        boxes = []
+        for det in detections[0, 0]:
+            if float(det[2]) < self.score_threshold:
+                continue
+            x1, y1, x2, y2 = det[3:7] * np.array([frame_w, frame_h, frame_w, frame_h])
+            boxes.append((x1, y1, x2 - x1, y2 - y1))
+
+        return _filter_min_size(
+            _map_boxes_to_full_resolution(boxes, 1.0, bgr.shape), min_size or FACE_MIN_SIZE
+        )
+
+
+FACE_DETECTORS = {
+    HaarFaceDetector.name: HaarFaceDetector,
+    YuNetFaceDetector.name: YuNetFaceDetector,
+    SsdFaceDetector.name: SsdFaceDetector,
+}
+
+
+# ----------------------------------------
+# DETECTOR LOOKUP
+# ----------------------------------------
+# OpenCV detectors are not safe to share across threads, so each worker
+# thread keeps its own instances instead of reloading models on every frame.
+_detector_local = threading.local()
+_fallback_warned = set()  # Backends whose fallback was logged in this process
+
+
+def available_face_detectors():
+    """Return the names of backends whose model files are present."""
+    return [name for name, cls in FACE_DETECTORS.items() if cls.is_available()]
+
+
+def get_face_detector(name=None):
+    """
+    Return the calling thread's cached detector for the named backend.
+
+    Falls back to the Haar cascade if the backend is unknown or its model
+    files are missing, and logs a warning the first time it does so for a
+    backend.
+
+    Args:
+        name (str): Backend name (defaults to DEFAULT_FACE_DETECTOR)
+
+    Returns:
+        FaceDetector: Detector instance
+    """
+    name = (name or DEFAULT_FACE_DETECTOR).lower()
+    cache = getattr(_detector_local, "detectors", None)
+    if cache is None:
+        cache = _detector_local.detectors = {}
+
+    detector = cache.get(name)
+    if detector is not None:
+        return detector
+
+    cls = FACE_DETECTORS.get(name)
+    if cls is None or not cls.is_available():
+        if name not in _fallback_warned:
+            _fallback_warned.add(name)
+            if cls is None:
+                log_event(logger, logging.WARNING, "face_detector_unknown",
+                          requested=name, using=HaarFaceDetector.name,
+                          known=sorted(FACE_DETECTORS))
+            else:
+                log_event(logger, logging.WARNING, "face_detector_fallback",
+                          requested=name, using=HaarFaceDetector.name,
+                          missing_files=cls.missing_model_files(),
+                          fix="python fetch_face_detectors.py (from backend/)")
+        cls = HaarFaceDetector
+
+    detector = cls()
+    cache[name] = detector
+    return detector
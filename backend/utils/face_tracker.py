@@ -0,0 +1,111 @@
+"""
+Per-session face tracking for multi-face mode.
+
+Assigns each detected face a tracking ID that stays stable across frames
+from the same session, by greedily matching new boxes to the previous
+frame's boxes on intersection-over-union. Per-face prediction smoothing is
+keyed on (session, track ID), so faces swapping detection order between
+frames do not mix up their histories.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+TRACK_IOU_THRESHOLD = 0.3  # Minimum overlap to continue an existing track
+TRACK_TTL_SECONDS = 30.0  # Tracks unseen for this long are forgotten
+MAX_TRACKED_SESSIONS = 1000
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    iw = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    ih = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class _SessionTracks:
+    __slots__ = ("tracks", "next_id")
+
+    def __init__(self):
+        self.tracks = {}  # track id -> (box, last seen)
+        self.next_id = 1
+
+
+class FaceTracker:
+    """Greedy IoU tracker holding one set of tracks per session."""
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, ttl=TRACK_TTL_SECONDS,
+                 max_sessions=MAX_TRACKED_SESSIONS):
+        self.iou_threshold = iou_threshold
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, session_id, boxes):
+        """
+        Match boxes to the session's tracks and return their track IDs.
+
+        Args:
+            session_id (str): Client session the frame belongs to
+            boxes (list): (x, y, w, h) face boxes in the current frame
+
+        Returns:
+            list: Track ID for each box, in the same order (numbered afresh
+                every frame if session_id is None, since clients without an
+                id would otherwise share tracks)
+        """
+        if session_id is None:
+            return list(range(1, len(boxes) + 1))
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _SessionTracks()
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+            # Drop tracks that have not been seen recently
+            session.tracks = {
+                tid: (box, seen) for tid, (box, seen) in session.tracks.items()
+                if now - seen <= self.ttl
+            }
+
+            # Greedy assignment, best overlaps first
+            pairs = sorted(
+                (
+                    (box_iou(box, track_box), i, tid)
+                    for i, box in enumerate(boxes)
+                    for tid, (track_box, _) in session.tracks.items()
+                ),
+                reverse=True,
+            )
+            ids = [None] * len(boxes)
+            used = set()
+            for iou, i, tid in pairs:
+                if iou < self.iou_threshold:
+                    break
+                if ids[i] is None and tid not in used:
+                    ids[i] = tid
+                    used.add(tid)
+
+            for i, box in enumerate(boxes):
+                if ids[i] is None:
+                    ids[i] = session.next_id
+                    session.next_id += 1
+                session.tracks[ids[i]] = (tuple(box), now)
+
+            return ids
+
+
+FACE_TRACKER = FaceTracker()
@@ -0,0 +1,156 @@
+"""
+Multi-frame uploads for /api/emotion/batch.
+
+Buffered clients (weak networks, kiosks) send several frames per request
+in one of two encodings:
+
+- multipart/form-data: one file part per frame in the "frames" field, with
+  capture times in "timestamps". That can be a repeated field or a single
+  comma-separated value, in ms since the epoch, in the same order as the
+  frames.
+- application/octet-stream: a sequence of length-prefixed records, each a
+  big-endian header (uint64 timestamp in ms since the epoch, uint32 image
+  length) followed by the encoded image.
+
+A timestamp of 0, or none at all, means "now". Other timestamps must lie
+between 2000-01-01 and MAX_CLOCK_SKEW_MS past the server's clock.
+
+Frames are decoded and validated in parallel on a shared thread pool (the
+OpenCV calls release the GIL), then returned in capture order for batched
+inference. Empty records are rejected when parsing; any other frame that
+fails to decode is classified as Unknown without failing the batch.
+Request bodies are capped at LBE_MAX_BATCH_BYTES.
+"""
+
+import math
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from utils.image_decode import decode_frame
+from utils.webcam_validator import validate_webcam_frame
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+MAX_BATCH_FRAMES = int(os.environ.get("LBE_MAX_BATCH_FRAMES", "64"))
+MAX_BATCH_BYTES = int(os.environ.get("LBE_MAX_BATCH_BYTES", str(32 * 1024 * 1024)))
+BATCH_WORKERS = int(os.environ.get("LBE_BATCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+RECORD_HEADER = struct.Struct(">QI")  # timestamp ms, image length
+MIN_TIMESTAMP_MS = 946684800000  # 2000-01-01T00:00:00Z
+MAX_CLOCK_SKEW_MS = 24 * 3600 * 1000  # How far a client clock may run ahead
+
+# Worker threads are only started once the first batch arrives
+_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="lbe-batch")
+
+
+class BatchFormatError(ValueError):
+    """Raised when a batch upload cannot be parsed."""
+
+
+def check_timestamp(value):
+    """
+    Validate a capture time in ms since the epoch.
+
+    Returns:
+        int or None: The timestamp, or None for 0 / missing ("now")
+
+    Raises:
+        BatchFormatError: If it is not finite or outside the plausible range
+    """
+    if value is None or value == 0:
+        return None
+    if not math.isfinite(value):
+        raise BatchFormatError("timestamps must be finite")
+    value = int(value)
+    if not MIN_TIMESTAMP_MS <= value <= time.time() * 1000 + MAX_CLOCK_SKEW_MS:
+        raise BatchFormatError(f"Implausible frame timestamp: {value}")
+    return value
+
+
+def parse_length_prefixed(body):
+    """
+    Split a length-prefixed binary body into frames.
+
+    Returns:
+        list: (timestamp ms or None, image bytes) pairs in upload order
+    """
+    frames = []
+    pos = 0
+    view = memoryview(body)
+    while pos < len(body):
+        if pos + RECORD_HEADER.size > len(body):
+            raise BatchFormatError("Truncated record header")
+        timestamp_ms, length = RECORD_HEADER.unpack_from(body, pos)
+        pos += RECORD_HEADER.size
+        if length == 0:
+            raise BatchFormatError("Empty image record")
+        if pos + length > len(body):
+            raise BatchFormatError("Truncated image data")
+        frames.append((check_timestamp(timestamp_ms), bytes(view[pos : pos + length])))
+        pos += length
+        if len(frames) > MAX_BATCH_FRAMES:
+            raise BatchFormatError(f"At most {MAX_BATCH_FRAMES} frames per batch")
+    return frames
+
+
+def parse_multipart(files, form):
+    """
+    Collect frames from a multipart upload.
+
+    Args:
+        files (MultiDict): request.files
+        form (MultiDict): request.form
+
+    Returns:
+        list: (timestamp ms or None, image bytes) pairs in upload order
+    """
+    parts = files.getlist("frames")
+    if len(parts) > MAX_BATCH_FRAMES:
+        raise BatchFormatError(f"At most {MAX_BATCH_FRAMES} frames per batch")
+
+    timestamps = [
+        value.strip()
+        for field in form.getlist("timestamps")
+        for value in field.split(",")
+        if value.strip()
+    ]
+    if timestamps and len(timestamps) != len(parts):
+        raise BatchFormatError("timestamps must have one entry per frame")
+    try:
+        timestamps = [float(t) for t in timestamps]
+    except ValueError:
+        raise BatchFormatError("timestamps must be numbers")
+    timestamps = [check_timestamp(t) for t in timestamps] or [None] * len(parts)
+
+    frames = [(ts, part.read()) for ts, part in zip(timestamps, parts)]
+    if any(not image for _, image in frames):
+        raise BatchFormatError("Empty frame")
+    return frames
+
+
+def _decode_and_validate(image_bytes):
+    try:
+        frame, reduction = decode_frame(image_bytes)
+    except cv2.error:
+        # Corrupt image data: validated like an undecodable frame (Unknown)
+        frame, reduction = None, 1
+    return validate_webcam_frame(frame, reduction=reduction)
+
+
+def validate_frames(images):
+    """
+    Decode and validate encoded frames in parallel.
+
+    Args:
+        images (list): Encoded images
+
+    Returns:
+        list: ValidationResult per image, in the same order
+    """
+    return list(_executor.map(_decode_and_validate, images))
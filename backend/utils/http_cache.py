@@ -0,0 +1,180 @@
+"""
+Response cache with ETag / conditional GET for read-only endpoints.
+
+Cached responses are keyed on (path, query string, data version). A data
+version is a counter per namespace (e.g. "emotion_log") that writers bump
+with invalidate(), so a stale entry is never served and nothing has to be
+deleted explicitly.
+
+That counter only sees this process's writes. A namespace written by
+other workers or nodes registers a version source with
+set_version_source(): a cheap query of shared state (e.g. the highest
+EmotionLog id) that is part of the version, so a write anywhere
+invalidates every process's entries. ETags hash the body, so processes
+serving the same data agree on them.
+
+Each entry stores the JSON body with a strong ETag and, for larger payloads,
+gzip (and brotli, if the optional `brotli` package is installed) encodings
+compressed once. A request whose If-None-Match matches gets 304 Not Modified
+without running the view.
+
+Entries are per process: with several workers, each one caches
+independently.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+MAX_ENTRIES = 256
+COMPRESS_MIN_SIZE = 1024  # Bytes; smaller bodies are sent uncompressed
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class _Entry:
+    """One cached representation set for a (path, query, version) key."""
+
+    __slots__ = ("body", "etag", "encoded")
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.encoded = {}  # encoding -> compressed body
+        if len(body) >= COMPRESS_MIN_SIZE:
+            self.encoded["gzip"] = gzip.compress(body, GZIP_LEVEL)
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+
+    def etag_for(self, encoding):
+        """Strong ETags must differ between encodings of the same body."""
+        if encoding is None:
+            return self.etag
+        return self.etag[:-1] + "-" + encoding + '"'
+
+
+def _choose_encoding(entry):
+    """Pick the encoding the client prefers (by q-value) among the entry's."""
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in ("br", "gzip"):  # br wins ties
+        quality = accepted.quality(encoding)
+        if encoding in entry.encoded and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _etag_matches(entry):
+    """Whether If-None-Match names any representation of this entry."""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip() for tag in header.split(",")}
+    representations = {entry.etag_for(None)}
+    representations.update(entry.etag_for(enc) for enc in entry.encoded)
+    return bool(candidates & representations)
+
+
+class ResponseCache:
+    """LRU cache of JSON responses with versioned keys."""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._version_sources = {}
+        self._lock = threading.Lock()
+
+    def set_version_source(self, namespace, source):
+        """
+        Make shared state part of a namespace's data version.
+
+        Args:
+            source (callable): Returns a hashable value that changes whenever
+                the namespace's data changes, in any process. Called once
+                per cached request, so it must be cheap.
+        """
+        self._version_sources[namespace] = source
+
+    def version(self, namespace):
+        """Current data version of a namespace (local counter, plus its source's value)."""
+        local = self._versions.get(namespace, 0)
+        source = self._version_sources.get(namespace)
+        return local if source is None else (local, source())
+
+    def invalidate(self, namespace):
+        """Bump a namespace's version so its cached responses are bypassed."""
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def cached(self, namespace=None, cache_control="no-cache"):
+        """
+        Decorator caching a view's 200 JSON response.
+
+        Args:
+            namespace (str): Data namespace the response depends on, or None
+                for static responses
+            cache_control (str): Cache-Control header value for clients
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                version = self.version(namespace) if namespace else 0
+                key = (request.path, request.query_string, namespace, version)
+
+                entry = self._get(key)
+                if entry is None:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.direct_passthrough:
+                        return response
+                    entry = _Entry(response.get_data())
+                    self._put(key, entry)
+
+                headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+                encoding = _choose_encoding(entry)
+                headers["ETag"] = entry.etag_for(encoding)
+
+                if _etag_matches(entry):
+                    return current_app.response_class(status=304, headers=headers)
+
+                body = entry.body
+                if encoding is not None:
+                    body = entry.encoded[encoding]
+                    headers["Content-Encoding"] = encoding
+                return current_app.response_class(
+                    body, status=200, mimetype="application/json", headers=headers
+                )
+            return wrapper
+        return decorator
+
+
+RESPONSE_CACHE = ResponseCache()
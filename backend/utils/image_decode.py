@@ -0,0 +1,125 @@
+"""
+Frame decoding for /api/emotion.
+
+Every pipeline stage works on grayscale, and face detection already runs at
+DETECTION_TARGET_WIDTH, so decoding a full-resolution BGR frame mostly
+produces pixels that are converted and thrown away. In "reduced" mode,
+JPEG frames are decoded straight to grayscale at 1/2, 1/4 or 1/8 scale
+with libjpeg's DCT scaling (cv2.IMREAD_REDUCED_GRAYSCALE_*). The factor is
+the largest one that keeps the decoded width at or above
+LBE_DECODE_TARGET_WIDTH, using dimensions read from the JPEG header, so
+the decoder never has to produce the full image.
+
+The validator takes the reduction factor and scales its size and blur
+thresholds to match (see webcam_validator.BLUR_THRESHOLD_REDUCED).
+
+Reduced mode is opt-in. Face crops then come from the reduced frame, not
+the full-resolution image that face detection otherwise crops from, so
+the model sees lower-detail faces and its predictions can shift. Check
+accuracy on your own frames (e.g. with benchmarks/replay.py) before
+enabling it.
+
+Environment variables:
+- LBE_DECODE_MODE: "color" (default) for full-resolution BGR, or "reduced"
+- LBE_DECODE_TARGET_WIDTH: minimum decoded width (default 320)
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+from utils.face_detectors import DETECTION_TARGET_WIDTH
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+DECODE_MODE = os.environ.get("LBE_DECODE_MODE", "color").lower()
+DECODE_TARGET_WIDTH = int(os.environ.get("LBE_DECODE_TARGET_WIDTH", str(DETECTION_TARGET_WIDTH)))
+
+REDUCED_GRAYSCALE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# Start-of-frame markers carry the image size (SOF0-SOF15 minus DHT, JPG, DAC)
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field
+_STANDALONE_MARKERS = frozenset(range(0xD0, 0xDA)) | {0x01}
+
+
+def jpeg_dimensions(data):
+    """
+    Read (width, height) from a JPEG's start-of-frame header.
+
+    Args:
+        data (bytes): Encoded image
+
+    Returns:
+        tuple: (width, height), or None if data is not a readable JPEG
+    """
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    pos = 2
+    end = len(data)
+    while pos + 4 <= end:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        if marker in _STANDALONE_MARKERS:
+            pos += 2
+            continue
+        if marker == 0xDA:  # Start of scan: no SOF before the image data
+            return None
+
+        length = (data[pos + 2] << 8) | data[pos + 3]
+        if marker in _SOF_MARKERS:
+            if pos + 9 > end:
+                return None
+            height = (data[pos + 5] << 8) | data[pos + 6]
+            width = (data[pos + 7] << 8) | data[pos + 8]
+            return (width, height) if width and height else None
+        pos += 2 + length
+    return None
+
+
+def choose_reduction(width, target_width=DECODE_TARGET_WIDTH):
+    """Largest DCT scaling factor that keeps the decoded width >= target_width."""
+    for factor in (8, 4, 2):
+        if width // factor >= target_width:
+            return factor
+    return 1
+
+
+def decode_frame(image_bytes, mode=None):
+    """
+    Decode an uploaded frame.
+
+    Args:
+        image_bytes (bytes): Encoded image (JPEG from react-webcam, or any
+            format cv2.imdecode reads)
+        mode (str): "color" or "reduced", defaults to LBE_DECODE_MODE
+
+    Returns:
+        tuple: (frame, reduction) where frame is grayscale in reduced mode
+            and BGR in color mode, and reduction is the factor by which the
+            frame is smaller than the original image (1 if not reduced).
+            frame is None if the image cannot be decoded.
+    """
+    if mode is None:
+        mode = DECODE_MODE
+    buffer = np.frombuffer(image_bytes, np.uint8)
+
+    if mode != "reduced":
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR), 1
+
+    dimensions = jpeg_dimensions(image_bytes)
+    reduction = choose_reduction(dimensions[0]) if dimensions else 1
+    return cv2.imdecode(buffer, REDUCED_GRAYSCALE_FLAGS[reduction]), reduction
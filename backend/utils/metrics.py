@@ -0,0 +1,263 @@
+"""
+Lightweight in-process metrics for the emotion pipeline.
+
+Provides Prometheus-style counters and histograms with a text exposition
+renderer for the /metrics endpoint. Recording a sample is a dict lookup, a
+bisect over the bucket bounds and a few integer additions under a lock, so
+instrumenting the per-frame hot path costs microseconds.
+
+Metrics are per process: with several workers, scrape each one.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+# Upper bounds (seconds) for stage latency histograms
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry = []
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    """Render a Prometheus label set, e.g. {stage="decode"}."""
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    """Render a sample value the way Prometheus expects."""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value)
+
+
+# ----------------------------------------
+# METRIC TYPES
+# ----------------------------------------
+class Counter:
+    """Monotonically increasing counter with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        """Increment the counter for the given label values."""
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        """Current value for the given label values (0 if never incremented)."""
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Value that can go up and down, with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def set(self, value, *labelvalues):
+        """Set the gauge for the given label values."""
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class _Timer:
+    """Context manager observing elapsed wall time into a histogram."""
+
+    __slots__ = ("_histogram", "_labelvalues", "_start")
+
+    def __init__(self, histogram, labelvalues):
+        self._histogram = histogram
+        self._labelvalues = labelvalues
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._start, *self._labelvalues)
+        return False
+
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labelvalues -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        """Record one sample for the given label values."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labelvalues):
+        """Context manager timing the enclosed block in seconds."""
+        return _Timer(self, labelvalues)
+
+    def count(self, *labelvalues):
+        """Number of samples recorded for the given label values."""
+        series = self._series.get(labelvalues)
+        return sum(series[:-1]) if series else 0
+
+    def mean(self, *labelvalues):
+        """Mean of the samples recorded for the given label values (0.0 if none)."""
+        series = self._series.get(labelvalues)
+        if not series:
+            return 0.0
+        count = sum(series[:-1])
+        return series[-1] / count if count else 0.0
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labelvalues, series in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.labelnames, labelvalues, ("le", _format_value(float(bound)))
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render_metrics():
+    """Render every registered metric in Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------
+# PIPELINE METRICS
+# ----------------------------------------
+STAGE_SECONDS = Histogram(
+    "lbe_stage_duration_seconds",
+    "Time spent in each /api/emotion pipeline stage.",
+    ["stage"],
+)
+REQUEST_SECONDS = Histogram(
+    "lbe_emotion_request_duration_seconds",
+    "End-to-end /api/emotion handler latency.",
+)
+BATCH_REQUEST_SECONDS = Histogram(
+    "lbe_emotion_batch_request_duration_seconds",
+    "End-to-end /api/emotion/batch handler latency.",
+)
+BATCH_FRAMES = Histogram(
+    "lbe_emotion_batch_frames",
+    "Frames per /api/emotion/batch request.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+VALIDATION_OUTCOMES = Counter(
+    "lbe_validation_outcomes_total",
+    "Webcam frame validation results by outcome.",
+    ["outcome"],
+)
+MODEL_FALLBACKS = Counter(
+    "lbe_model_fallbacks_total",
+    "Predictions that did not come from the emotion model.",
+    ["reason"],
+)
+EMOTION_RESPONSES = Counter(
+    "lbe_emotion_responses_total",
+    "Emotions returned by /api/emotion.",
+    ["emotion"],
+)
+ADMISSION_DECISIONS = Counter(
+    "lbe_admission_decisions_total",
+    "Admission control decisions for /api/emotion frames.",
+    ["decision"],
+)
+IN_FLIGHT = Gauge(
+    "lbe_in_flight_frames",
+    "Frames currently running through the emotion pipeline.",
+)
+WAITING = Gauge(
+    "lbe_waiting_frames",
+    "Frames waiting for admission to the emotion pipeline.",
+)
@@ -0,0 +1,164 @@
+"""
+Opt-in sampling profiler for live /api/emotion traffic.
+
+A configurable fraction of requests is profiled by a background thread that
+samples the handling thread's Python stack every few milliseconds. Samples
+are aggregated in collapsed-stack format ("frame;frame;frame count"), which
+flamegraph.pl, speedscope and inferno read directly.
+
+Environment variables:
+- LBE_PROFILE_SAMPLE_RATE: fraction of requests to profile (default 0, off)
+- LBE_PROFILE_INTERVAL_MS: stack sampling interval (default 5)
+- LBE_PROFILE_DIR: if set, collapsed stacks are written there at exit
+
+GET /admin/profile returns the stacks. It needs LBE_ADMIN_TOKEN in
+X-Admin-Token, and is closed when no token is configured.
+
+When the sample rate is 0, maybe_profile() returns a shared no-op context
+manager, so the disabled cost is one comparison per request.
+"""
+
+import atexit
+import contextlib
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+PROFILE_SAMPLE_RATE = float(os.environ.get("LBE_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.environ.get("LBE_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get("LBE_PROFILE_DIR")
+MAX_STACK_DEPTH = 128
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+def _frame_label(frame):
+    """Label a stack frame as "function (file.py:line)" for flamegraphs."""
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+# ----------------------------------------
+# SAMPLING PROFILER
+# ----------------------------------------
+class SamplingProfiler:
+    """Samples the stacks of registered threads into collapsed-stack counts."""
+
+    def __init__(self, sample_rate=PROFILE_SAMPLE_RATE, interval_ms=PROFILE_INTERVAL_MS):
+        """
+        Args:
+            sample_rate (float): Fraction of requests to profile (0 disables)
+            interval_ms (float): Milliseconds between stack samples
+        """
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000.0
+        self.stacks = {}
+        self.profiled_requests = 0
+        self._active = {}  # thread id -> nesting depth
+        self._lock = threading.Lock()
+        self._has_work = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def maybe_profile(self):
+        """Context manager profiling the current request if it is sampled."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return _NULL_CONTEXT
+        return self.profile()
+
+    @contextlib.contextmanager
+    def profile(self):
+        """Sample the calling thread's stack for the duration of the block."""
+        thread_id = threading.get_ident()
+        self._ensure_thread()
+        with self._lock:
+            self._active[thread_id] = self._active.get(thread_id, 0) + 1
+            self.profiled_requests += 1
+            self._has_work.set()
+        try:
+            yield
+        finally:
+            with self._lock:
+                depth = self._active.pop(thread_id) - 1
+                if depth:
+                    self._active[thread_id] = depth
+                if not self._active:
+                    self._has_work.clear()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="lbe-profiler", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._has_work.wait()
+            self._sample_once()
+            time.sleep(self.interval)
+
+    def _sample_once(self):
+        with self._lock:
+            thread_ids = list(self._active)
+        if not thread_ids:
+            return
+
+        frames = sys._current_frames()
+        for thread_id in thread_ids:
+            frame = frames.get(thread_id)
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if not labels:
+                continue
+            stack = ";".join(reversed(labels))
+            with self._lock:
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def collapsed(self):
+        """Aggregated samples in collapsed-stack text format."""
+        with self._lock:
+            items = sorted(self.stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def reset(self):
+        """Discard all collected samples."""
+        with self._lock:
+            self.stacks = {}
+            self.profiled_requests = 0
+
+    def dump(self, directory):
+        """
+        Write the collapsed stacks to a timestamped file in directory.
+
+        Returns:
+            str: Path of the written file
+        """
+        os.makedirs(directory, exist_ok=True)
+        filename = f"emotion-profile-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.collapsed"
+        path = os.path.join(directory, filename)
+        with open(path, "w") as f:
+            f.write(self.collapsed())
+        return path
+
+
+PROFILER = SamplingProfiler()
+
+if PROFILER.enabled and PROFILE_DIR:
+    atexit.register(lambda: PROFILER.stacks and PROFILER.dump(PROFILE_DIR))
@@ -0,0 +1,331 @@
+"""
+Batched, delta-based sync of per-user learning progress.
+
+The learning pages count detected emotions per user, overall and per
+module, and record module completion. Instead of rewriting whole JSON
+blobs in localStorage on every detection tick, the client accumulates
+increments in memory and flushes them to POST /api/progress/sync every
+few seconds. The server merges each flush into EmotionSummary with one
+upsert (count = count + increment) and stores module state in
+ModuleProgress.
+
+A flush carries a client id (one per page load) and a sequence number
+that increases with every new batch. A retried flush reuses its number,
+and SyncCursor records the highest number applied per client, so a
+retry after a lost response is not counted twice. Cursors are kept for
+LBE_SYNC_CURSOR_TTL_DAYS after their client's last flush, then pruned by
+retention (prune_sync_cursors). Clients discard unsent batches well
+before that, so a pruned cursor is never replayed.
+
+When a module is marked completed, its dominant emotion is computed
+from the merged counts on the server.
+
+Requests are bound to a user by a progress token: a user id signed with
+the app's secret key, issued by POST /api/progress/session and sent with
+every read and flush. A request's user comes from its token, never from
+the query string or body, so knowing a student's email is not enough to
+read or inflate their summary through an existing session. Limitation:
+login is still checked only in the browser, so the session endpoint
+issues a token for any email it is given. Tokens stop casual cross-user
+access, not a client that deliberately claims another user's email;
+that needs server-side login.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from models import db, EmotionSummary, ModuleProgress, SyncCursor
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+OVERALL_SCOPE = "overall"
+MAX_SYNC_ENTRIES = 256  # (scope, emotion) increments per flush
+MAX_INCREMENT = 100000
+MAX_ID_LENGTH = 255
+MAX_NAME_LENGTH = 32
+MAX_EMOTION_LENGTH = 50
+TOKEN_MAX_AGE_SECONDS = float(os.environ.get("LBE_PROGRESS_TOKEN_MAX_AGE_DAYS", "30")) * 86400
+TOKEN_SALT = "lbe-progress"
+SYNC_CURSOR_TTL_DAYS = float(os.environ.get("LBE_SYNC_CURSOR_TTL_DAYS", "30"))
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class SyncFormatError(ValueError):
+    """Raised when a sync payload is malformed."""
+
+
+def _bounded_string(value, name, max_length):
+    if not isinstance(value, (str, int)) or isinstance(value, bool):
+        raise SyncFormatError(f"{name} must be a string")
+    value = str(value).strip()
+    if not value or len(value) > max_length:
+        raise SyncFormatError(f"{name} must be 1-{max_length} characters")
+    return value
+
+
+def issue_token(secret_key, user_id):
+    """A progress token binding requests to user_id."""
+    user_id = _bounded_string(user_id, "user_id", MAX_ID_LENGTH)
+    return URLSafeTimedSerializer(secret_key, salt=TOKEN_SALT).dumps(user_id)
+
+
+def user_for_token(secret_key, token):
+    """The user id a progress token was issued for, or None if it is invalid or expired."""
+    if not isinstance(token, str) or not token:
+        return None
+    try:
+        return URLSafeTimedSerializer(secret_key, salt=TOKEN_SALT).loads(
+            token, max_age=TOKEN_MAX_AGE_SECONDS
+        )
+    except BadSignature:
+        return None
+
+
+def parse_sync(data, user_id):
+    """
+    Validate a sync payload.
+
+    Expected shape:
+        {"token": str, "client_id": str, "seq": int,
+         "emotions": {scope: {emotion: increment}},
+         "modules": {module: status}}
+
+    Args:
+        user_id (str): The user the request's progress token was issued for
+
+    Returns:
+        dict: The payload with emotions flattened to
+            {(scope, emotion): increment} and zero increments dropped
+    """
+    if not isinstance(data, dict):
+        raise SyncFormatError("Body must be a JSON object")
+
+    client_id = _bounded_string(data.get("client_id"), "client_id", MAX_ID_LENGTH)
+    seq = data.get("seq")
+    if not isinstance(seq, int) or isinstance(seq, bool) or seq < 1:
+        raise SyncFormatError("seq must be a positive integer")
+
+    emotions = data.get("emotions") or {}
+    modules = data.get("modules") or {}
+    if not isinstance(emotions, dict) or not isinstance(modules, dict):
+        raise SyncFormatError("emotions and modules must be objects")
+
+    increments = {}
+    for scope, counts in emotions.items():
+        scope = _bounded_string(scope, "scope", MAX_NAME_LENGTH)
+        if not isinstance(counts, dict):
+            raise SyncFormatError("emotions must map scope -> {emotion: count}")
+        for emotion, count in counts.items():
+            emotion = _bounded_string(emotion, "emotion", MAX_EMOTION_LENGTH)
+            if not isinstance(count, int) or isinstance(count, bool) \
+                    or not 0 <= count <= MAX_INCREMENT:
+                raise SyncFormatError(f"counts must be integers in [0, {MAX_INCREMENT}]")
+            if count:
+                key = (scope, emotion)
+                increments[key] = increments.get(key, 0) + count
+    if len(increments) > MAX_SYNC_ENTRIES:
+        raise SyncFormatError(f"At most {MAX_SYNC_ENTRIES} increments per sync")
+
+    statuses = {
+        _bounded_string(module, "module", MAX_NAME_LENGTH):
+            _bounded_string(status, "status", 20)
+        for module, status in modules.items()
+    }
+    if len(statuses) > MAX_SYNC_ENTRIES:
+        raise SyncFormatError(f"At most {MAX_SYNC_ENTRIES} modules per sync")
+
+    return {
+        "user_id": user_id,
+        "client_id": client_id,
+        "seq": seq,
+        "increments": increments,
+        "modules": statuses,
+    }
+
+
+def _claim_seq(user_id, client_id, seq):
+    """Record seq as applied for the client. False if it (or a later one) already was."""
+    now = datetime.utcnow()
+    advanced = db.session.execute(
+        db.update(SyncCursor)
+        .where(SyncCursor.user_id == user_id, SyncCursor.client_id == client_id,
+               SyncCursor.last_seq < seq)
+        .values(last_seq=seq, updated_at=now)
+    ).rowcount
+    if advanced:
+        return True
+
+    known = db.session.execute(
+        db.select(SyncCursor.id)
+        .where(SyncCursor.user_id == user_id, SyncCursor.client_id == client_id)
+    ).first()
+    if known is not None:
+        return False
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(SyncCursor(
+                user_id=user_id, client_id=client_id, last_seq=seq, updated_at=now
+            ))
+    except IntegrityError:
+        # A concurrent first flush from the same client got there first
+        return False
+    return True
+
+
+def _upsert(model, rows, conflict_columns, set_):
+    """
+    INSERT ... ON CONFLICT DO UPDATE where the dialect has it.
+
+    Args:
+        set_ (callable): excluded -> {column: new value expression}
+
+    Returns:
+        bool: False if the dialect has no upsert (the caller falls back)
+    """
+    insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        return False
+    stmt = insert(model).values(rows)
+    db.session.execute(
+        stmt.on_conflict_do_update(index_elements=conflict_columns, set_=set_(stmt.excluded))
+    )
+    return True
+
+
+def _merge_increments(user_id, increments):
+    rows = [
+        {"user_id": user_id, "scope": scope, "emotion": emotion, "count": count}
+        for (scope, emotion), count in increments.items()
+    ]
+    if _upsert(EmotionSummary, rows, ["user_id", "scope", "emotion"],
+               lambda excluded: {"count": EmotionSummary.count + excluded["count"]}):
+        return
+
+    existing = {
+        (s.scope, s.emotion): s
+        for s in EmotionSummary.query.filter_by(user_id=user_id)
+    }
+    for row in rows:
+        summary = existing.get((row["scope"], row["emotion"]))
+        if summary is None:
+            db.session.add(EmotionSummary(**row))
+        else:
+            summary.count += row["count"]
+
+
+def _dominant_emotion(user_id, scope):
+    row = db.session.execute(
+        db.select(EmotionSummary.emotion)
+        .where(EmotionSummary.user_id == user_id, EmotionSummary.scope == scope)
+        .order_by(EmotionSummary.count.desc(), EmotionSummary.emotion)
+        .limit(1)
+    ).first()
+    return row[0] if row else None
+
+
+def _merge_modules(user_id, modules):
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "module": module,
+            "status": status,
+            "dominant_emotion": _dominant_emotion(user_id, module),
+            "updated_at": now,
+        }
+        for module, status in modules.items()
+    ]
+    if _upsert(ModuleProgress, rows, ["user_id", "module"],
+               lambda excluded: {
+                   "status": excluded["status"],
+                   "dominant_emotion": excluded["dominant_emotion"],
+                   "updated_at": excluded["updated_at"],
+               }):
+        return
+
+    existing = {p.module: p for p in ModuleProgress.query.filter_by(user_id=user_id)}
+    for row in rows:
+        progress = existing.get(row["module"])
+        if progress is None:
+            db.session.add(ModuleProgress(**row))
+        else:
+            progress.status = row["status"]
+            progress.dominant_emotion = row["dominant_emotion"]
+            progress.updated_at = row["updated_at"]
+
+
+def apply_sync(batch):
+    """
+    Merge one parsed flush in a single transaction.
+
+    Args:
+        batch (dict): Output of parse_sync
+
+    Returns:
+        bool: False if the flush was a replay and nothing changed
+    """
+    user_id = batch["user_id"]
+    try:
+        if not _claim_seq(user_id, batch["client_id"], batch["seq"]):
+            db.session.rollback()
+            return False
+        if batch["increments"]:
+            _merge_increments(user_id, batch["increments"])
+        if batch["modules"]:
+            _merge_modules(user_id, batch["modules"])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return True
+
+
+def prune_sync_cursors(days=SYNC_CURSOR_TTL_DAYS, now=None):
+    """
+    Delete sync cursors whose client has not flushed for `days`. Needs an app context.
+
+    Returns:
+        int: Cursors deleted
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    try:
+        deleted = db.session.execute(
+            db.delete(SyncCursor).where(SyncCursor.updated_at < cutoff)
+        ).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return deleted
+
+
+def load_progress(user_id):
+    """
+    A user's merged summary.
+
+    Returns:
+        dict: {"emotions": {scope: {emotion: count}},
+               "modules": {module: {"status", "dominant_emotion"}}}
+    """
+    emotions = {}
+    for scope, emotion, count in db.session.execute(
+        db.select(EmotionSummary.scope, EmotionSummary.emotion, EmotionSummary.count)
+        .where(EmotionSummary.user_id == user_id)
+    ):
+        emotions.setdefault(scope, {})[emotion] = count
+
+    modules = {
+        p.module: {"status": p.status, "dominant_emotion": p.dominant_emotion}
+        for p in ModuleProgress.query.filter_by(user_id=user_id)
+    }
+    return {"emotions": emotions, "modules": modules}
@@ -0,0 +1,38 @@
+"""
+Parsing of loosely typed request parameters.
+
+JSON clients send flags as true/false, form and query clients as strings,
+and bool("false") is True, so flags are parsed explicitly.
+"""
+
+_TRUE_STRINGS = frozenset({"1", "true", "yes", "on"})
+_FALSE_STRINGS = frozenset({"0", "false", "no", "off"})
+
+
+def parse_bool(value, default=False):
+    """
+    Parse a boolean flag.
+
+    Accepts JSON booleans, the numbers 0 and 1, and the strings
+    true/false, 1/0, yes/no and on/off (any case).
+
+    Args:
+        value: Raw parameter value, None if the client did not send it
+        default (bool): Returned for None
+
+    Raises:
+        ValueError: For any other value
+    """
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE_STRINGS:
+            return True
+        if text in _FALSE_STRINGS:
+            return False
+    raise ValueError(f"Not a boolean: {value!r}")
@@ -0,0 +1,351 @@
+"""
+Retention, compaction and archiving for the EmotionLog table.
+
+EmotionLog gets one row per valid frame per student and would otherwise
+grow without bound. A retention run moves raw rows older than
+LBE_RETENTION_DAYS out of the live table, one chunk at a time. For each
+chunk it:
+
+1. writes the rows to a compressed columnar archive file in
+   LBE_ARCHIVE_DIR (NumPy .npz with one array per column),
+2. in a single short transaction, deletes the rows and adds their counts
+   to EmotionRollup (hourly per-emotion totals, so analytics stay complete),
+3. pauses briefly so live /api/emotion inserts can take the write lock.
+
+The final step reclaims freed pages with PRAGMA incremental_vacuum, a few
+pages per transaction, instead of a blocking VACUUM. Incremental vacuum
+needs auto_vacuum=INCREMENTAL. prepare_database() sets that on new
+databases; an existing database has to be converted once with
+`flask --app app retention --enable-incremental-vacuum`, which runs a full
+VACUUM.
+
+Each run also prunes progress sync cursors idle for
+LBE_SYNC_CURSOR_TTL_DAYS (see utils.progress_sync).
+
+Every worker process may run retention, so two runs can compact the same
+chunk at once. Each writes its own archive file (named after the chunk's
+id range plus a random suffix); only the run whose delete removes the
+rows keeps its file, the other removes the file it wrote. If a run is
+interrupted between writing an archive file and committing its delete,
+the next run archives those rows again. Row ids are unique, so readers of
+the archive should de-duplicate on id.
+
+Environment variables:
+- LBE_RETENTION_DAYS: age after which raw rows are compacted (default 30)
+- LBE_RETENTION_CHUNK_ROWS: rows per chunk transaction (default 5000)
+- LBE_ARCHIVE_DIR: archive directory (default backend/instance/archive)
+- LBE_RETENTION_INTERVAL_SECONDS: run in a background thread this often
+  (default 0: off, run from cron via the CLI instead)
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import text
+
+from models import db, EmotionLog, EmotionRollup
+from utils.metrics import Counter, Histogram
+from utils.progress_sync import prune_sync_cursors
+from utils.structured_log import get_logger, log_event
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+RETENTION_DAYS = float(os.environ.get("LBE_RETENTION_DAYS", "30"))
+CHUNK_ROWS = int(os.environ.get("LBE_RETENTION_CHUNK_ROWS", "5000"))
+ARCHIVE_DIR = os.environ.get(
+    "LBE_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "instance", "archive"),
+)
+RETENTION_INTERVAL_SECONDS = float(os.environ.get("LBE_RETENTION_INTERVAL_SECONDS", "0"))
+ROLLUP_BUCKET = timedelta(hours=1)
+CHUNK_PAUSE_SECONDS = 0.05  # Gap between chunk transactions for live writers
+VACUUM_PAGES_PER_STEP = 256
+MAX_VACUUM_STEPS = 1000
+
+_EPOCH = datetime(1970, 1, 1)
+
+logger = get_logger("retention")
+
+RETENTION_ROWS = Counter(
+    "lbe_retention_rows_total",
+    "EmotionLog rows processed by retention, by action.",
+    ["action"],
+)
+RETENTION_RUN_SECONDS = Histogram(
+    "lbe_retention_run_seconds",
+    "Duration of retention runs.",
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+
+# Runs in one process never overlap
+_run_lock = threading.Lock()
+
+
+def _is_sqlite():
+    return db.engine.dialect.name == "sqlite"
+
+
+def prepare_database():
+    """
+    Configure SQLite for retention. Call before db.create_all().
+
+    Enables WAL so readers are not blocked while a chunk is deleted, and
+    auto_vacuum=INCREMENTAL, which only takes effect on a database that
+    has no tables yet.
+    """
+    if not _is_sqlite():
+        return
+    with db.engine.connect() as conn:
+        # auto_vacuum first: switching to WAL writes the database header
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+
+def enable_incremental_vacuum():
+    """Switch an existing SQLite database to auto_vacuum=INCREMENTAL (runs a full VACUUM)."""
+    if not _is_sqlite():
+        return
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+
+
+def _bucket_start(timestamp):
+    """Start of the rollup bucket containing timestamp."""
+    offset = (timestamp - _EPOCH) // ROLLUP_BUCKET
+    return _EPOCH + offset * ROLLUP_BUCKET
+
+
+# ----------------------------------------
+# ARCHIVE FILES
+# ----------------------------------------
+def write_archive(rows, archive_dir=ARCHIVE_DIR):
+    """
+    Write (id, emotion, timestamp) rows to a compressed columnar archive.
+
+    Columns: id (int64), timestamp (int64 microseconds since the epoch,
+    naive like EmotionLog.timestamp), emotion (uint8 codes into
+    emotion_labels).
+
+    The file name carries the id range and a random suffix, so concurrent
+    runs archiving the same rows never write to the same file.
+
+    Returns:
+        str: Path of the archive file
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    labels, codes = np.unique(np.array([r[1] for r in rows]), return_inverse=True)
+    micros = np.fromiter(
+        ((r[2] - _EPOCH) // timedelta(microseconds=1) for r in rows),
+        dtype=np.int64, count=len(rows),
+    )
+
+    path = os.path.join(
+        archive_dir,
+        f"emotion_log_{ids[0]:012d}-{ids[-1]:012d}-{uuid.uuid4().hex[:12]}.npz",
+    )
+    fd, tmp_path = tempfile.mkstemp(dir=archive_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(
+                f, id=ids, timestamp=micros,
+                emotion=codes.astype(np.uint8), emotion_labels=labels,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def read_archive(path):
+    """Read an archive file back as a list of (id, emotion, timestamp) rows."""
+    with np.load(path) as data:
+        labels = data["emotion_labels"]
+        return [
+            (int(row_id), str(labels[code]), _EPOCH + timedelta(microseconds=int(micros)))
+            for row_id, code, micros in zip(data["id"], data["emotion"], data["timestamp"])
+        ]
+
+
+# ----------------------------------------
+# RETENTION RUN
+# ----------------------------------------
+def _select_chunk(cutoff, after_id, limit):
+    return (
+        db.session.query(EmotionLog.id, EmotionLog.emotion, EmotionLog.timestamp)
+        .filter(EmotionLog.id > after_id, EmotionLog.timestamp < cutoff)
+        .order_by(EmotionLog.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def _add_rollups(rows):
+    """Add a chunk's per-(bucket, emotion) counts to EmotionRollup."""
+    counts = {}
+    for _, emotion, timestamp in rows:
+        key = (_bucket_start(timestamp), emotion)
+        counts[key] = counts.get(key, 0) + 1
+
+    buckets = {bucket for bucket, _ in counts}
+    existing = {
+        (r.bucket_start, r.emotion): r
+        for r in EmotionRollup.query.filter(EmotionRollup.bucket_start.in_(buckets))
+    }
+    for key, count in counts.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            db.session.add(EmotionRollup(bucket_start=key[0], emotion=key[1], count=count))
+        else:
+            rollup.count += count
+
+
+def _compact_chunk(rows, cutoff, archive_dir):
+    """
+    Archive, roll up and delete one chunk.
+
+    Returns:
+        str or None: The archive path, or None if another run deleted the
+            rows first (the archive this run wrote is removed)
+    """
+    path = write_archive(rows, archive_dir)
+    try:
+        # The delete takes the write lock first, so the rows are stable from here on
+        deleted = (
+            db.session.query(EmotionLog)
+            .filter(
+                EmotionLog.id >= rows[0][0],
+                EmotionLog.id <= rows[-1][0],
+                EmotionLog.timestamp < cutoff,
+            )
+            .delete(synchronize_session=False)
+        )
+        if deleted != len(rows):
+            # Another retention run got here first; let it own these rows
+            db.session.rollback()
+            os.remove(path)
+            return None
+        _add_rollups(rows)
+        db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        os.remove(path)
+        raise
+    return path
+
+
+def incremental_vacuum(max_steps=MAX_VACUUM_STEPS):
+    """
+    Release free pages a few at a time.
+
+    Returns:
+        int: Pages released, or -1 if auto_vacuum is not INCREMENTAL
+    """
+    if not _is_sqlite():
+        return 0
+
+    released = 0
+    with db.engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            return -1
+        # sqlite3's execute() steps a PRAGMA once, which frees a single page;
+        # executescript() runs it to completion in its own transaction.
+        raw = conn.connection.driver_connection
+        for _ in range(max_steps):
+            free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            conn.commit()
+            if not free:
+                break
+            step = min(free, VACUUM_PAGES_PER_STEP)
+            raw.executescript(f"PRAGMA incremental_vacuum({step})")
+            released += step
+            time.sleep(CHUNK_PAUSE_SECONDS)
+    return released
+
+
+def run_retention(days=RETENTION_DAYS, chunk_rows=CHUNK_ROWS, archive_dir=ARCHIVE_DIR, now=None):
+    """
+    Compact EmotionLog rows older than `days`. Needs an app context.
+
+    Returns:
+        dict: Summary with cutoff, rows, chunks, archives, sync_cursors_pruned
+            and vacuumed_pages
+    """
+    cutoff = (now or datetime.now()) - timedelta(days=days)
+    summary = {"cutoff": cutoff.isoformat(), "rows": 0, "chunks": 0, "archives": []}
+
+    with _run_lock, RETENTION_RUN_SECONDS.time():
+        after_id = 0
+        while True:
+            rows = _select_chunk(cutoff, after_id, chunk_rows)
+            db.session.rollback()  # End the read transaction before the next write
+            if not rows:
+                break
+            after_id = rows[-1][0]
+
+            path = _compact_chunk(rows, cutoff, archive_dir)
+            if path is not None:
+                RETENTION_ROWS.inc("archived", amount=len(rows))
+                RETENTION_ROWS.inc("deleted", amount=len(rows))
+                summary["rows"] += len(rows)
+                summary["chunks"] += 1
+                summary["archives"].append(path)
+            time.sleep(CHUNK_PAUSE_SECONDS)
+
+        summary["sync_cursors_pruned"] = prune_sync_cursors()
+        summary["vacuumed_pages"] = incremental_vacuum()
+
+    log_event(logger, logging.INFO, "retention_run", cutoff=summary["cutoff"],
+              rows=summary["rows"], chunks=summary["chunks"],
+              sync_cursors_pruned=summary["sync_cursors_pruned"],
+              vacuumed_pages=summary["vacuumed_pages"])
+    return summary
+
+
+class RetentionWorker:
+    """Daemon thread running retention every `interval` seconds."""
+
+    def __init__(self, app, interval=RETENTION_INTERVAL_SECONDS, on_run=None):
+        """
+        Args:
+            app (Flask): Application whose database is compacted
+            interval (float): Seconds between runs
+            on_run (callable): Called with the summary after each run that removed rows
+        """
+        self.app = app
+        self.interval = interval
+        self.on_run = on_run
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="lbe-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    summary = run_retention()
+                if summary["rows"] and self.on_run is not None:
+                    self.on_run(summary)
+            except Exception as e:
+                log_event(logger, logging.ERROR, "retention_failed", error=str(e))
@@ -0,0 +1,142 @@
+"""
+Non-blocking structured logging for the backend.
+
+Records are handed to a bounded in-memory queue and written as one JSON
+object per line by a background listener thread, so request threads never
+block on stdout. When the queue is full, records are dropped and counted
+instead of stalling inference.
+
+Per-frame diagnostics go through log_frame(), which logs at DEBUG and is
+sampled. With the default INFO level they return before any work is done.
+
+Environment variables:
+- LBE_LOG_LEVEL: minimum level (default INFO)
+- LBE_FRAME_LOG_SAMPLE_RATE: fraction of per-frame records kept (default 1.0)
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+LOG_LEVEL = os.environ.get("LBE_LOG_LEVEL", "INFO").upper()
+FRAME_LOG_SAMPLE_RATE = float(os.environ.get("LBE_FRAME_LOG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = 10000
+ROOT_LOGGER_NAME = "lbe"
+
+_configure_lock = threading.Lock()
+_listener = None
+
+
+# ----------------------------------------
+# FORMATTING
+# ----------------------------------------
+class JsonFormatter(logging.Formatter):
+    """Format a record as a single-line JSON object."""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records are dropped when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Keep the caller's work minimal: merge args and render tracebacks
+        # here, leave JSON formatting to the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# ----------------------------------------
+# SETUP
+# ----------------------------------------
+def _configure():
+    """Attach the queue handler and start the listener thread once per process."""
+    global _listener
+
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter())
+
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.addHandler(DroppingQueueHandler(log_queue))
+        root.propagate = False
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    """
+    Return a backend logger writing through the async queue.
+
+    Args:
+        name (str): Component name, e.g. "emotion_model"
+
+    Returns:
+        logging.Logger: Logger named "lbe.<name>"
+    """
+    _configure()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def log_event(logger, level, event, **fields):
+    """Log a structured event with extra key/value fields."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+
+def log_frame(logger, event, **fields):
+    """
+    Log a sampled per-frame DEBUG diagnostic.
+
+    Returns immediately unless DEBUG is enabled for the logger, so callers
+    on the hot path should pass cheap, already-computed values.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if FRAME_LOG_SAMPLE_RATE < 1.0 and random.random() >= FRAME_LOG_SAMPLE_RATE:
+        return
+    logger.debug(event, extra={"fields": fields})
@@ -0,0 +1,165 @@
+"""
+Thread-pool sizing for OpenCV and TensorFlow.
+
+OpenCV (detectMultiScale, cvtColor, Laplacian) and TensorFlow each start a
+thread pool sized to every core on the host, in every worker process.
+With several workers on a many-core host that means
+workers x (OpenCV threads + TF intra-op + TF inter-op) runnable threads
+competing for the same cores. The extra context switches and cache
+thrashing cost more than the parallelism gains.
+
+configure_threads() sizes the pools from the process's share of the CPU
+budget. The first source that is set wins:
+
+1. explicit LBE_CV_THREADS, LBE_TF_INTRA_OP_THREADS and
+   LBE_TF_INTER_OP_THREADS,
+2. the configuration recorded by benchmarks/tune_threads.py in
+   LBE_THREAD_CONFIG, if it was tuned on this host for the same worker
+   count and budget,
+3. derived defaults: every pool gets cores // workers threads (at least
+   1), TF inter-op gets at most 2 since the model runs one op graph per
+   request.
+
+The worker count is LBE_WORKERS, or WEB_CONCURRENCY as set by gunicorn
+deployments (default 1). The core budget is LBE_CPU_BUDGET, or the cores
+this process may run on.
+
+TF only accepts thread settings before its runtime starts, so this runs
+at app start-up, before the model is loaded.
+"""
+
+import json
+import logging
+import os
+import socket
+
+import cv2
+
+from utils.metrics import Gauge
+from utils.structured_log import get_logger, log_event
+
+try:
+    import tensorflow as tf
+except Exception:
+    tf = None
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+THREAD_CONFIG_PATH = os.environ.get(
+    "LBE_THREAD_CONFIG",
+    os.path.join(os.path.dirname(__file__), "..", "instance", "thread_config.json"),
+)
+MAX_INTER_OP_THREADS = 2
+
+logger = get_logger("thread_config")
+
+THREAD_POOL_SIZE = Gauge(
+    "lbe_thread_pool_size",
+    "Threads configured per pool in this process.",
+    ["pool"],
+)
+
+
+def available_cores():
+    """Cores this process may run on (respects taskset / cpusets)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def worker_count():
+    return max(1, int(os.environ.get("LBE_WORKERS") or os.environ.get("WEB_CONCURRENCY") or 1))
+
+
+def cpu_budget():
+    return max(1, int(os.environ.get("LBE_CPU_BUDGET") or available_cores()))
+
+
+def derive_thread_config(workers, budget):
+    """Default pool sizes for one of `workers` processes sharing `budget` cores."""
+    per_worker = max(1, budget // workers)
+    return {
+        "cv_threads": per_worker,
+        "tf_intra_op_threads": per_worker,
+        "tf_inter_op_threads": min(MAX_INTER_OP_THREADS, per_worker),
+    }
+
+
+def load_tuned_config(workers, budget, path=THREAD_CONFIG_PATH):
+    """
+    The recorded auto-tune result, if it applies to this host and layout.
+
+    Returns:
+        dict or None: cv_threads, tf_intra_op_threads, tf_inter_op_threads
+    """
+    try:
+        with open(path) as f:
+            tuned = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if (tuned.get("host") != socket.gethostname()
+            or tuned.get("cpu_count") != os.cpu_count()
+            or tuned.get("workers") != workers
+            or tuned.get("cpu_budget") != budget):
+        return None
+    best = tuned.get("best") or {}
+    keys = ("cv_threads", "tf_intra_op_threads", "tf_inter_op_threads")
+    if not all(isinstance(best.get(k), int) and best[k] > 0 for k in keys):
+        return None
+    return {k: best[k] for k in keys}
+
+
+def resolve_thread_config():
+    """
+    The thread configuration for this process and where it came from.
+
+    Returns:
+        tuple: (config dict, source) with source "env", "tuned" or "derived"
+    """
+    workers, budget = worker_count(), cpu_budget()
+    config = load_tuned_config(workers, budget)
+    source = "tuned"
+    if config is None:
+        config, source = derive_thread_config(workers, budget), "derived"
+
+    overrides = {
+        "cv_threads": os.environ.get("LBE_CV_THREADS"),
+        "tf_intra_op_threads": os.environ.get("LBE_TF_INTRA_OP_THREADS"),
+        "tf_inter_op_threads": os.environ.get("LBE_TF_INTER_OP_THREADS"),
+    }
+    for key, value in overrides.items():
+        if value:
+            config[key] = max(1, int(value))
+            source = "env"
+    return config, source
+
+
+def apply_thread_config(config):
+    """Set the OpenCV and TF pool sizes in this process."""
+    cv2.setNumThreads(config["cv_threads"])
+    THREAD_POOL_SIZE.set(cv2.getNumThreads(), "opencv")
+
+    if tf is None:
+        return
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(config["tf_intra_op_threads"])
+        tf.config.threading.set_inter_op_parallelism_threads(config["tf_inter_op_threads"])
+    except RuntimeError as e:
+        # The TF runtime already started; its pools keep their sizes
+        log_event(logger, logging.WARNING, "tf_threads_not_applied", error=str(e))
+        return
+    THREAD_POOL_SIZE.set(config["tf_intra_op_threads"], "tf_intra_op")
+    THREAD_POOL_SIZE.set(config["tf_inter_op_threads"], "tf_inter_op")
+
+
+def configure_threads():
+    """Resolve and apply the thread configuration. Returns (config, source)."""
+    config, source = resolve_thread_config()
+    apply_thread_config(config)
+    log_event(logger, logging.INFO, "thread_config", source=source,
+              workers=worker_count(), cpu_budget=cpu_budget(), **config)
+    return config, source
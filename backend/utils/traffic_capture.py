@@ -0,0 +1,270 @@
+"""
+Opt-in capture of /api/emotion traffic for offline replay.
+
+Real webcam frames never reach test environments, so regressions in the
+pipeline are hard to reproduce. With LBE_CAPTURE_SAMPLE_RATE > 0, a sampled
+fraction of /api/emotion requests is appended to a capture log, with:
+- the decoded image bytes (not base64),
+- session id, deadline and multi-face flag,
+- arrival time and server latency,
+- response status and emotion.
+
+benchmarks/replay.py feeds a log back through the pipeline and diffs the
+results. Frames are students' faces: only enable capture where that is
+allowed, and treat the files accordingly.
+
+Each process writes its own file, capture-<time>-<pid>.lbecap in
+LBE_CAPTURE_DIR. The file is preallocated (sparse) to LBE_CAPTURE_MAX_BYTES
+and memory-mapped, so appending a record is a copy into the page cache
+with no write() call. The header holds the end offset of the last
+complete record, updated after each record is written, so readers (and
+crash recovery) see only whole records. Capture stops when the file is
+full. On exit the file is truncated to its used length.
+
+Layout (little-endian):
+    file header:  magic "LBECAP01", uint64 committed end offset, float64
+                  creation time, zero-padded to DATA_OFFSET
+    record:       RECORD_HEADER, then session id, emotion (UTF-8), image
+"""
+
+import atexit
+import base64
+import logging
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from functools import wraps
+
+from flask import make_response, request
+
+from utils.deadline import parse_budget_ms
+from utils.metrics import Counter
+from utils.request_params import parse_bool
+from utils.structured_log import get_logger, log_event
+
+
+# ----------------------------------------
+# CONFIGURATION
+# ----------------------------------------
+CAPTURE_SAMPLE_RATE = float(os.environ.get("LBE_CAPTURE_SAMPLE_RATE", "0"))
+CAPTURE_DIR = os.environ.get(
+    "LBE_CAPTURE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "instance", "capture"),
+)
+CAPTURE_MAX_BYTES = int(os.environ.get("LBE_CAPTURE_MAX_BYTES", str(1 << 30)))
+
+MAGIC = b"LBECAP01"
+FILE_HEADER = struct.Struct("<8sQd")  # magic, committed end offset, created at
+DATA_OFFSET = 64
+# captured_at, latency ms, status, multi_face, session len, emotion len,
+# deadline ms, image len
+RECORD_HEADER = struct.Struct("<dfHBxHHII")
+MULTI_FACE_UNSET = 255
+
+logger = get_logger("traffic_capture")
+
+CAPTURED_FRAMES = Counter(
+    "lbe_captured_frames_total",
+    "Requests considered for traffic capture, by outcome.",
+    ["outcome"],
+)
+
+CapturedFrame = namedtuple(
+    "CapturedFrame",
+    "captured_at latency_ms status multi_face session_id emotion deadline_ms image",
+)
+
+
+class CaptureFormatError(ValueError):
+    """Raised when a file is not a readable capture log."""
+
+
+def _utf8_field(value):
+    """UTF-8 bytes of value, cut to the 16-bit length field on a character boundary."""
+    return (value or "").encode()[:0xFFFF].decode("utf-8", "ignore").encode()
+
+
+class TrafficCapture:
+    """Appends sampled requests to this process's memory-mapped capture log."""
+
+    def __init__(self, sample_rate=CAPTURE_SAMPLE_RATE, capture_dir=CAPTURE_DIR,
+                 max_bytes=CAPTURE_MAX_BYTES):
+        self.sample_rate = sample_rate
+        self.capture_dir = capture_dir
+        self.max_bytes = max_bytes
+        self.path = None
+        self.full = False
+        self._file = None
+        self._map = None
+        self._offset = DATA_OFFSET
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def _open(self):
+        """Create and map this process's log file (caller holds the lock)."""
+        os.makedirs(self.capture_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.path = os.path.join(self.capture_dir, f"capture-{stamp}-{os.getpid()}.lbecap")
+        self._file = open(self.path, "w+b")
+        self._file.truncate(self.max_bytes)
+        self._map = mmap.mmap(self._file.fileno(), self.max_bytes)
+        FILE_HEADER.pack_into(self._map, 0, MAGIC, DATA_OFFSET, time.time())
+        atexit.register(self.close)
+        log_event(logger, logging.INFO, "capture_started", path=self.path,
+                  sample_rate=self.sample_rate)
+
+    def append(self, captured_at, latency_ms, status, multi_face, session_id, emotion,
+               deadline_ms, image):
+        """
+        Append one record. Returns False if the log is full.
+
+        Args:
+            multi_face (bool): None if the request did not set it
+            deadline_ms (int): 0 if the request had no deadline
+            image (bytes): Encoded image
+        """
+        session = _utf8_field(session_id)
+        emotion = _utf8_field(emotion)
+        size = RECORD_HEADER.size + len(session) + len(emotion) + len(image)
+
+        with self._lock:
+            if self.full:
+                return False
+            if self._map is None:
+                self._open()
+            if self._offset + size > self.max_bytes:
+                self.full = True
+                log_event(logger, logging.WARNING, "capture_full", path=self.path)
+                return False
+
+            pos = self._offset
+            RECORD_HEADER.pack_into(
+                self._map, pos, captured_at, latency_ms, status,
+                MULTI_FACE_UNSET if multi_face is None else int(bool(multi_face)),
+                len(session), len(emotion), int(deadline_ms or 0), len(image),
+            )
+            pos += RECORD_HEADER.size
+            for part in (session, emotion, image):
+                self._map[pos : pos + len(part)] = part
+                pos += len(part)
+
+            # Publish the record only once it is complete
+            self._offset = pos
+            struct.pack_into("<Q", self._map, len(MAGIC), pos)
+        return True
+
+    def captured(self, session_for):
+        """
+        Decorator for the /api/emotion view: captures sampled requests.
+
+        Args:
+            session_for (callable): request JSON -> session id, as the view
+                resolves it
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or self.full or random.random() >= self.sample_rate:
+                    return view(*args, **kwargs)
+
+                captured_at = time.time()
+                started = time.perf_counter()
+                response = make_response(view(*args, **kwargs))
+                latency_ms = (time.perf_counter() - started) * 1000.0
+
+                # Capture must never fail the request
+                try:
+                    self._capture_request(response, captured_at, latency_ms, session_for)
+                except Exception as e:
+                    CAPTURED_FRAMES.inc("error")
+                    log_event(logger, logging.WARNING, "capture_failed", error=str(e))
+                return response
+            return wrapper
+        return decorator
+
+    def _capture_request(self, response, captured_at, latency_ms, session_for):
+        data = request.get_json(silent=True) or {}
+        image_base64 = data.get("image")
+        if not image_base64:
+            CAPTURED_FRAMES.inc("no_image")
+            return
+        image = base64.b64decode(image_base64.split(",")[-1])
+        deadline_ms = data.get("deadline_ms")
+        if deadline_ms is None:
+            deadline_ms = request.headers.get("X-Frame-Deadline-Ms")
+        try:
+            deadline_ms = parse_budget_ms(deadline_ms) or 0
+        except ValueError:
+            deadline_ms = 0
+        body = response.get_json(silent=True) or {}
+
+        try:
+            multi_face = parse_bool(data.get("multi_face"), None)
+        except ValueError:
+            multi_face = None
+        appended = self.append(
+            captured_at, latency_ms, response.status_code, multi_face,
+            session_for(data), body.get("emotion"), int(deadline_ms), image,
+        )
+        CAPTURED_FRAMES.inc("captured" if appended else "full")
+
+    def close(self):
+        """Unmap the log and truncate it to its used length."""
+        with self._lock:
+            if self._map is None:
+                return
+            self._map.flush()
+            self._map.close()
+            self._file.truncate(self._offset)
+            self._file.close()
+            self._map = self._file = None
+            self.full = True
+
+
+def read_capture(path):
+    """
+    Read every complete record of a capture log.
+
+    Returns:
+        list: CapturedFrame per record, in the order they were written
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < DATA_OFFSET:
+            raise CaptureFormatError(f"{path} is not a capture log")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, end, _ = FILE_HEADER.unpack_from(data, 0)
+            if magic != MAGIC:
+                raise CaptureFormatError(f"{path} is not a capture log")
+
+            frames = []
+            pos = DATA_OFFSET
+            end = min(end, size)
+            while pos + RECORD_HEADER.size <= end:
+                (captured_at, latency_ms, status, multi_face, session_len, emotion_len,
+                 deadline_ms, image_len) = RECORD_HEADER.unpack_from(data, pos)
+                pos += RECORD_HEADER.size
+                session_id = data[pos : pos + session_len].decode(errors="replace")
+                pos += session_len
+                emotion = data[pos : pos + emotion_len].decode(errors="replace")
+                pos += emotion_len
+                image = data[pos : pos + image_len]
+                pos += image_len
+                frames.append(CapturedFrame(
+                    captured_at, latency_ms, status,
+                    None if multi_face == MULTI_FACE_UNSET else bool(multi_face),
+                    session_id, emotion or None, deadline_ms or None, image,
+                ))
+            return frames
+
+
+# Shared by the app (off unless LBE_CAPTURE_SAMPLE_RATE is set)
+TRAFFIC_CAPTURE = TrafficCapture()
@@ -4,18 +4,29 @@ Webcam validation module for emotion detection.
 Provides robust frame quality checks including:
 - Frame brightness validation
 - Motion blur detection
-- Face detection using Haar Cascade classifiers
+- Face detection using pluggable backends (Haar, YuNet, DNN SSD)
 - Face region cropping for emotion model input
+
+Frames may be BGR or grayscale. Grayscale frames decoded at reduced scale
+(see utils.image_decode) pass their reduction factor, and the size and
+blur thresholds are scaled to match.
 """
 
 import cv2
 import numpy as np
 
+from utils.face_detectors import (
+    FACE_CASCADE_PATH,
+    FACE_MIN_SIZE,
+    _as_gray,
+    get_face_detector,
+)
+from utils.metrics import STAGE_SECONDS, VALIDATION_OUTCOMES
+from utils.deadline import check_deadline
+from utils.structured_log import get_logger
 
-# ----------------------------------------
-# HAAR CASCADE CLASSIFIER PATHS
-# ----------------------------------------
-FACE_CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+
+logger = get_logger("webcam_validator")
 
 
 # ----------------------------------------
@@ -24,7 +35,15 @@ FACE_CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml
 BRIGHTNESS_THRESHOLD_LOW = 30  # Min brightness (too dark)
 BRIGHTNESS_THRESHOLD_HIGH = 220  # Max brightness (too bright/washed out)
 BLUR_THRESHOLD = 100  # Laplacian variance threshold for blur detection
-FACE_MIN_SIZE = 48  # Minimum face detection size
+
+# Blur threshold for frames decoded at 1/2, 1/4 or 1/8 scale. At full
+# resolution the Laplacian variance is dominated by pixel-level sensor
+# noise, which DCT downscaling averages out, so the full-resolution
+# threshold does not carry over. Measured on synthetic webcam frames
+# (640x480 to 2560x1440) at their chosen decode scale: sharp frames score
+# 150-245, frames blurred by 1 px at 640x480-equivalent scale score under
+# 55, and frames at the full-resolution rejection point score 60-130.
+BLUR_THRESHOLD_REDUCED = 80
 
 
 # ----------------------------------------
@@ -33,20 +52,24 @@ FACE_MIN_SIZE = 48  # Minimum face detection size
 class ValidationResult:
     """Result of webcam frame validation."""
     
-    def __init__(self, is_valid, validation_type, message, face_region=None, num_faces=0):
+    def __init__(self, is_valid, validation_type, message, face_region=None, num_faces=0,
+                 faces=None):
         """
         Args:
             is_valid (bool): Whether frame passed validation
             validation_type (str): Type of validation (e.g., 'brightness', 'blur', 'face_count')
             message (str): Human-readable validation message
-            face_region (tuple): (x, y, w, h) of detected face, None if not valid
+            face_region (np.ndarray): Grayscale crop of the (largest) face, None if not valid
             num_faces (int): Number of faces detected
+            faces (list): (box, crop) pairs for every accepted face, where box is
+                (x, y, w, h); only filled for valid results
         """
         self.is_valid = is_valid
         self.validation_type = validation_type
         self.message = message
         self.face_region = face_region
         self.num_faces = num_faces
+        self.faces = faces or []
     
     def to_emotion_response(self):
         """Convert validation failure to emotion API response."""
@@ -84,8 +107,11 @@ def is_frame_too_dark_or_bright(frame):
     """
     Check if frame is too dark or too bright.
     
+    Mean brightness does not depend on scale, so reduced frames use the
+    same thresholds.
+    
     Args:
-        frame (np.ndarray): BGR OpenCV frame
+        frame (np.ndarray): BGR or grayscale OpenCV frame
     
     Returns:
         bool: True if frame is too dark/bright, False if acceptable
@@ -94,7 +120,7 @@ def is_frame_too_dark_or_bright(frame):
         return True
     
     # Convert to grayscale for brightness analysis
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = _as_gray(frame)
     brightness = np.mean(gray)
     
     # Check if too dark or too bright
@@ -109,12 +135,13 @@ def is_frame_too_dark_or_bright(frame):
 # ----------------------------------------
 # BLUR DETECTION
 # ----------------------------------------
-def is_frame_blurred(frame):
+def is_frame_blurred(frame, reduction=1):
     """
     Detect if frame is blurry using Laplacian variance method.
     
     Args:
-        frame (np.ndarray): BGR OpenCV frame
+        frame (np.ndarray): BGR or grayscale OpenCV frame
+        reduction (int): Decode reduction factor of the frame (1, 2, 4 or 8)
     
     Returns:
         bool: True if frame is blurred, False if clear
@@ -123,13 +150,14 @@ def is_frame_blurred(frame):
         return True
     
     # Convert to grayscale
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = _as_gray(frame)
     
     # Calculate Laplacian variance (focus measure)
     laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
     
     # If variance is below threshold, image is blurry
-    if laplacian_var < BLUR_THRESHOLD:
+    threshold = BLUR_THRESHOLD if reduction == 1 else BLUR_THRESHOLD_REDUCED
+    if laplacian_var < threshold:
         return True  # Blurred
     
     return False
@@ -138,36 +166,45 @@ def is_frame_blurred(frame):
 # ----------------------------------------
 # FACE DETECTION
 # ----------------------------------------
-def detect_faces(frame):
+def detect_faces(frame, downscale=None, target_width=None, scale_factor=None,
+                 detector=None, reduction=1):
     """
-    Detect faces in frame using Haar Cascade classifier.
+    Detect faces in frame using the configured face detector backend.
+    
+    The backend defaults to FACE_DETECTOR ("haar", "yunet" or "ssd"). For the
+    Haar cascade, downscaled mode runs detection on a copy of the frame
+    shrunk towards target_width (no further than keeps the minimum face
+    size detectable), and the boxes are mapped back to full resolution so
+    the crop in extract_largest_face keeps full face quality.
     
     Args:
         frame (np.ndarray): BGR OpenCV frame
+        downscale (bool): Run detection on a downscaled copy (Haar only)
+        target_width (int): Width of the downscaled copy (Haar only)
+        scale_factor (float): detectMultiScale pyramid step (Haar only)
+        detector (str): Backend name, defaults to FACE_DETECTOR
+        reduction (int): Decode reduction factor of the frame; the minimum
+            face size is scaled down by it
     
     Returns:
-        list: List of detected faces as (x, y, w, h) tuples
+        list: List of detected faces as (x, y, w, h) tuples in
+            frame coordinates
     """
     if frame is None:
         return []
     
     try:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        face_cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
-        
-        # Detect faces with reasonable parameters
-        faces = face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(FACE_MIN_SIZE, FACE_MIN_SIZE),
-            flags=cv2.CASCADE_SCALE_IMAGE
+        face_detector = get_face_detector(detector)
+        return face_detector.detect(
+            frame,
+            downscale=downscale,
+            target_width=target_width,
+            scale_factor=scale_factor,
+            min_size=max(1, FACE_MIN_SIZE // reduction)
         )
-        
-        return list(faces) if len(faces) > 0 else []
     
     except Exception as e:
-        print(f"[webcam_validator] Face detection error: {e}")
+        logger.warning("Face detection error: %s", e)
         return []
 
 
@@ -179,7 +216,7 @@ def extract_largest_face(frame, faces):
     Extract the largest detected face region from frame.
     
     Args:
-        frame (np.ndarray): BGR OpenCV frame
+        frame (np.ndarray): BGR or grayscale OpenCV frame
         faces (list): List of detected faces as (x, y, w, h) tuples
     
     Returns:
@@ -194,20 +231,47 @@ def extract_largest_face(frame, faces):
         x, y, w, h = largest_face
         
         # Convert to grayscale and crop
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = _as_gray(frame)
         face_region = gray[y:y+h, x:x+w]
         
         return face_region
     
     except Exception as e:
-        print(f"[webcam_validator] Face extraction error: {e}")
+        logger.warning("Face extraction error: %s", e)
         return None
 
 
+def extract_all_faces(frame, faces):
+    """
+    Extract every detected face region from frame.
+    
+    Args:
+        frame (np.ndarray): BGR or grayscale OpenCV frame
+        faces (list): List of detected faces as (x, y, w, h) tuples
+    
+    Returns:
+        list: (box, grayscale crop) pairs, largest face first
+    """
+    if not faces or frame is None:
+        return []
+    
+    try:
+        gray = _as_gray(frame)
+        ordered = sorted(faces, key=lambda f: f[2] * f[3], reverse=True)
+        return [
+            (tuple(int(v) for v in (x, y, w, h)), gray[y:y+h, x:x+w])
+            for x, y, w, h in ordered
+        ]
+    
+    except Exception as e:
+        logger.warning("Face extraction error: %s", e)
+        return []
+
+
 # ----------------------------------------
 # COMPREHENSIVE VALIDATION
 # ----------------------------------------
-def validate_webcam_frame(frame):
+def validate_webcam_frame(frame, detector=None, deadline=None, multi_face=False, reduction=1):
     """
     Perform comprehensive validation on webcam frame.
     
@@ -216,31 +280,63 @@ def validate_webcam_frame(frame):
     2. Blur detection
     3. Face detection count (0, 1, or >1)
     
+    In multi-face mode more than one face is accepted and every face is
+    cropped into result.faces instead of rejecting the frame.
+    
     Args:
-        frame (np.ndarray): BGR OpenCV frame
+        frame (np.ndarray): BGR or grayscale OpenCV frame
+        detector (str): Face detector backend, defaults to FACE_DETECTOR
+        deadline (Deadline): Optional frame deadline, checked before each stage
+        multi_face (bool): Accept frames with several faces
+        reduction (int): Decode reduction factor of the frame. Thresholds are
+            scaled to match, and boxes in result.faces are reported in
+            original image coordinates.
     
     Returns:
         ValidationResult: Result object with validation status and details
+    
+    Raises:
+        DeadlineExceeded: If the deadline passes before a stage starts
     """
+    result = _run_validation_checks(frame, detector, deadline, multi_face, reduction)
+    VALIDATION_OUTCOMES.inc(result.validation_type)
+    return result
+
+
+def _original_box(box, reduction):
+    """Scale an (x, y, w, h) box from a reduced frame to the original image."""
+    return tuple(int(v) * reduction for v in box)
+
+
+def _run_validation_checks(frame, detector, deadline, multi_face=False, reduction=1):
+    """Run the validation checks in order, timing each stage."""
     if frame is None:
         return ValidationResult(
             False, "invalid_frame", "Frame is None", None, 0
         )
     
     # Check 1: Brightness
-    if is_frame_too_dark_or_bright(frame):
+    check_deadline(deadline, "brightness")
+    with STAGE_SECONDS.time("brightness"):
+        too_dark_or_bright = is_frame_too_dark_or_bright(frame)
+    if too_dark_or_bright:
         return ValidationResult(
             False, "brightness", "Frame is too dark or too bright", None, 0
         )
     
     # Check 2: Blur
-    if is_frame_blurred(frame):
+    check_deadline(deadline, "blur")
+    with STAGE_SECONDS.time("blur"):
+        blurred = is_frame_blurred(frame, reduction)
+    if blurred:
         return ValidationResult(
             False, "blur", "Frame is too blurred", None, 0
         )
     
     # Check 3: Face detection
-    faces = detect_faces(frame)
+    check_deadline(deadline, "face_detection")
+    with STAGE_SECONDS.time("face_detection"):
+        faces = detect_faces(frame, detector=detector, reduction=reduction)
     num_faces = len(faces)
     
     if num_faces == 0:
@@ -248,22 +344,39 @@ def validate_webcam_frame(frame):
             False, "no_face", "No face detected in frame", None, 0
         )
     
-    if num_faces > 1:
+    if num_faces > 1 and not multi_face:
         return ValidationResult(
             False, "multiple_faces", "Multiple faces detected", None, num_faces
         )
     
+    if multi_face:
+        check_deadline(deadline, "face_extraction")
+        with STAGE_SECONDS.time("face_extraction"):
+            extracted = extract_all_faces(frame, faces)
+        if not extracted:
+            return ValidationResult(
+                False, "face_extraction", "Failed to extract face regions", None, num_faces
+            )
+        return ValidationResult(
+            True, "valid", f"{len(extracted)} face(s) detected",
+            face_region=extracted[0][1],
+            num_faces=len(extracted),
+            faces=[(_original_box(box, reduction), crop) for box, crop in extracted]
+        )
+    
     # Check 4: Extract face region
-    face_region = extract_largest_face(frame, faces)
+    check_deadline(deadline, "face_extraction")
+    with STAGE_SECONDS.time("face_extraction"):
+        face_region = extract_largest_face(frame, faces)
     if face_region is None:
         return ValidationResult(
             False, "face_extraction", "Failed to extract face region", None, 1
         )
     
     # Validation passed: single face detected and extracted
-    x, y, w, h = faces[0]
     return ValidationResult(
         True, "valid", "Valid single face detected", 
         face_region=face_region,
-        num_faces=1
+        num_faces=1,
+        faces=[(_original_box(faces[0], reduction), face_region)]
     )
@@ -8,6 +8,7 @@ import {
   Legend
 } from "chart.js";
 import { useEffect, useState } from "react";
+import { fetchProgress, OVERALL_SCOPE } from "../services/progressSync";
 
 ChartJS.register(
   CategoryScale,
@@ -21,27 +22,28 @@ export default function EmotionChart() {
   const [chartData, setChartData] = useState(null);
 
   useEffect(() => {
-    const userEmail = localStorage.getItem("userEmail");
-    const emotionHistoryKey = userEmail ? `emotionHistory_${userEmail}` : "emotionHistory";
-
-    const history = JSON.parse(localStorage.getItem(emotionHistoryKey)) || {};
-
-    const labels = Object.keys(history);
-    const values = Object.values(history);
-
-    if (labels.length === 0) return;
-
-    setChartData({
-      labels,
-      datasets: [
-        {
-          label: "Emotion Count",
-          data: values,
-          backgroundColor: "#7c3aed",
-          borderRadius: 8
-        }
-      ]
-    });
+    fetchProgress()
+      .then(({ emotions }) => {
+        const history = emotions[OVERALL_SCOPE] || {};
+
+        const labels = Object.keys(history);
+        const values = Object.values(history);
+
+        if (labels.length === 0) return;
+
+        setChartData({
+          labels,
+          datasets: [
+            {
+              label: "Emotion Count",
+              data: values,
+              backgroundColor: "#7c3aed",
+              borderRadius: 8
+            }
+          ]
+        });
+      })
+      .catch((err) => console.error("Progress API error:", err));
   }, []);
 
   if (!chartData) {
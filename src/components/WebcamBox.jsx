@@ -1,5 +1,6 @@
 import React, { useRef, useEffect } from "react";
 import "../styles/WebcamBox.css";
+import { frameSessionId } from "../services/api";
 
 const WebcamBox = ({ onEmotionDetected }) => {
   const videoRef = useRef(null);
@@ -35,7 +36,7 @@ const WebcamBox = ({ onEmotionDetected }) => {
       const res = await fetch("http://localhost:5000/api/emotion", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ image: base64Image }),
+        body: JSON.stringify({ image: base64Image, session_id: frameSessionId() }),
       });
 
       const data = await res.json();
@@ -1,6 +1,8 @@
 import { useEffect, useState } from "react";
 import { Pie } from "react-chartjs-2";
 import { useNavigate } from "react-router-dom";
+import { fetchProgress, OVERALL_SCOPE } from "../services/progressSync";
+import { subscribeAnalytics } from "../services/api";
 
 import {
   Chart as ChartJS,
@@ -16,37 +18,40 @@ export default function Analytics() {
 
   const [overallData, setOverallData] = useState(null);
   const [moduleData, setModuleData] = useState({});
+  const [classCounts, setClassCounts] = useState({});
+
+  // 🔹 Class-wide emotions, pushed live by the server
+  useEffect(() => subscribeAnalytics(setClassCounts), []);
 
   useEffect(() => {
-    // 🔹 Overall emotions (Learning + Courses)
-    const userEmail = localStorage.getItem("userEmail");
-    const emotionHistoryKey = userEmail ? `emotionHistory_${userEmail}` : "emotionHistory";
-    const moduleEmotionHistoryKey = userEmail ? `moduleEmotionHistory_${userEmail}` : "moduleEmotionHistory";
-
-    const overall = JSON.parse(localStorage.getItem(emotionHistoryKey)) || {};
-
-    if (Object.keys(overall).length > 0) {
-      setOverallData({
-        labels: Object.keys(overall),
-        datasets: [
-          {
-            data: Object.values(overall),
-            backgroundColor: [
-              "#7c3aed",
-              "#22c55e",
-              "#facc15",
-              "#ef4444",
-              "#38bdf8",
-              "#a855f7"
+    fetchProgress()
+      .then(({ emotions }) => {
+        // 🔹 Overall emotions (Learning + Courses)
+        const { [OVERALL_SCOPE]: overall = {}, ...module } = emotions;
+
+        if (Object.keys(overall).length > 0) {
+          setOverallData({
+            labels: Object.keys(overall),
+            datasets: [
+              {
+                data: Object.values(overall),
+                backgroundColor: [
+                  "#7c3aed",
+                  "#22c55e",
+                  "#facc15",
+                  "#ef4444",
+                  "#38bdf8",
+                  "#a855f7"
+                ]
+              }
             ]
-          }
-        ]
-      });
-    }
-
-    // 🔹 Module-wise emotions (ONLY modules)
-    const module = JSON.parse(localStorage.getItem(moduleEmotionHistoryKey)) || {};
-    setModuleData(module);
+          });
+        }
+
+        // 🔹 Module-wise emotions (ONLY modules)
+        setModuleData(module);
+      })
+      .catch((err) => console.error("Progress API error:", err));
   }, []);
 
   const colors = [
@@ -103,6 +108,37 @@ export default function Analytics() {
         )}
       </section>
 
+      {/* ================= LIVE CLASS ANALYTICS ================= */}
+      <section style={{ marginTop: "50px" }}>
+        <h3>Live Class Emotions</h3>
+
+        {Object.keys(classCounts).length > 0 ? (
+          <div style={{ maxWidth: "420px", marginTop: "20px" }}>
+            <Pie
+              data={{
+                labels: Object.keys(classCounts),
+                datasets: [
+                  {
+                    data: Object.values(classCounts),
+                    backgroundColor: colors.slice(
+                      0,
+                      Object.keys(classCounts).length
+                    )
+                  }
+                ]
+              }}
+              options={{
+                plugins: {
+                  legend: { position: "bottom" }
+                }
+              }}
+            />
+          </div>
+        ) : (
+          <p>No class emotion data available yet.</p>
+        )}
+      </section>
+
       {/* ================= MODULE-WISE ANALYTICS ================= */}
       <section style={{ marginTop: "50px" }}>
         <h3>Module-wise Emotion Analysis</h3>
@@ -3,6 +3,7 @@ import { useNavigate } from "react-router-dom";
 import Webcam from "react-webcam";
 import SuggestionBox from "../components/SuggestionBox";
 import { sendFrameToBackend } from "../services/api";
+import { recordEmotion } from "../services/progressSync";
 import "../styles/Courses.css";
 import WebcamBox from "../components/WebcamBox";
 const courses = [
@@ -27,9 +28,6 @@ export default function Courses() {
 
   const loggedIn = localStorage.getItem("loggedIn");
 
-  const userEmail = localStorage.getItem("userEmail");
-  const emotionHistoryKey = userEmail ? `emotionHistory_${userEmail}` : "emotionHistory";
-
   useEffect(() => {
     if (!loggedIn) return;
 
@@ -42,16 +40,15 @@ export default function Courses() {
       try {
         const res = await sendFrameToBackend(imageSrc);
 
+        // Overloaded server replayed the last known emotion; don't count it again
+        if (res.stale) return;
+
         // 🔹 Update UI
         setEmotion(res.emotion);
         setSuggestion(res.suggestion);
 
-        // 🔹 SAVE OVERALL EMOTION (FOR OVERALL PIE CHART)
-        const overallHistory = JSON.parse(localStorage.getItem(emotionHistoryKey)) || {};
-
-        overallHistory[res.emotion] = (overallHistory[res.emotion] || 0) + 1;
-
-        localStorage.setItem(emotionHistoryKey, JSON.stringify(overallHistory));
+        // 🔹 COUNT OVERALL EMOTION (FOR OVERALL PIE CHART, synced in batches)
+        recordEmotion(res.emotion);
 
       } catch (err) {
         console.error("Emotion API error:", err);
@@ -2,6 +2,7 @@ import { useEffect, useRef, useState } from "react";
 import Webcam from "react-webcam";
 import SuggestionBox from "../components/SuggestionBox";
 import { sendFrameToBackend } from "../services/api";
+import { fetchProgress, recordEmotion } from "../services/progressSync";
 import { useNavigate } from "react-router-dom";
 import "../styles/Learning.css";
 
@@ -25,24 +26,20 @@ export default function Learning() {
   const [emotion, setEmotion] = useState("");
   const [suggestion, setSuggestion] = useState("");
   const [showSuggestion, setShowSuggestion] = useState(false);
-  const [progress, setProgress] = useState({});
+  const [progress, setProgress] = useState({}); // { week: { status, dominant_emotion } }
   const [webcamReady, setWebcamReady] = useState(false);
 
   const loggedIn = localStorage.getItem("loggedIn");
   const userEmail = localStorage.getItem("userEmail");
 
-  const progressKey = userEmail ? `moduleProgress_${userEmail}` : "moduleProgress";
-  const emotionHistoryKey = userEmail ? `emotionHistory_${userEmail}` : "emotionHistory";
-  const moduleEmotionSummaryKey = userEmail ? `moduleEmotionSummary_${userEmail}` : "moduleEmotionSummary";
-
-  const emotionSummary =
-    JSON.parse(localStorage.getItem(moduleEmotionSummaryKey)) || {};
-
-  // 🔹 Load module completion progress
+  // 🔹 Load module completion progress (server-side, per user)
   useEffect(() => {
-    const saved = JSON.parse(localStorage.getItem(progressKey)) || {};
-    setProgress(saved);
-  }, [progressKey]);
+    if (!loggedIn) return;
+
+    fetchProgress()
+      .then((saved) => setProgress(saved.modules))
+      .catch((err) => console.error("Progress API error:", err));
+  }, [loggedIn, userEmail]);
 
   // 🔹 Emotion detection loop
   useEffect(() => {
@@ -57,20 +54,15 @@ export default function Learning() {
       try {
         const res = await sendFrameToBackend(imageSrc);
 
+        // Overloaded server replayed the last known emotion; don't count it again
+        if (res.stale) return;
+
         setEmotion(res.emotion);
         setSuggestion(res.suggestion);
         setShowSuggestion(true);
 
-        // Save overall emotion for analytics
-        const history =
-          JSON.parse(localStorage.getItem(emotionHistoryKey)) || {};
-
-        history[res.emotion] = (history[res.emotion] || 0) + 1;
-
-        localStorage.setItem(
-          emotionHistoryKey,
-          JSON.stringify(history)
-        );
+        // Count overall emotion for analytics (synced to the server in batches)
+        recordEmotion(res.emotion);
 
         setTimeout(() => setShowSuggestion(false), 5000);
       } catch (err) {
@@ -87,7 +79,8 @@ export default function Learning() {
 
       <div className="module-list">
         {modules.map((m) => {
-          const isCompleted = progress[m.week] === "completed";
+          const moduleProgress = progress[m.week] || {};
+          const isCompleted = moduleProgress.status === "completed";
 
           return (
             <div key={m.week} className="module-row">
@@ -104,7 +97,7 @@ export default function Learning() {
               <div className="module-footer">
                 <span className="status">
                   {isCompleted
-                    ? `✔ Completed (Mostly ${emotionSummary[m.week] || "—"})`
+                    ? `✔ Completed (Mostly ${moduleProgress.dominant_emotion || "—"})`
                     : "Not Started"}
                 </span>
 
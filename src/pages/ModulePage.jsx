@@ -3,6 +3,7 @@ import { useEffect, useRef, useState } from "react";
 import Webcam from "react-webcam";
 import SuggestionBox from "../components/SuggestionBox";
 import { sendFrameToBackend } from "../services/api";
+import { markModuleComplete, recordEmotion } from "../services/progressSync";
 import "../styles/ModulePage.css";
 
 import {
@@ -35,27 +36,15 @@ export default function ModulePage() {
       try {
         const res = await sendFrameToBackend(img);
 
+        // Overloaded server replayed the last known emotion; don't count it again
+        if (res.stale) return;
+
         setEmotion(res.emotion);
         setSuggestion(res.suggestion);
         setShowSuggestion(true);
 
-        // 🔹 SAVE emotion per module (per user)
-        const userEmail = localStorage.getItem("userEmail");
-        const moduleEmotionHistoryKey = userEmail
-          ? `moduleEmotionHistory_${userEmail}`
-          : "moduleEmotionHistory";
-
-        const history =
-          JSON.parse(localStorage.getItem(moduleEmotionHistoryKey)) || {};
-
-        history[weekId] = history[weekId] || {};
-        history[weekId][res.emotion] =
-          (history[weekId][res.emotion] || 0) + 1;
-
-        localStorage.setItem(
-          moduleEmotionHistoryKey,
-          JSON.stringify(history)
-        );
+        // 🔹 COUNT emotion per module (per user, synced in batches)
+        recordEmotion(res.emotion, weekId);
 
         setTimeout(() => setShowSuggestion(false), 5000);
       } catch (err) {
@@ -66,48 +55,9 @@ export default function ModulePage() {
     return () => clearInterval(interval);
   }, [weekId, webcamReady]);
 
-  // 🔹 Calculate dominant emotion
-  const userEmail = localStorage.getItem("userEmail");
-  const moduleEmotionHistoryKey = userEmail
-    ? `moduleEmotionHistory_${userEmail}`
-    : "moduleEmotionHistory";
-
-  const moduleEmotionSummaryKey = userEmail
-    ? `moduleEmotionSummary_${userEmail}`
-    : "moduleEmotionSummary";
-
-  const history =
-    JSON.parse(localStorage.getItem(moduleEmotionHistoryKey)) || {};
-  const dataObj = history[weekId] || {};
-
-  const labels = Object.keys(dataObj);
-  const values = Object.values(dataObj);
-
-  const highestEmotion =
-    labels.length > 0
-      ? labels[values.indexOf(Math.max(...values))]
-      : "Neutral";
-
-  // 🔹 Mark module as complete
-  const markComplete = () => {
-    const progressKey = userEmail
-      ? `moduleProgress_${userEmail}`
-      : "moduleProgress";
-
-    const progress =
-      JSON.parse(localStorage.getItem(progressKey)) || {};
-    const summary =
-      JSON.parse(localStorage.getItem(moduleEmotionSummaryKey)) || {};
-
-    progress[weekId] = "completed";
-    summary[weekId] = highestEmotion;
-
-    localStorage.setItem(progressKey, JSON.stringify(progress));
-    localStorage.setItem(
-      moduleEmotionSummaryKey,
-      JSON.stringify(summary)
-    );
-
+  // 🔹 Mark module as complete (the server picks its dominant emotion)
+  const markComplete = async () => {
+    await markModuleComplete(weekId);
     navigate("/learning");
   };
 
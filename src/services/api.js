@@ -2,17 +2,106 @@ import axios from "axios";
 
 const BASE_URL = "http://127.0.0.1:5000";
 
+// Frames are captured every 5 s; a result arriving later than that is stale
+const FRAME_DEADLINE_MS = 5000;
+
+// 🔹 Identifies this tab's frames for smoothing and admission on the server.
+// Per tab, not per user or address: students behind one classroom NAT (or one
+// user in two tabs) must not share a session.
+export const frameSessionId = () => {
+    let id = sessionStorage.getItem("frameSessionId");
+    if (!id) {
+        id = (window.crypto && window.crypto.randomUUID && window.crypto.randomUUID()) ||
+            `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        sessionStorage.setItem("frameSessionId", id);
+    }
+    return id;
+};
+
 // 🔹 Send webcam image to Flask for emotion detection
 export const sendFrameToBackend = async(image) => {
     const response = await axios.post(`${BASE_URL}/api/emotion`, {
-        image: image
+        image: image,
+        session_id: frameSessionId(),
+        deadline_ms: FRAME_DEADLINE_MS
+    }, {
+        // 503 carries the last known emotion when the server sheds load
+        validateStatus: (status) => status < 500 || status === 503
     });
 
-    return response.data; // { emotion, suggestion }
+    return response.data; // { emotion, suggestion, stale? }
 };
 
 // 🔹 Fetch analytics data from Flask
 export const fetchAnalytics = async() => {
     const response = await axios.get(`${BASE_URL}/api/analytics`);
     return response.data; // { Happy: 10, Sad: 5, ... }
-};
\ No newline at end of file
+};
+
+// 🔹 Live class-wide analytics
+// Calls onCounts(counts) with the full { emotion: count } map on every update:
+// pushed over /api/analytics/stream, or polled from /api/analytics when the
+// browser has no EventSource or the stream keeps failing.
+// Returns a function that stops the updates.
+const ANALYTICS_POLL_MS = 15000;
+const STREAM_MAX_FAILURES = 3;
+
+export const subscribeAnalytics = (onCounts) => {
+    let stopped = false;
+    let source = null;
+    let timer = null;
+
+    const poll = () => {
+        fetchAnalytics()
+            .then((counts) => {
+                if (!stopped) onCounts(counts);
+            })
+            .catch((err) => console.error("Analytics API error:", err));
+    };
+
+    const startPolling = () => {
+        if (source) {
+            source.close();
+            source = null;
+        }
+        if (stopped || timer) return;
+        poll();
+        timer = setInterval(poll, ANALYTICS_POLL_MS);
+    };
+
+    if (typeof EventSource === "undefined") {
+        startPolling();
+    } else {
+        let counts = null;
+        let failures = 0;
+        source = new EventSource(`${BASE_URL}/api/analytics/stream`);
+
+        // Sent on every (re)connect, so a reconnect resynchronises the counts
+        source.addEventListener("snapshot", (e) => {
+            failures = 0;
+            counts = JSON.parse(e.data);
+            onCounts({...counts });
+        });
+        source.addEventListener("delta", (e) => {
+            if (!counts) return;
+            for (const [emotion, n] of Object.entries(JSON.parse(e.data))) {
+                counts[emotion] = (counts[emotion] || 0) + n;
+            }
+            onCounts({...counts });
+        });
+        // EventSource reconnects by itself; fall back to polling if it gives
+        // up or keeps failing before a snapshot arrives
+        source.onerror = () => {
+            failures += 1;
+            if (failures >= STREAM_MAX_FAILURES || source.readyState === EventSource.CLOSED) {
+                startPolling();
+            }
+        };
+    }
+
+    return () => {
+        stopped = true;
+        if (source) source.close();
+        clearInterval(timer);
+    };
+};
@@ -0,0 +1,265 @@
+import axios from "axios";
+
+const BASE_URL = "http://127.0.0.1:5000";
+
+// Increments are flushed this often (and when the page is hidden)
+const FLUSH_INTERVAL_MS = 15000;
+
+// Overall emotion counts (Learning + Courses); modules use their week as scope
+export const OVERALL_SCOPE = "overall";
+
+// Unsent batches persisted when a page is hidden, one key per page load
+const QUEUE_KEY_PREFIX = "progressSyncQueue_";
+
+// Persisted queues older than this are discarded: the server forgets a
+// client's sequence numbers 30 days after its last flush (LBE_SYNC_CURSOR_TTL_DAYS),
+// after which a replay would be counted again
+const QUEUE_MAX_AGE_MS = 7 * 24 * 60 * 60 * 1000;
+
+// Progress tokens binding requests to a user, one key per user
+const TOKEN_KEY_PREFIX = "progressToken_";
+
+// Server limits per flush (see backend utils/progress_sync.py)
+const MAX_SYNC_ENTRIES = 256;
+const MAX_INCREMENT = 100000;
+
+// 4xx statuses worth retrying; any other 4xx rejects the batch for good
+const RETRY_STATUSES = [401, 408, 429];
+
+// Legacy per-tick localStorage blobs, imported once and then removed
+const LEGACY_KEYS = ["emotionHistory", "moduleEmotionHistory", "moduleProgress", "moduleEmotionSummary"];
+
+// One id per page load; with seq it lets the server drop retried flushes
+const CLIENT_ID =
+    (window.crypto && window.crypto.randomUUID && window.crypto.randomUUID()) ||
+    `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+let seq = 0;
+let open = null; // { user_id, emotions: { scope: { emotion: n } }, modules: { week: status } }
+const sealed = []; // Batches with a seq, sent in order; the head is retried until acknowledged
+let flushing = null;
+let timer = null;
+const migratedUsers = new Set();
+
+const currentUser = () => localStorage.getItem("userEmail");
+
+const openBatch = (userId) => {
+    if (open && open.user_id !== userId) seal();
+    if (!open) open = { user_id: userId, emotions: {}, modules: {} };
+    if (!timer) timer = setInterval(flushProgress, FLUSH_INTERVAL_MS);
+    return open;
+};
+
+const addCounts = (emotions, scope, counts) => {
+    emotions[scope] = emotions[scope] || {};
+    for (const [emotion, n] of Object.entries(counts)) {
+        emotions[scope][emotion] = (emotions[scope][emotion] || 0) + n;
+    }
+};
+
+// 🔹 The user's progress token (issued by the server once, then cached)
+const progressToken = async(userId, refresh = false) => {
+    const key = `${TOKEN_KEY_PREFIX}${userId}`;
+    if (!refresh) {
+        const cached = localStorage.getItem(key);
+        if (cached) return cached;
+    }
+    const response = await axios.post(`${BASE_URL}/api/progress/session`, { user_id: userId });
+    localStorage.setItem(key, response.data.token);
+    return response.data.token;
+};
+
+// Runs request(token), re-issuing the token once if the server rejects it
+const withToken = async(userId, request) => {
+    try {
+        return await request(await progressToken(userId));
+    } catch (err) {
+        if (!err.response || err.response.status !== 401) throw err;
+        return request(await progressToken(userId, true));
+    }
+};
+
+const seal = () => {
+    if (!open) return;
+    if (Object.keys(open.emotions).length || Object.keys(open.modules).length) {
+        sealed.push({...open, client_id: CLIENT_ID, seq: ++seq });
+    }
+    open = null;
+};
+
+// 🔹 Queue counts and module states as batches within the server's limits
+// Counts over MAX_INCREMENT are spread over consecutive batches.
+const sealInChunks = (userId, emotions, modules) => {
+    seal();
+    const left = [];
+    for (const [scope, counts] of Object.entries(emotions)) {
+        for (const [emotion, n] of Object.entries(counts)) {
+            if (Number.isInteger(n) && n > 0) left.push({ scope, emotion, n });
+        }
+    }
+    let pendingModules = Object.entries(modules);
+
+    while (left.some((entry) => entry.n > 0) || pendingModules.length) {
+        const batch = openBatch(userId);
+        for (const entry of left.filter((e) => e.n > 0).slice(0, MAX_SYNC_ENTRIES)) {
+            const n = Math.min(entry.n, MAX_INCREMENT);
+            addCounts(batch.emotions, entry.scope, { [entry.emotion]: n });
+            entry.n -= n;
+        }
+        Object.assign(batch.modules, Object.fromEntries(pendingModules.slice(0, MAX_SYNC_ENTRIES)));
+        pendingModules = pendingModules.slice(MAX_SYNC_ENTRIES);
+        seal();
+    }
+};
+
+const isRejected = (err) =>
+    Boolean(err.response) &&
+    err.response.status >= 400 && err.response.status < 500 &&
+    !RETRY_STATUSES.includes(err.response.status);
+
+// 🔹 Count one detected emotion (O(1), no storage access)
+export const recordEmotion = (emotion, scope = OVERALL_SCOPE) => {
+    const userId = currentUser();
+    if (!userId || !emotion) return;
+
+    addCounts(openBatch(userId).emotions, scope, { [emotion]: 1 });
+};
+
+// 🔹 Mark a module completed and flush right away
+export const markModuleComplete = async(week) => {
+    const userId = currentUser();
+    if (!userId) return;
+
+    openBatch(userId).modules[week] = "completed";
+    await flushProgress();
+};
+
+// 🔹 Send pending increments; failed batches stay queued for the next flush
+// A batch the server rejects as invalid (4xx) is dropped, so it cannot
+// block every batch behind it.
+export const flushProgress = async() => {
+    if (flushing) return flushing;
+    seal();
+
+    flushing = (async() => {
+        try {
+            while (sealed.length) {
+                const batch = sealed[0];
+                try {
+                    await withToken(batch.user_id, (token) =>
+                        axios.post(`${BASE_URL}/api/progress/sync`, {...batch, token })
+                    );
+                } catch (err) {
+                    if (!isRejected(err)) throw err;
+                    console.error("Progress sync rejected a batch, dropping it:", err.response.data);
+                }
+                sealed.shift();
+            }
+        } catch (err) {
+            console.error("Progress sync error:", err);
+        } finally {
+            flushing = null;
+        }
+    })();
+    return flushing;
+};
+
+// 🔹 Merged server summary plus increments not acknowledged yet
+// Returns { emotions: { scope: { emotion: n } }, modules: { week: { status, dominant_emotion } } }
+export const fetchProgress = async() => {
+    const userId = currentUser();
+    if (!userId) return { emotions: {}, modules: {} };
+
+    await migrateLegacyStorage();
+    const response = await withToken(userId, (token) =>
+        axios.get(`${BASE_URL}/api/progress`, { headers: { "X-Progress-Token": token } })
+    );
+    const progress = response.data;
+
+    const pending = [...sealed, ...(open ? [open] : [])].filter((b) => b.user_id === userId);
+    for (const batch of pending) {
+        for (const [scope, counts] of Object.entries(batch.emotions)) {
+            addCounts(progress.emotions, scope, counts);
+        }
+        for (const [week, status] of Object.entries(batch.modules)) {
+            progress.modules[week] = {...progress.modules[week], status };
+        }
+    }
+    return progress;
+};
+
+// 🔹 One-time import of counts the pages used to keep in localStorage
+// The legacy keys are removed once the server has acknowledged them.
+const migrateLegacyStorage = async() => {
+    const userId = currentUser();
+    if (!userId || migratedUsers.has(userId)) return;
+    migratedUsers.add(userId);
+
+    const read = (base) => {
+        try {
+            return JSON.parse(localStorage.getItem(`${base}_${userId}`)) || {};
+        } catch (err) {
+            return {};
+        }
+    };
+
+    const overall = read("emotionHistory");
+    const perModule = read("moduleEmotionHistory");
+    const completed = read("moduleProgress");
+    if (!Object.keys(overall).length && !Object.keys(perModule).length && !Object.keys(completed).length) {
+        return;
+    }
+
+    const emotions = {...perModule, [OVERALL_SCOPE]: overall };
+    const queued = sealed.length;
+    sealInChunks(userId, emotions, completed);
+    const migrated = sealed.slice(queued);
+
+    await flushProgress();
+    if (!migrated.some((batch) => sealed.includes(batch))) {
+        LEGACY_KEYS.forEach((base) => localStorage.removeItem(`${base}_${userId}`));
+    }
+};
+
+// 🔹 On hide, write the unsent queue once and beacon its head. Batches keep
+// their client id and seq, so the next page load resends the rest in order
+// and the server drops any it has already applied.
+window.addEventListener("pagehide", () => {
+    seal();
+    if (!sealed.length) return;
+
+    localStorage.setItem(
+        `${QUEUE_KEY_PREFIX}${CLIENT_ID}`,
+        JSON.stringify({ saved_at: Date.now(), batches: sealed })
+    );
+    const token = localStorage.getItem(`${TOKEN_KEY_PREFIX}${sealed[0].user_id}`);
+    if (!token) return;
+    const body = new Blob([JSON.stringify({...sealed[0], token })], { type: "text/plain" });
+    navigator.sendBeacon(`${BASE_URL}/api/progress/sync`, body);
+});
+
+// Restored from the back/forward cache: the queue is still in memory
+window.addEventListener("pageshow", (e) => {
+    if (e.persisted) localStorage.removeItem(`${QUEUE_KEY_PREFIX}${CLIENT_ID}`);
+});
+
+// Queues left by earlier page loads
+const restoreQueues = () => {
+    const keys = [];
+    for (let i = 0; i < localStorage.length; i++) {
+        const key = localStorage.key(i);
+        if (key.startsWith(QUEUE_KEY_PREFIX)) keys.push(key);
+    }
+    for (const key of keys) {
+        try {
+            const queue = JSON.parse(localStorage.getItem(key));
+            if (Date.now() - queue.saved_at <= QUEUE_MAX_AGE_MS) sealed.push(...queue.batches);
+        } catch (err) {
+            console.error("Discarding unreadable progress queue:", err);
+        }
+        localStorage.removeItem(key);
+    }
+    if (sealed.length) flushProgress();
+};
+
+restoreQueues();
@@ -55,12 +55,17 @@ export const clearUserData = () => {
 };
 
 /**
- * Email-scoped localStorage key patterns:
+ * Email-scoped localStorage key patterns (legacy: emotion counts and module
+ * progress now live on the server, see services/progressSync.js, which
+ * imports these keys once and removes them):
  * 
  * - moduleProgress_<email>: { week: "completed" }
  * - emotionHistory_<email>: { "Happy": 5, "Sad": 3, ... }
  * - moduleEmotionHistory_<email>: { weekId: { "Happy": 2, "Sad": 1 } }
  * - moduleEmotionSummary_<email>: { weekId: "DominantEmotion" }
+ *
+ * progressToken_<email> holds the token the server issued for the user's
+ * progress requests (see services/progressSync.js).
  * 
  * When user logs in:
  * 1. Previous email is checked